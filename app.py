@@ -1,27 +1,43 @@
+import time
+T_START = time.perf_counter()  # the imports below count towards the first rerun's time to first paint
 import streamlit as st
 import plotly.graph_objects as go
-import plotly.express as px
-from plotly.subplots import make_subplots
+import plotly.colors
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-import requests
-from io import StringIO, BytesIO
-from github import Github, Auth
-from streamlit_lottie import st_lottie
+from io import BytesIO
+from history_store import HISTORY_CACHE, NUM_COLS, LocalRepo
+from history_mirror import HistoryMirror, SyncWorker
+from engine import calculate_fleet
+from fleet import FLEET_FILE, INPUT_FIELDS, load_fleet
+import profiler
+from lazy_imports import lazy, report as import_report
+from assets import LottieStore
+from ingest import ingest, report_frame
+from downsample import FLEET as SERIES_FLEET, METHODS as DOWNSAMPLE_METHODS, POINT_BUDGET, SeriesCache
+from simulate import BASE_COLS as SIM_BASE_COLS, MC_SAMPLES, UNITS as SIM_UNITS, cache_info as sim_cache_info, default_ranges, monte_carlo as sim_monte_carlo, surface as sim_surface, tornado as sim_tornado
+from rollups import POND_COLS, ROLLUP_COLS, AshPondIndex, RollupStore, fy_label
+from quality import QUALITY_COLS, QUALITY_METRICS, QualityMonitor
+from memo import MEMO_ENTRIES, Memo, digest, units as memo_units
+from replay import ReplayStore
+from historian import TAGS as LIVE_TAGS, Historian
 import streamlit.components.v1 as components
-from fpdf import FPDF
-import matplotlib.pyplot as plt
-import matplotlib
-import base64
-import tempfile
 import os
-
-# Force matplotlib to use a non-interactive backend
-matplotlib.use('Agg')
+import functools
+IMPORTS_MS = (time.perf_counter() - T_START) * 1000
+# Loaded on first use (lazy_imports.py): PDF/matplotlib, Excel export, PyGithub, plotly.express / subplots, Lottie player
+px = lazy("plotly.express")
+plotly_subplots = lazy("plotly.subplots")
+pdf_engine = lazy("pdf_engine")
+excel_export = lazy("excel_export")
+streamlit_lottie = lazy("streamlit_lottie")
 
 # --- 1. CONFIGURATION & CSS ---
 st.set_page_config(page_title="GMR 5S Dashboard", layout="wide", page_icon="⚡")
+# Timing spans for this rerun; logged and shown in the admin panel at the end of the script
+prof = profiler.start("rerun", since=T_START)
+prof.add("imports", IMPORTS_MS)
 
 # Import Professional Fonts
 components.html(
@@ -99,50 +115,91 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # --- 3. ASSETS & HELPERS ---
-def load_lottieurl(url):
-    try:
-        r = requests.get(url, timeout=1)
-        return r.json() if r.status_code == 200 else None
-    except: return None
+@st.cache_resource
+def get_lottie_store():
+    # One store per process; downloads run in the background (assets.LottieStore)
+    return LottieStore()
 
-anim_tree = load_lottieurl("https://lottie.host/6e35574d-8651-477d-b570-56965c276b3b/22572535-373f-42a9-823c-99e582862594.json")
-anim_smoke = load_lottieurl("https://lottie.host/575a66c6-1215-4688-9189-b57579621379/10839556-9141-4712-a89e-224429715783.json")
-anim_money = load_lottieurl("https://lottie.host/02008323-2895-4673-863a-4934e402802d/41838634-11d9-430c-992a-356c92d529d3.json")
-anim_sun = load_lottieurl("https://lottie.host/3c6c9e04-0391-4e9e-99f2-2b6f3c02d139/2Y7Q1j1j1j.json") 
+lottie = get_lottie_store()
+
+def secret(key, default=None):
+    try:
+        if key in st.secrets: return st.secrets[key]
+    except: pass
+    return os.environ.get(key, default)
 
 def init_github():
+    # Offline mode: a local directory stands in for the GitHub repo
+    local_dir = secret("HISTORY_LOCAL_REPO")
+    if local_dir: return LocalRepo(local_dir)
     try:
         if "GITHUB_TOKEN" in st.secrets:
+            from github import Auth, Github  # only deployments with a token pay for PyGithub
             auth = Auth.Token(st.secrets["GITHUB_TOKEN"])
             g = Github(auth=auth)
-            return g.get_repo(st.secrets["REPO_NAME"])
+            # lazy: no API round trip until the repo is actually used
+            return g.get_repo(st.secrets["REPO_NAME"], lazy=True)
     except: return None
 
-def load_history(repo):
-    if not repo: return pd.DataFrame()
-    try:
-        file = repo.get_contents("plant_history_v28.csv", ref=st.secrets["BRANCH"])
-        df = pd.read_csv(StringIO(file.decoded_content.decode()))
-        cols = ['Gen', 'HR', 'Target HR', 'Profit', 'Vacuum', 'MS Temp', 'FG Temp', 'Spray', 'SOx', 'NOx', 'Ash Util', 'Ash Cement', 'Ash Bricks', 'Biomass', 'Solar']
-        for c in cols:
-            if c in df.columns: df[c] = pd.to_numeric(df[c], errors='coerce').fillna(0)
-        
-        # CRITICAL FIX: Convert to Pandas Timestamp
-        df['Date'] = pd.to_datetime(df['Date'])
-        return df, file.sha
-    except: 
-        cols = ["Date", "Unit", "Profit", "HR", "SOx", "NOx", "Gen", "Ash Util", "Coal Ash %", "Biomass", "Solar", "Vacuum", "MS Temp", "FG Temp", "Spray", "Ash Cement", "Ash Bricks"]
-        return pd.DataFrame(columns=cols), None
-
-def save_history(repo, df, sha):
-    try:
-        df['Date'] = pd.to_datetime(df['Date']).dt.strftime('%Y-%m-%d')
-        csv_content = df.to_csv(index=False)
-        msg = "Update" if sha else "Init"
-        if sha: repo.update_file("plant_history_v28.csv", msg, csv_content, sha, branch=st.secrets["BRANCH"])
-        else: repo.create_file("plant_history_v28.csv", msg, csv_content, branch=st.secrets["BRANCH"])
-        return True
-    except: return False
+@st.cache_resource
+def get_mirror(root):
+    return HistoryMirror(root)
+
+@st.cache_resource
+def get_pond_index(_mirror, root):
+    pond = _mirror.attach(AshPondIndex(os.path.join(root, "pond_index.parquet"), revision=lambda: _mirror.revision))
+    # The saved index is only trusted for the mirror data it was built from: other processes
+    # (historian load, batch reports' pulls) write the mirror without this listener attached
+    if pond.saved_revision is None or pond.saved_revision != _mirror.revision: pond.on_reset(_mirror.read(columns=POND_COLS))
+    return pond
+
+@st.cache_resource
+def get_rollups(_mirror, root):
+    rollups = _mirror.attach(RollupStore())
+    if not _mirror.empty: rollups.on_reset(_mirror.read(columns=ROLLUP_COLS))
+    return rollups
+
+@st.cache_resource
+def get_quality(_mirror, root, window):
+    quality = _mirror.attach(QualityMonitor(window=window))
+    if not _mirror.empty: quality.on_reset(_mirror.read(columns=QUALITY_COLS))
+    return quality
+
+@st.cache_resource
+def get_series_cache(_mirror, root):
+    return _mirror.attach(SeriesCache())
+
+@st.cache_resource
+def get_replays(_mirror, root):
+    return _mirror.attach(ReplayStore())
+
+@st.cache_resource
+def get_memo(max_entries):
+    # Unit results and built figures, shared by every session (memo.py)
+    return Memo(max_entries)
+
+memo = get_memo(int(secret("MEMO_ENTRIES", MEMO_ENTRIES)))
+
+# History columns the Inputs tab pre-fills from
+HIST_INPUT_COLS = ['Unit'] + [col for col, _, _ in INPUT_FIELDS] + ['Coal Ash %']
+
+@st.cache_resource
+def get_sync_worker(_mirror, _repo, branch, flush_interval):
+    return SyncWorker(_mirror, _repo, branch, flush_interval=flush_interval)
+
+@st.cache_resource
+def get_historian(_mirror, _sync, source, configs, ash_pct, flush_interval):
+    # One feed reader per process; every session's live view reads its aggregates (historian.py)
+    return Historian(_mirror, configs, ash_pct, sync=_sync, flush_interval=flush_interval).start(source)
+
+def confirm_commit(sync, ticket, timeout):
+    # Saves are only reported as saved once their rows are in a repo commit
+    with st.spinner("Committing to GitHub..."):
+        t = sync.wait(ticket, timeout)
+    if t and t['state'] == 'committed':
+        st.success(f"Saved and committed ({t['rows']} rows" + (f", {t['delta'].rsplit('/', 1)[-1]})." if t['delta'] else ")."))
+    else:
+        st.warning("Saved locally; the GitHub commit is still pending and will be retried." + (f" Last error: {t['error']}" if t and t['error'] else ""))
 
 def generate_excel_template():
     df = pd.DataFrame({
@@ -166,119 +223,52 @@ def generate_bulk_template():
     })
     return df
 
+def plotly_chart(container, fig, **kwargs):
+    # Figure serialization is most of a chart's cost, so it gets its own span
+    with profiler.span("plotly"):
+        return container.plotly_chart(fig, **kwargs)
+
 def format_lacs(value):
     val_lac = value / 100000
     return f"₹ {val_lac:,.2f} Lac"
 
-# --- 4. PDF ENGINE ---
-class PDF(FPDF):
-    def header(self):
-        self.set_font('Arial', 'B', 16)
-        self.set_text_color(0, 51, 153)
-        self.cell(0, 10, 'GMR Kamalanga - 5S Report', 0, 1, 'C')
-        self.ln(5)
-    def footer(self):
-        self.set_y(-15)
-        self.set_font('Arial', 'I', 8)
-        self.set_text_color(128, 128, 128)
-        self.cell(0, 10, f'Page {self.page_no()}', 0, 0, 'C')
-
-def create_full_pdf(units, fleet_pnl, ash_data, green_data):
-    pdf = PDF()
-    pdf.add_page()
-    pdf.set_font("Arial", 'B', 12)
-    pdf.cell(0, 10, f"Date: {datetime.now().strftime('%Y-%m-%d')} | P&L: Rs {fleet_pnl:,.0f}", 1, 1, 'C')
-    pdf.ln(10)
-    pdf.set_font("Arial", 'B', 10)
-    pdf.set_fill_color(220, 220, 220)
-    headers = ["Unit", "Gen", "HR", "Profit", "SOx", "NOx"]
-    for h in headers: pdf.cell(30, 10, h, 1, 0, 'C', 1)
-    pdf.ln()
-    pdf.set_font("Arial", size=10)
-    for u in units:
-        pdf.cell(30, 10, f"U{u['id']}", 1)
-        pdf.cell(30, 10, str(u['gen']), 1)
-        pdf.cell(30, 10, str(u['hr']), 1)
-        pdf.cell(30, 10, f"{u['profit']:,.0f}", 1)
-        pdf.cell(30, 10, str(u['sox']), 1)
-        pdf.cell(30, 10, str(u['nox']), 1)
-        pdf.ln()
-    for u in units:
-        pdf.add_page()
-        pdf.set_font("Arial", 'B', 14)
-        pdf.cell(0, 10, f"Unit {u['id']} Analysis", 0, 1)
-        pdf.ln(5)
-        tech_map = [("Vac", u['losses']['Vacuum']), ("MS", u['losses']['MS Temp']), ("FG", u['losses']['Flue Gas'])]
-        fig = plt.figure(figsize=(6, 3))
-        plt.bar([x[0] for x in tech_map], [x[1] for x in tech_map], color='#FF3333')
-        plt.title("Losses")
-        img_buf = tempfile.NamedTemporaryFile(delete=False, suffix='.png')
-        plt.savefig(img_buf.name, format='png')
-        plt.close()
-        pdf.image(img_buf.name, x=10, y=pdf.get_y(), w=100)
-        os.unlink(img_buf.name)
-        pdf.ln(60)
-        pdf.set_font("Arial", size=10)
-        pdf.cell(0, 10, f"ESCerts: {u['escerts']:.2f} | Carbon Credits: {u['carbon']:.2f}", 0, 1)
-    pdf.add_page()
-    pdf.set_font("Arial", 'B', 14)
-    pdf.cell(0, 10, "Environment & Ash", 0, 1)
-    pdf.ln(5)
-    pdf.set_font("Arial", size=10)
-    pdf.cell(0, 10, f"Ash Gen: {ash_data['gen']:.0f} T | Util: {ash_data['util']:.0f} T", 0, 1)
-    pdf.cell(0, 10, f"Solar CO2 Saved: {green_data['sol_co2']:.2f} T", 0, 1)
-    return pdf.output(dest='S').encode('latin-1')
-
-# --- 5. CALCULATION ENGINE ---
-def calculate_unit(u_id, gen, hr, inputs, design_vals, ash_params):
-    TARGET_HR = design_vals['target_hr']; DESIGN_HR = 2250; COAL_GCV = design_vals['gcv']
-    
-    if gen <= 0 or hr <= 0:
-        profit = -1 * (350 * 1000 * 24 * 3) 
-        score = 0
-        l_vac = l_ms = l_fg = l_spray = l_unacc = 0
-        carbon_tons = escerts = 0
-        status = "SHUTDOWN"
-    else:
-        status = "RUNNING"
-        kcal_diff = (TARGET_HR - hr) * gen * 1_000_000
-        escerts = kcal_diff / 10_000_000
-        coal_saved_kg = kcal_diff / COAL_GCV
-        carbon_tons = (coal_saved_kg / 1000) * 1.7
-        profit = (escerts * 1000) + (carbon_tons * 500) + (coal_saved_kg * 4.5)
-        
-        l_vac = max(0, (inputs['vac'] - (-0.92)) / 0.01 * 18) * -1
-        l_ms = max(0, (540 - inputs['ms']) * 1.2)
-        l_fg = max(0, (inputs['fg'] - 130) * 1.5)
-        l_spray = max(0, (inputs['spray'] - 15) * 2.0)
-        l_unacc = max(0, hr - (DESIGN_HR + l_ms + l_fg + l_spray + 50) - abs(l_vac))
-        score = max(0, 100 - (abs(l_vac) + l_ms + l_fg + l_spray + l_unacc)/3)
-    
-    coal_consumed = (gen * hr * 1000) / COAL_GCV if COAL_GCV > 0 and gen > 0 else 0
-    ash_gen = coal_consumed * (ash_params['ash_pct'] / 100)
-    ash_util = ash_params['util_cem'] + ash_params['util_brick']
-    ash_stocked = ash_gen - ash_util
-    bricks_current = ash_params['util_brick'] * 666
-    bricks_potential_total = ash_gen * 666
-    burj_pct = (bricks_current / 165_000_000) * 100
-    
-    bio_units = ash_params.get('biomass', 0) * 1000 * 1.2 
-    homes_bio = bio_units / 4 
-    
-    return {
-        "id": u_id, "gen": gen, "hr": hr, "profit": profit, "escerts": escerts if status=="RUNNING" else 0, "carbon": carbon_tons if status=="RUNNING" else 0,
-        "score": score, "sox": inputs['sox'], "nox": inputs['nox'],
-        "losses": {"Vacuum": abs(l_vac), "MS Temp": l_ms, "Flue Gas": l_fg, "Spray": l_spray, "Unaccounted": l_unacc},
-        "ash": {"generated": ash_gen, "utilized": ash_util, "stocked": ash_stocked, 
-                "bricks_made": bricks_current, "cem_util": ash_params['util_cem'],
-                "brick_util": ash_params['util_brick'], "burj_pct": burj_pct},
-        "limits": design_vals['limits'], "trees": abs((carbon_tons if status=="RUNNING" else 0) / 0.025),
-        "target_hr": TARGET_HR, "homes_bio": homes_bio,
-        "inputs": inputs, "status": status
-    }
+# --- 4. PDF ENGINE: see pdf_engine.py ---
+
+# --- 5. CALCULATION ENGINE: see engine.py ---
 
 # --- 6. RENDER FUNCTION ---
-def render_unit_detail(u, configs):
+# Figure builders: pure functions of their arguments, so memo.get can reuse what they return
+def gauge_figure(hr, target):
+    fig = go.Figure(go.Indicator(
+        mode = "gauge+number+delta", value = hr,
+        delta = {'reference': target, 'increasing': {'color': "#FF3333"}},
+        gauge = {
+            'axis': {'range': [2000, 2600]}, 'bar': {'color': "#00ccff"},
+            'steps': [{'range': [2000, target], 'color': "rgba(0,255,0,0.2)"}, {'range': [target, 2600], 'color': "rgba(255,0,0,0.2)"}],
+            'threshold': {'line': {'color': "#FF3333", 'width': 4}, 'thickness': 0.75, 'value': hr}
+        }
+    ))
+    fig.update_layout(height=250, margin=dict(l=20,r=20,t=0,b=0), paper_bgcolor='rgba(0,0,0,0)', font_color='white')
+    return fig
+
+def loss_figure(losses):
+    loss_df = pd.DataFrame(list(losses.items()), columns=['Param', 'Loss']).sort_values('Loss')
+    fig_bar = px.bar(loss_df, x='Loss', y='Param', orientation='h', text='Loss', color='Loss', 
+                     color_continuous_scale=['#444', '#FF3333'], template='plotly_dark')
+    fig_bar.update_layout(
+        paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', font_color='white', height=250,
+        xaxis=dict(showgrid=False), yaxis=dict(showgrid=False)
+    )
+    fig_bar.update_traces(texttemplate='%{text:.1f}', textposition='outside')
+    return fig_bar
+
+def ash_figure(cement, bricks):
+    ash_breakdown = pd.DataFrame({'Type': ['Cement', 'Bricks'], 'Tons': [cement, bricks]})
+    fig_pie = px.pie(ash_breakdown, values='Tons', names='Type', hole=0.4, template='plotly_dark')
+    fig_pie.update_layout(height=200, margin=dict(l=0,r=0,t=0,b=0), paper_bgcolor='rgba(0,0,0,0)')
+    return fig_pie
+
+def render_unit_detail(u):
     st.markdown(f"### 🔍 Unit {u['id']} Deep Dive")
     if u['status'] == "SHUTDOWN":
         st.error("🚨 UNIT SHUTDOWN - No Efficiency Analysis Available")
@@ -287,30 +277,13 @@ def render_unit_detail(u, configs):
     c1, c2 = st.columns([1, 1])
     with c1:
         st.markdown("#### 🏎️ Efficiency Gauge")
-        target = configs[int(u['id'])-1]['target_hr']
-        fig = go.Figure(go.Indicator(
-            mode = "gauge+number+delta", value = u['hr'],
-            delta = {'reference': target, 'increasing': {'color': "#FF3333"}},
-            gauge = {
-                'axis': {'range': [2000, 2600]}, 'bar': {'color': "#00ccff"},
-                'steps': [{'range': [2000, target], 'color': "rgba(0,255,0,0.2)"}, {'range': [target, 2600], 'color': "rgba(255,0,0,0.2)"}],
-                'threshold': {'line': {'color': "#FF3333", 'width': 4}, 'thickness': 0.75, 'value': u['hr']}
-            }
-        ))
-        fig.update_layout(height=250, margin=dict(l=20,r=20,t=0,b=0), paper_bgcolor='rgba(0,0,0,0)', font_color='white')
-        st.plotly_chart(fig, width="stretch", key=f"gauge_{u['id']}")
+        fig = memo.get('gauge', (u['hr'], u['target_hr']), lambda: gauge_figure(u['hr'], u['target_hr']))
+        plotly_chart(st, fig, width="stretch", key=f"gauge_{u['id']}")
 
     with c2:
         st.markdown("#### 🔧 Loss Analysis")
-        loss_df = pd.DataFrame(list(u['losses'].items()), columns=['Param', 'Loss']).sort_values('Loss')
-        fig_bar = px.bar(loss_df, x='Loss', y='Param', orientation='h', text='Loss', color='Loss', 
-                         color_continuous_scale=['#444', '#FF3333'], template='plotly_dark')
-        fig_bar.update_layout(
-            paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', font_color='white', height=250,
-            xaxis=dict(showgrid=False), yaxis=dict(showgrid=False)
-        )
-        fig_bar.update_traces(texttemplate='%{text:.1f}', textposition='outside')
-        st.plotly_chart(fig_bar, width="stretch", key=f"bar_{u['id']}")
+        fig_bar = memo.get('loss_bar', u['losses'], lambda: loss_figure(u['losses']))
+        plotly_chart(st, fig_bar, width="stretch", key=f"bar_{u['id']}")
 
     st.divider()
     c3, c4 = st.columns(2)
@@ -327,19 +300,43 @@ with st.sidebar:
     
     date_in = st.date_input("📅 Dashboard Date", datetime.now())
     units_data = [] # Init
+    fleet = load_fleet(secret("FLEET_CONFIG", FLEET_FILE))
+    plant_of = fleet.plant_of()
+    # View filter for cards, unit detail and trends; fleet totals always cover every plant
+    plant_sel = st.selectbox("🏭 Plant", [None] + list(fleet.plants), format_func=lambda p: "All plants" if p is None else fleet.plants[p]) if len(fleet.plants) > 1 else None
     
     repo = init_github()
-    hist_df, sha = load_history(repo)
+    branch = secret("BRANCH", "main")
+    HISTORY_CACHE.ttl = float(secret("HISTORY_CACHE_TTL", 60))
+    mirror_dir = secret("HISTORY_MIRROR_DIR", "mirror")
+    profile_log = secret("PROFILE_LOG", profiler.PROFILE_LOG)
+    show_admin = str(secret("ADMIN_PANEL", "")).lower() in ("1", "true", "yes")
+    mirror = get_mirror(mirror_dir)
+    pond = get_pond_index(mirror, mirror_dir)
+    rollups = get_rollups(mirror, mirror_dir)
+    series_cache = get_series_cache(mirror, mirror_dir)
+    quality = get_quality(mirror, mirror_dir, int(secret("QUALITY_WINDOW", 30)))
+    replays = get_replays(mirror, mirror_dir)
+    flush_interval = float(secret("HISTORY_FLUSH_INTERVAL", SyncWorker.FLUSH_INTERVAL))
+    sync = get_sync_worker(mirror, repo, branch, flush_interval) if repo else None
+    live_source = secret("HISTORIAN_SOURCE")
+    historian = get_historian(mirror, sync, live_source, fleet.configs(), fleet.coal_ash_pct, float(secret("HISTORIAN_FLUSH", 900))) if live_source else None
+    with prof.span("sync"):
+        mirror.pull(repo, branch, ttl=HISTORY_CACHE.ttl)
+
+    # The selected day's month, input columns only, shared by every session (MTD comes from the rollups)
+    date_in_ts = pd.Timestamp(date_in)
+    with prof.span("history_index"):
+        hist_idx = mirror.index(date_in_ts.strftime('%Y-%m'), HIST_INPUT_COLS)
+    c_stats = HISTORY_CACHE.stats()
+    st.caption(f"History cache: {c_stats['hits']} hits / {c_stats['misses']} misses (TTL {c_stats['ttl']:.0f}s) | Mirror: {len(mirror.manifest['months'])} months" + ("" if not sync or not sync.queued else f" | {sync.queued} save(s) queued") + ("" if not sync or not sync.last_error else f" | Sync error: {sync.last_error}"))
     
     hist_data = {}
-    if not hist_df.empty:
-        # ROBUST DATE COMPARISON: Compare Timestamps directly
-        date_in_ts = pd.Timestamp(date_in)
-        day_df = hist_df[hist_df['Date'] == date_in_ts]
+    if not hist_idx.empty:
+        day_df = hist_idx.day(date_in_ts)
         if not day_df.empty:
             st.success(f"Data Found: {date_in}")
-            for _, row in day_df.iterrows():
-                hist_data[str(row['Unit'])] = row
+            hist_data = day_df.to_dict('index')
         else:
             st.info("No history. Using inputs.")
     
@@ -360,55 +357,40 @@ with st.sidebar:
         bulk_file = st.file_uploader("Bulk History", type=['csv'])
         if bulk_file and st.button("🚀 Process Bulk"):
             try:
-                try:
-                    df_b = pd.read_csv(bulk_file)
-                except UnicodeDecodeError:
-                    bulk_file.seek(0)
-                    df_b = pd.read_csv(bulk_file, encoding='latin-1')
-                except Exception:
-                    bulk_file.seek(0)
-                    df_b = pd.read_csv(bulk_file, encoding='cp1252')
-
-                df_b['Date'] = pd.to_datetime(df_b['Date']).dt.strftime('%Y-%m-%d')
-                if repo:
-                    file = repo.get_contents("plant_history_v28.csv", ref=st.secrets["BRANCH"])
-                    df_curr = pd.read_csv(StringIO(file.decoded_content.decode()))
-                    df_comb = pd.concat([df_curr, df_b], ignore_index=True)
-                    csv_c = df_comb.to_csv(index=False)
-                    repo.update_file("plant_history_v28.csv", "Bulk Add", csv_c, file.sha, branch=st.secrets["BRANCH"])
-                    st.success("Bulk Uploaded!")
-                    st.rerun()
+                rep = ingest(bulk_file, mirror)
+                if sync and rep['accepted']:
+                    with st.spinner("Committing to GitHub..."):
+                        rep['commit'] = sync.wait(sync.submit(rows=rep['accepted']), flush_interval + 30)
+                st.session_state['ingest_report'] = rep
+                st.rerun()
             except Exception as e: st.error(f"Bulk Error: {e}")
-
-        col_dl1, col_dl2 = st.columns(2)
-        with col_dl1:
-            if units_data:
-                pre_data_dict = {'Parameter': generate_excel_template()['Parameter']}
-                for u in units_data:
-                    idx = int(u['id'])-1
-                    inp = u['inputs']
-                    vals = [u['gen'], u['hr'], inp['vac'], inp['ms'], inp['fg'], inp['spray'], u['sox'], u['nox'], u['ash']['cem_util'], u['ash']['brick_util'], (bio_u1 if idx==0 else (bio_u2 if idx==1 else bio_u3)), (sol_u1 if idx==0 else 0)]
-                    pre_data_dict[f"Unit {u['id']}"] = vals
-                out_d = BytesIO()
-                pd.DataFrame(pre_data_dict).to_excel(out_d, index=False, engine='openpyxl', sheet_name='DailyData')
-                st.download_button("📥 Daily (Pre-filled)", out_d.getvalue(), "daily_prefilled.xlsx")
+        rep = st.session_state.get('ingest_report')
+        if rep:
+            st.success(f"Bulk: {rep['accepted']:,} of {rep['rows']:,} rows merged ({rep['encoding']}, {rep['seconds']:.1f}s)")
+            if rep.get('commit'):
+                if rep['commit']['state'] == 'committed': st.caption("Committed to GitHub.")
+                else: st.warning("Merged locally; the GitHub commit is still pending and will be retried." + (f" Last error: {rep['commit']['error']}" if rep['commit']['error'] else ""))
+            if rep['duplicates']: st.caption(f"{rep['duplicates']:,} duplicate (Date, Unit) rows collapsed, last one kept")
+            if rep['ignored_cols']: st.caption(f"Ignored columns: {', '.join(rep['ignored_cols'])}")
+            if rep['rejected']:
+                st.warning(f"{rep['rejected']:,} rows rejected: " + "; ".join(f"{k} ({v:,})" for k, v in rep['reasons'].items()))
+                st.download_button("⬇️ Rejected rows", rep['rejects'].to_csv(index=False), "rejected_rows.csv", mime="text/csv")
+            st.dataframe(report_frame(rep), hide_index=True)
 
     st.markdown("---")
     
     tab_conf, tab_inp = st.tabs(["⚙️ Config", "📝 Inputs"])
     
     with tab_conf:
-        lim_sox = st.number_input("SOx Limit", value=600)
-        lim_nox = st.number_input("NOx Limit", value=450)
-        t_u1 = st.number_input("U1 Target HR", 2300); g_u1 = st.number_input("U1 GCV", 3600)
-        t_u2 = st.number_input("U2 Target HR", 2310); g_u2 = st.number_input("U2 GCV", 3550)
-        t_u3 = st.number_input("U3 Target HR", 2295); g_u3 = st.number_input("U3 GCV", 3620)
-        coal_ash = st.number_input("Ash %", 35.0); pond_cap = st.number_input("Pond Cap", 500000); pond_curr = st.number_input("Pond Stock", 350000)
+        lim_sox = st.number_input("SOx Limit", value=fleet.limits['sox'])
+        lim_nox = st.number_input("NOx Limit", value=fleet.limits['nox'])
+        # One table for any number of units; defaults come from the fleet config file
+        design_df = st.data_editor(pd.DataFrame([{'Unit': u['id'], 'Plant': u['plant'], 'Target HR': u['target_hr'], 'GCV': u['gcv']} for u in fleet.units]),
+                                   disabled=['Unit', 'Plant'], hide_index=True, key="design_table")
+        coal_ash = st.number_input("Ash %", fleet.coal_ash_pct); pond_cap = st.number_input("Pond Cap", fleet.pond_cap); pond_curr = st.number_input("Pond Stock", 350000)
         
     with tab_inp:
-        configs = [{'target_hr': t_u1, 'gcv': g_u1, 'limits':{'sox':lim_sox, 'nox':lim_nox}}, 
-                   {'target_hr': t_u2, 'gcv': g_u2, 'limits':{'sox':lim_sox, 'nox':lim_nox}}, 
-                   {'target_hr': t_u3, 'gcv': g_u3, 'limits':{'sox':lim_sox, 'nox':lim_nox}}]
+        unit_configs = {str(r['Unit']): {'target_hr': float(r['Target HR']), 'gcv': float(r['GCV']), 'limits': {'sox': lim_sox, 'nox': lim_nox}} for r in design_df.to_dict('records')}
         
         def val(u_id, row_key, col_key, def_v):
             if u_id in hist_data and col_key in hist_data[u_id] and pd.notna(hist_data[u_id][col_key]):
@@ -418,92 +400,105 @@ with st.sidebar:
                 return float(sess[f"Unit {u_id}"][row_key])
             return def_v
 
-        for i in range(1, 4):
-            u = str(i)
-            d_key = date_in.strftime('%Y%m%d')
-            with st.expander(f"Unit {i}"):
-                gen = st.number_input(f"U{u} Gen", value=val(u, 'Generation (MU)', 'Gen', 8.4), key=f"g{u}_{d_key}")
-                hr = st.number_input(f"U{u} HR", value=val(u, 'Heat Rate (kcal/kWh)', 'HR', 2380.0), key=f"h{u}_{d_key}")
-                vac = st.number_input(f"U{u} Vac", value=val(u, 'Vacuum (kg/cm2)', 'Vacuum', -0.90), step=0.001, format="%.3f", key=f"v{u}_{d_key}")
-                ms = st.number_input(f"U{u} MS", value=val(u, 'MS Temp (C)', 'MS Temp', 535.0), key=f"m{u}_{d_key}")
-                fg = st.number_input(f"U{u} FG", value=val(u, 'FG Temp (C)', 'FG Temp', 135.0), key=f"f{u}_{d_key}")
-                spray = st.number_input(f"U{u} Spray", value=val(u, 'Spray (TPH)', 'Spray', 20.0), key=f"s{u}_{d_key}")
-                sox = st.number_input(f"U{u} SOx", value=val(u, 'SOx (mg/Nm3)', 'SOx', 550.0), key=f"sx{u}_{d_key}")
-                nox = st.number_input(f"U{u} NOx", value=val(u, 'NOx (mg/Nm3)', 'NOx', 400.0), key=f"nx{u}_{d_key}")
-                ash_cem = st.number_input(f"U{u} to Cement", value=val(u, 'Ash to Cement (Tons)', 'Ash Cement', 1000.0), key=f"ac{u}_{d_key}")
-                ash_brk = st.number_input(f"U{u} to Bricks", value=val(u, 'Ash to Bricks (Tons)', 'Ash Bricks', 500.0), key=f"ab{u}_{d_key}")
-                ash_p = {'ash_pct': val(u, 'Ash %', 'Coal Ash %', coal_ash), 'util_cem': ash_cem, 'util_brick': ash_brk, 'biomass': val(u, 'Biomass (Tons)', 'Biomass', 0.0)}
-                units_data.append(calculate_unit(u, gen, hr, {'vac':vac, 'ms':ms, 'fg':fg, 'spray':spray, 'sox':sox, 'nox':nox}, configs[i-1], ash_p))
-
-        st.markdown("---")
-        bio_u1 = st.number_input("Bio U1", value=val('1', 'Biomass (Tons)', 'Biomass', 0.0), key=f"b1_{d_key}")
-        bio_u2 = st.number_input("Bio U2", value=val('2', 'Biomass (Tons)', 'Biomass', 0.0), key=f"b2_{d_key}")
-        bio_u3 = st.number_input("Bio U3", value=val('3', 'Biomass (Tons)', 'Biomass', 0.0), key=f"b3_{d_key}")
-        sol_u1 = st.number_input("Solar", value=val('1', 'Solar (MU)', 'Solar', 0.0), key=f"sol_{d_key}")
+        # Every unit's inputs in one editable table; units whose inputs changed are computed as one batch (memo.units)
+        d_key = date_in.strftime('%Y%m%d')
+        input_df = pd.DataFrame([{'Unit': u, **{col: val(u, label, col, default) for col, label, default in INPUT_FIELDS}, 'Coal Ash %': val(u, 'Ash %', 'Coal Ash %', coal_ash)} for u in fleet.unit_ids])
+        input_df = st.data_editor(input_df, disabled=['Unit'], hide_index=True, key=f"inputs_{d_key}",
+                                  column_config={'Vacuum': st.column_config.NumberColumn(format="%.3f", step=0.001)})
+        with prof.span("calculate"):
+            units_data = memo_units(memo, input_df, unit_configs, coal_ash, date_in)
+        unit_inputs = input_df.set_index('Unit')
         bio_gcv = 3000.0
 
+        def prefilled_daily():
+            out_d = BytesIO()
+            daily = unit_inputs[[col for col, _, _ in INPUT_FIELDS]].T
+            daily.index = [label for _, label, _ in INPUT_FIELDS]
+            daily.columns = [f"Unit {u}" for u in daily.columns]
+            daily.rename_axis('Parameter').reset_index().to_excel(out_d, index=False, engine='openpyxl', sheet_name='DailyData')
+            return out_d.getvalue()
+        st.download_button("📥 Daily (Pre-filled)", prefilled_daily, "daily_prefilled.xlsx", on_click="ignore")
+
     if st.button("💾 Save to History", use_container_width=True):
-        repo = init_github()
-        if repo:
-            new_rows = []
-            for u in units_data:
-                row = {
-                    "Date": date_in.strftime('%Y-%m-%d'), "Unit": u['id'], "Profit": u['profit'], 
-                    "HR": u['hr'], "SOx": u['sox'], "NOx": u['nox'], "Gen": u['gen'],
-                    "Ash Util": u['ash']['utilized'], "Coal Ash %": coal_ash,
-                    "Vacuum": u['losses']['Vacuum'], "MS Temp": u['losses']['MS Temp'], "FG Temp": u['losses']['Flue Gas'], "Spray": u['losses']['Spray'],
-                    "Ash Cement": u['ash']['cem_util'], "Ash Bricks": u['ash']['brick_util'],
-                    "Biomass": bio_u1 if u['id']=='1' else (bio_u2 if u['id']=='2' else bio_u3),
-                    "Solar": sol_u1 if u['id']=='1' else 0
-                }
-                new_rows.append(row)
-            df_new = pd.DataFrame(new_rows)
-            df_comb = pd.concat([hist_df, df_new], ignore_index=True).drop_duplicates(subset=['Date', 'Unit'], keep='last')
-            save_history(repo, df_comb, sha)
-            st.success("Saved!")
-        else: st.error("No Repo")
+        new_rows = []
+        for u in units_data:
+            row = {
+                "Date": date_in.strftime('%Y-%m-%d'), "Unit": u['id'], "Profit": u['profit'], 
+                "HR": u['hr'], "SOx": u['sox'], "NOx": u['nox'], "Gen": u['gen'],
+                "Ash Util": u['ash']['utilized'], "Coal Ash %": unit_inputs.at[u['id'], 'Coal Ash %'],
+                "Vacuum": u['inputs']['vac'], "MS Temp": u['inputs']['ms'], "FG Temp": u['inputs']['fg'], "Spray": u['inputs']['spray'],
+                "Ash Cement": u['ash']['cem_util'], "Ash Bricks": u['ash']['brick_util'],
+                "Biomass": unit_inputs.at[u['id'], 'Biomass'],
+                "Solar": unit_inputs.at[u['id'], 'Solar']
+            }
+            new_rows.append(row)
+        if sync: confirm_commit(sync, sync.submit(pd.DataFrame(new_rows)), flush_interval + 30)
+        else:
+            mirror.upsert(pd.DataFrame(new_rows))
+            st.success("Saved to local mirror (offline).")
+
+    with st.expander("📦 Export History"):
+        # Multi-year ranges are streamed to a temp file month by month (excel_export.py)
+        if mirror.empty: st.caption("No history to export.")
+        else:
+            first = pd.Timestamp(mirror.months()[0] + "-01").date()
+            span = st.date_input("Range", (max(first, (date_in_ts - pd.DateOffset(years=1)).date()), date_in), min_value=first, key="export_range")
+            by = st.radio("One sheet per", ["unit", "month"], horizontal=True, key="export_by")
+            if len(span) == 2 and st.button("Build Excel export", key="export_build"):
+                bar = st.progress(0.0, "Exporting...")
+                path = excel_export.export_path(span[0], span[1], by)
+                stats = excel_export.export_range(path, mirror, span[0], span[1], unit_configs, coal_ash, by,
+                                                  progress=lambda done, total: bar.progress(done / total, f"Exporting... {done}/{total} months"))
+                bar.empty()
+                old = st.session_state.get('export')
+                if old and os.path.exists(old['path']): os.remove(old['path'])
+                st.session_state['export'] = {'path': path, 'name': f"history_{span[0]:%Y%m%d}_{span[1]:%Y%m%d}_by_{by}.xlsx", **stats}
+            exp = st.session_state.get('export')
+            if exp and os.path.exists(exp['path']):
+                st.caption(f"{exp['rows']:,} rows, {exp['sheets']} sheets, {exp['bytes'] / 1e6:.1f} MB in {exp['seconds']:.1f}s ({exp['rows_per_s']:,.0f} rows/s)")
+                def export_bytes(path=exp['path']):
+                    # Read from the temp file only when clicked
+                    with open(path, 'rb') as f:
+                        return f.read()
+                st.download_button("📥 Download .xlsx", data=export_bytes, file_name=exp['name'],
+                                   mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", on_click="ignore", key="export_download")
+
+    with st.expander("⏯️ Replay"):
+        # Per-day snapshots of a range, built in the background (replay.py); the War Room then scrubs or plays through them
+        if mirror.empty: st.caption("No history to replay.")
+        else:
+            r_span = st.date_input("Range", ((date_in_ts - timedelta(days=6)).date(), date_in), key="replay_range")
+            c_r1, c_r2 = st.columns(2)
+            if len(r_span) == 2 and c_r1.button("Start replay", key="replay_start"):
+                st.session_state['replay'] = tuple(r_span)
+                st.session_state.pop('replay_day', None)
+            if st.session_state.get('replay') and c_r2.button("Exit replay", key="replay_exit"): del st.session_state['replay']
 
 # --- CALCS & CUMULATIVE ASH POND ---
+replay = replays.get(mirror, pond, rollups, *st.session_state['replay'], fleet.unit_ids, unit_configs, coal_ash, pond_cap) if st.session_state.get('replay') and not mirror.empty else None
 fleet_profit = sum(u['profit'] for u in units_data) if units_data else 0
 fleet_ash_gen = sum(u['ash']['generated'] for u in units_data) if units_data else 0
 fleet_ash_util = sum(u['ash']['utilized'] for u in units_data) if units_data else 0
 
 # ASH POND CUMULATIVE LOGIC
-# Fix for TypeError: Use proper timestamp comparison
-pond_days_calc = 365.0
-date_in_ts = pd.Timestamp(date_in)
+# Prefix-sum index over daily net ash, maintained on every save (rollups.AshPondIndex)
+pond_days_left, remaining_cap_tons, pond_fill_date = pond.outlook(date_in_ts, pond_cap, fleet_ash_gen - fleet_ash_util)
 
-if not hist_df.empty:
-    hist_sort = hist_df[hist_df['Date'] <= date_in_ts].sort_values('Date')
-    
-    # Recalculate ash gen
-    hist_sort['Ash Gen Calc'] = (hist_sort['Gen'] * hist_sort['HR'] * 1000 / 3600) * (hist_sort['Coal Ash %'] / 100)
-    net_ash_added = hist_sort['Ash Gen Calc'].sum() - hist_sort['Ash Util'].sum()
-    remaining_cap_tons = pond_cap - net_ash_added
-    daily_net_dump = fleet_ash_gen - fleet_ash_util
-    
-    if daily_net_dump > 0:
-        pond_days_left = remaining_cap_tons / daily_net_dump
-    elif daily_net_dump < 0:
-        pond_days_left = 9999 
-    else:
-        pond_days_left = 365
-else:
-    pond_days_left = 365
-    remaining_cap_tons = pond_cap
-
-total_bio = bio_u1 + bio_u2 + bio_u3
+total_bio = float(unit_inputs['Biomass'].sum())
+total_solar = float(unit_inputs['Solar'].sum())
 bio_co2 = (total_bio * bio_gcv * 1000 / 3600) * 1.7
-sol_co2 = sol_u1 * 1000 * 0.95
+sol_co2 = total_solar * 1000 * 0.95
 green_trees = (bio_co2 + sol_co2) / 0.025
-solar_homes = (sol_u1 * 1000000) / 4
+solar_homes = (total_solar * 1000000) / 4
 bio_homes = sum(u['homes_bio'] for u in units_data) if units_data else 0
 
-curr_month_start = pd.Timestamp(date_in.replace(day=1))
-if not hist_df.empty:
-    mtd_df = hist_df[(hist_df['Date'] >= curr_month_start) & (hist_df['Date'] <= date_in_ts)]
-    mtd_profit = mtd_df['Profit'].sum() if 'Profit' in mtd_df.columns else fleet_profit
-    mtd_ash = mtd_df['Ash Util'].sum() if 'Ash Util' in mtd_df.columns else fleet_ash_util
+# MTD / FYTD from the materialized rollups (rollups.RollupStore)
+with prof.span("rollups"):
+    mtd_roll = rollups.mtd(date_in_ts) if len(rollups) else None
+    fytd_roll = rollups.fytd(date_in_ts) if len(rollups) else None
+if len(rollups):
+    mtd_profit = mtd_roll.loc['Profit', 'sum'] if mtd_roll is not None else 0
+    mtd_ash = mtd_roll.loc['Ash Util', 'sum'] if mtd_roll is not None else 0
 else:
     mtd_profit = fleet_profit
     mtd_ash = fleet_ash_util
@@ -514,15 +509,70 @@ c_top1, c_top2 = st.columns([5, 1])
 with c_top1:
     st.markdown(f"**Date:** {date_in.strftime('%d-%b-%Y')} | **Fleet P&L:** {format_lacs(fleet_profit)}")
 with c_top2:
-    if st.button("📄 A4 PDF"):
-        ash_d = {'gen':fleet_ash_gen, 'util':fleet_ash_util, 'pond_days':pond_days_left, 'bricks':sum(u['ash']['bricks_made'] for u in units_data) if units_data else 0, 'burj_pct':sum(u['ash']['burj_pct'] for u in units_data) if units_data else 0}
-        grn_d = {'bio_co2':bio_co2, 'sol_co2':sol_co2, 'trees':green_trees}
-        pdf_b = create_full_pdf(units_data, fleet_profit, ash_d, grn_d)
-        b64 = base64.b64encode(pdf_b).decode()
-        st.markdown(f'<a href="data:application/pdf;base64,{b64}" download="GMR_Report.pdf">Download</a>', unsafe_allow_html=True)
+    ash_d = {'gen':fleet_ash_gen, 'util':fleet_ash_util, 'pond_days':pond_days_left, 'bricks':sum(u['ash']['bricks_made'] for u in units_data) if units_data else 0, 'burj_pct':sum(u['ash']['burj_pct'] for u in units_data) if units_data else 0}
+    grn_d = {'bio_co2':bio_co2, 'sol_co2':sol_co2, 'trees':green_trees}
+    # Built only when clicked, and served from the report cache for unchanged inputs
+    st.download_button("📄 A4 PDF", data=lambda: pdf_engine.build_report(units_data, fleet_profit, ash_d, grn_d, date_in),
+                       file_name=f"GMR_Report_{date_in.strftime('%Y%m%d')}.pdf", mime="application/pdf", on_click="ignore")
+
+# Units in view (plant filter), laid out a page of cards at a time
+shown_units = [u for u in units_data if plant_sel is None or plant_of[u['id']] == plant_sel]
+CARDS_PER_ROW, CARDS_PER_PAGE = 3, 9
+UNIT_COLORS = ['#00ccff', '#ff8c00', '#00ff9d'] + plotly.colors.qualitative.Plotly
+unit_order = {u: i for i, u in enumerate(fleet.unit_ids)}
+
+def unit_color(u_id):
+    return UNIT_COLORS[unit_order[u_id] % len(UNIT_COLORS)] if u_id in unit_order else 'white'
+
+def unit_card(u):
+    color = "#00B981" if u['profit'] > 0 else "#EF4444"
+    border = "border-good" if u['profit'] > 0 else "border-bad"
+    if u['status'] == "SHUTDOWN":
+        border = "border-shut"
+        color = "#888"
+    plant = f"{plant_of[u['id']]} · " if len(fleet.plants) > 1 else ""
+    st.markdown(f"""
+    <div class="glass-card {border}">
+        <div class="unit-header">{plant}UNIT {u['id']}</div>
+        <div class="big-val" style="color:{color}">{format_lacs(u['profit'])}</div>
+        <div class="sub-lbl">{u['status'] if u['status']=='SHUTDOWN' else 'Daily Net Impact'}</div>
+        <hr style="border-color:#ffffff33;">
+        <div style="text-align:left; font-size:12px;">
+            <div style="display:flex; justify-content:space-between;"><span>Target:</span><b>{u['target_hr']:.0f}</b></div>
+            <div style="display:flex; justify-content:space-between;"><span>Actual:</span><b>{u['hr']:.0f}</b></div>
+            <div style="margin-top:5px; border-top:1px solid #444; padding-top:5px;">
+                SOx: <span style="color:{'#EF4444' if u['sox']>u['limits']['sox'] else '#fff'}">{u['sox']}</span> | NOx: {u['nox']}
+            </div>
+        </div>
+    </div>
+    """, unsafe_allow_html=True)
 
 # TABS
-tabs = st.tabs(["🏠 War Room", "🌿 Sustainability", "🪨 Ash", "☀️ Green", "⚙️ Unit 1", "⚙️ Unit 2", "⚙️ Unit 3", "📈 Trends", "🎮 Sim", "ℹ️ Info"])
+# Lazy tabs: on_change="rerun" tracks the selected tab, and only its body runs
+TAB_NAMES = ["🏠 War Room", "🌿 Sustainability", "🪨 Ash", "☀️ Green", "⚙️ Units", "📈 Trends", "🎮 Sim", "ℹ️ Info"]
+tabs = st.tabs(TAB_NAMES, key="main_tabs", on_change="rerun")
+
+def timed_tab(name):
+    def deco(render):
+        @functools.wraps(render)
+        def wrapper(*args):
+            # A fragment rerun runs only this function, so it is profiled and logged on its own
+            own = profiler.current() is None
+            tab_prof = profiler.start("fragment", tab=name) if own else profiler.current()
+            t0 = time.perf_counter()
+            with tab_prof.span(f"tab:{name}"):
+                render(*args)
+            ms = (time.perf_counter() - t0) * 1000
+            st.session_state.setdefault('tab_timings', {})[name] = ms
+            st.caption(f"⏱️ {name} rendered in {ms:.0f} ms")
+            if own: profiler.finish(tab_prof, profile_log)
+        return wrapper
+    return deco
+
+def render_tab(i, render, *args):
+    if not tabs[i].open: return
+    with tabs[i]:
+        render(*args)
 
 def display_info(summary, formula):
     with st.expander("ℹ️ How to Read This Tab"):
@@ -530,61 +580,156 @@ def display_info(summary, formula):
         st.markdown(f"**Formula:** `{formula}`")
 
 # TAB 1: WAR ROOM
-with tabs[0]:
-    display_info("Executive Summary. Profit > 0 (Green) / Loss (Red).", "Shutdown Loss = 350MW * 24h * 1000 * 3 Rs")
-    st.markdown('<div class="section-header">📅 Daily Snapshot</div>', unsafe_allow_html=True)
-    cols = st.columns(4)
-    if units_data:
-        for i, u in enumerate(units_data):
-            color = "#00B981" if u['profit'] > 0 else "#EF4444"
-            border = "border-good" if u['profit'] > 0 else "border-bad"
-            if u['status'] == "SHUTDOWN":
-                border = "border-shut"
-                color = "#888"
-            diff = u['target_hr'] - u['hr']
-            with cols[i]:
-                st.markdown(f"""
-                <div class="glass-card {border}">
-                    <div class="unit-header">UNIT {u['id']}</div>
-                    <div class="big-val" style="color:{color}">{format_lacs(u['profit'])}</div>
-                    <div class="sub-lbl">{u['status'] if u['status']=='SHUTDOWN' else 'Daily Net Impact'}</div>
-                    <hr style="border-color:#ffffff33;">
-                    <div style="text-align:left; font-size:12px;">
-                        <div style="display:flex; justify-content:space-between;"><span>Target:</span><b>{u['target_hr']:.0f}</b></div>
-                        <div style="display:flex; justify-content:space-between;"><span>Actual:</span><b>{u['hr']:.0f}</b></div>
-                        <div style="margin-top:5px; border-top:1px solid #444; padding-top:5px;">
-                            SOx: <span style="color:{'#EF4444' if u['sox']>600 else '#fff'}">{u['sox']}</span> | NOx: {u['nox']}
-                        </div>
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
-    
-    with cols[3]:
-        clr = "#00B981" if pond_days_left > 60 else "#EF4444"
-        display_days = f"{pond_days_left:.0f}" if pond_days_left < 9999 else "Increasing"
+def daily_snapshot(units, days_left, remaining, fill_date):
+    c_units, c_pond = st.columns([CARDS_PER_ROW, 1])
+    with c_units:
+        # Paged, so the page costs the same for 3 units or 30
+        pages = max(1, -(-len(units) // CARDS_PER_PAGE))
+        page = st.segmented_control("Page", list(range(1, pages + 1)), default=1, key="card_page") if pages > 1 else 1
+        page_units = units[((page or 1) - 1) * CARDS_PER_PAGE:(page or 1) * CARDS_PER_PAGE]
+        for r in range(0, len(page_units), CARDS_PER_ROW):
+            cols = st.columns(CARDS_PER_ROW)
+            for col, u in zip(cols, page_units[r:r + CARDS_PER_ROW]):
+                with col: unit_card(u)
+
+    with c_pond:
+        clr = "#00B981" if days_left > 60 else "#EF4444"
+        display_days = f"{days_left:.0f}" if days_left < 9999 else "Increasing"
         st.markdown(f"""
         <div class="glass-card" style="border-top: 4px solid {clr}">
             <div class="unit-header">ASH POND</div>
             <div class="big-val" style="color:{clr}">{display_days}</div>
             <div class="sub-lbl">Days Left (Cumulative)</div>
-            <div style="font-size:11px; color:#aaa; margin-top:5px;">Cap: {pond_cap/1000:,.0f}k | Rem: {remaining_cap_tons/1000:,.0f}k</div>
+            <div style="font-size:11px; color:#aaa; margin-top:5px;">Cap: {pond_cap/1000:,.0f}k | Rem: {remaining/1000:,.0f}k{f" | Full: {fill_date:%d-%b-%Y}" if fill_date is not None else ""}</div>
         </div>""", unsafe_allow_html=True)
 
+    if len(units) > CARDS_PER_PAGE:
+        with st.expander(f"📋 All {len(units)} units"):
+            st.dataframe(pd.DataFrame([{'Plant': plant_of[u['id']], 'Unit': u['id'], 'Status': u['status'], 'Profit (Lac)': u['profit'] / 100000,
+                                        'Gen': u['gen'], 'HR': u['hr'], 'Target HR': u['target_hr'], 'SOx': u['sox'], 'NOx': u['nox']} for u in units]),
+                         hide_index=True, width="stretch")
+
+def mtd_section(profit, ash):
     st.markdown('<div class="section-header">📆 Monthly Performance (MTD)</div>', unsafe_allow_html=True)
     c_m1, c_m2, c_m3 = st.columns(3)
-    c_m1.metric("MTD Fleet Profit", format_lacs(mtd_profit))
-    c_m2.metric("MTD Ash Utilization", f"{mtd_ash:,.0f} Tons")
+    c_m1.metric("MTD Fleet Profit", format_lacs(profit))
+    c_m2.metric("MTD Ash Utilization", f"{ash:,.0f} Tons")
     c_m3.info("MTD Data aggregates from 1st of month to selected date.")
 
+REPLAY_STEP = float(secret("REPLAY_STEP", 1.0))  # seconds per day while playing
+
+LIVE_REFRESH = float(secret("HISTORIAN_REFRESH", 10))  # seconds between live view refreshes
+
+def live_view():
+    # A fragment on a timer: reads the feed's in-memory aggregates only, never the whole history
+    status = historian.status()
+    if status['latest'] is None:
+        st.info(f"Waiting for the historian feed ({live_source})...")
+        return
+    day, live_units = historian.partial(unit_configs, coal_ash)
+    latest = pd.Timestamp(status['latest'], unit='s')
+    st.markdown(f"**Live:** {day:%d-%b-%Y} to {latest:%H:%M} | **Fleet P&L so far:** {format_lacs(sum(u['profit'] for u in live_units))}")
+    live_units = [u for u in live_units if plant_sel is None or plant_of[u['id']] == plant_sel]
+    for r in range(0, len(live_units), CARDS_PER_ROW):
+        cols = st.columns(CARDS_PER_ROW)
+        for col, u in zip(cols, live_units[r:r + CARDS_PER_ROW]):
+            with col: unit_card(u)
+    tag = st.selectbox("Tag", LIVE_TAGS, key="live_tag")
+    fig = go.Figure()
+    for u in live_units:
+        x, y = historian.series(u['id'], tag)
+        fig.add_trace(go.Scattergl(x=x, y=y, name=f"Unit {u['id']}", mode='lines', line=dict(color=unit_color(u['id']))))
+    fig.update_layout(height=250, margin=dict(l=0, r=0, t=10, b=0), template='plotly_dark', paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)',
+                      yaxis=dict(title=tag + (" (MW)" if tag == 'Gen' else ""), showgrid=False), legend=dict(orientation="h", y=1.15))
+    plotly_chart(st, fig, width="stretch", key="live_chart")
+    last = f"{(time.time() - status['last_flush']) / 60:.0f} min ago" if status['last_flush'] else "not yet"
+    st.caption(f"{status['points']:,} points | {status['buffered']:,} buffered | {status['rejected']:,} rejected, {status['late']:,} late, {status['stale']:,} repeated"
+               f" | Flushed to history: {last}" + (f" | Flush error: {status['error']}" if status['error'] else ""))
+
+def replay_chart(days, profit, day):
+    colors = ['#F59E0B' if d == day else ('#00B981' if p > 0 else '#EF4444') for d, p in zip(days, profit)]
+    fig = go.Figure(go.Bar(x=days, y=np.asarray(profit) / 1e5, marker_color=colors, hovertemplate="%{x|%d-%b}: ₹ %{y:,.2f} Lac<extra></extra>"))
+    fig.update_layout(height=220, margin=dict(l=0, r=0, t=10, b=0), template='plotly_dark', paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)',
+                      yaxis=dict(title="Fleet P&L (₹ Lac)", showgrid=False), xaxis=dict(showgrid=False))
+    return fig
+
+def replay_view():
+    # A fragment: scrubbing (or a play tick) reruns only this, reading the precomputed snapshots
+    if replay.error is not None:
+        st.error(f"Replay failed: {replay.error}")
+        return
+    if not replay.ready:
+        st.progress(replay.progress, f"Preparing replay... {len(replay.snapshots)}/{len(replay.days)} days")
+        st.session_state['replay_pending'] = True
+        return
+    if st.session_state.pop('replay_pending', False) and not st.session_state.get('replay_play'):
+        st.rerun()  # built: one full rerun to stop polling
+    days = replay.days
+    if st.session_state.get('replay_day') not in days: st.session_state['replay_day'] = days[0]
+    elif st.session_state.get('replay_play'):
+        st.session_state['replay_day'] = days[(days.index(st.session_state['replay_day']) + 1) % len(days)]
+    day = st.select_slider("Day", days, key="replay_day", format_func=lambda d: f"{d:%a %d-%b-%Y}")
+    snap = replay.snapshots[day]
+    st.markdown(f"**Replay:** {day:%d-%b-%Y} | **Fleet P&L:** {format_lacs(snap['fleet_profit']) if snap['units'] else 'no saved data'}")
+    st.caption(f"{len(snap['saved'])} of {len(snap['saved']) + len(snap['missing'])} units saved this day"
+               + (f"; not shown (no saved row): {', '.join(snap['missing'])}" if snap['missing'] else "") + f". {len(days)} days built in {replay.seconds:.1f}s.")
+    if snap['units']:
+        daily_snapshot([u for u in snap['units'] if plant_sel is None or plant_of[u['id']] == plant_sel],
+                       snap['pond_days_left'], snap['remaining_cap'], snap['pond_fill_date'])
+    else: st.info("Nothing was saved for this day.")
+    series = replay.frame()
+    fig = memo.get('replay_chart', (series, day), lambda: replay_chart(series['Date'].tolist(), series['Profit'].tolist(), day))
+    plotly_chart(st, fig, width="stretch", key="replay_chart")
+    mtd_section(snap['mtd_profit'], snap['mtd_ash'])
+
+@timed_tab(TAB_NAMES[0])
+def tab_war_room():
+    display_info("Executive Summary. Profit > 0 (Green) / Loss (Red).", "Shutdown Loss = 350MW * 24h * 1000 * 3 Rs")
+    if replay is not None:
+        st.markdown(f'<div class="section-header">⏯️ Replay {replay.start:%d-%b} – {replay.end:%d-%b-%Y}</div>', unsafe_allow_html=True)
+        playing = st.toggle("▶️ Play", key="replay_play", help=f"Advance one day every {REPLAY_STEP:g}s")
+        st.fragment(replay_view, run_every=REPLAY_STEP if playing or not replay.ready else None)()
+    else:
+        if historian is not None:
+            st.markdown('<div class="section-header">📡 Live (partial day)</div>', unsafe_allow_html=True)
+            st.fragment(live_view, run_every=LIVE_REFRESH)()
+        st.markdown('<div class="section-header">📅 Daily Snapshot</div>', unsafe_allow_html=True)
+        daily_snapshot(shown_units, pond_days_left, remaining_cap_tons, pond_fill_date)
+        mtd_section(mtd_profit, mtd_ash)
+
+    st.markdown(f'<div class="section-header">🗓️ Financial Year to Date ({fy_label(date_in_ts)})</div>', unsafe_allow_html=True)
+    if fytd_roll is not None:
+        c_y1, c_y2, c_y3, c_y4 = st.columns(4)
+        c_y1.metric("FYTD Fleet Profit", format_lacs(fytd_roll.loc['Profit', 'sum']))
+        c_y2.metric("FYTD Generation", f"{fytd_roll.loc['Gen', 'sum']:,.1f} MU")
+        fytd_hr = fytd_roll.loc['HR', 'mean']  # NaN when no unit ran (HR is averaged over running days only)
+        c_y3.metric("FYTD Avg HR", f"{fytd_hr:,.0f} kcal/kWh" if pd.notna(fytd_hr) else "—")
+        c_y4.metric("FYTD Ash Utilization", f"{fytd_roll.loc['Ash Util', 'sum']:,.0f} Tons")
+        with st.expander("📊 Monthly Profit by Unit"):
+            st.dataframe(rollups.frame('month', 'Profit').rename(columns={'*': 'Fleet'}).map(format_lacs), width="stretch")
+        if len(fleet.plants) > 1:
+            # Cross-plant view from the same unit buckets
+            plant_rows = []
+            for pid, name in fleet.plants.items():
+                p_roll = rollups.fytd(date_in_ts, [u['id'] for u in fleet.units_in(pid)])
+                if p_roll is None: continue
+                plant_rows.append({'Plant': name, 'FYTD Profit': format_lacs(p_roll.loc['Profit', 'sum']), 'FYTD Gen (MU)': round(p_roll.loc['Gen', 'sum'], 1),
+                                   'Avg HR': round(p_roll.loc['HR', 'mean']) if pd.notna(p_roll.loc['HR', 'mean']) else None, 'Ash Util (T)': round(p_roll.loc['Ash Util', 'sum'])})
+            st.dataframe(pd.DataFrame(plant_rows), hide_index=True, width="stretch")
+            with st.expander("📊 Monthly Profit by Plant"):
+                st.dataframe(rollups.frame('month', 'Profit', groups={u: fleet.plants[p] for u, p in plant_of.items()}).map(format_lacs), width="stretch")
+    else: st.info("No history for this financial year yet.")
+
 # TAB 2: COMPLIANCE
-with tabs[1]:
+@timed_tab(TAB_NAMES[1])
+def tab_compliance():
     display_info("Tracks Emission Compliance & Green Initiatives.", "Total Emissions = Gen * Emission Factor")
     c1, c2 = st.columns(2)
     with c1:
         st.markdown("#### 🌍 Emissions Status")
-        fleet_sox = sum(u['sox'] for u in units_data)/3 if units_data else 0
-        st.metric("Avg SOx", f"{fleet_sox:.0f} mg/Nm3", delta=f"{600-fleet_sox:.0f} headroom")
-        if fleet_sox > 600: st.error("⚠️ FLEET ACID RAIN RISK")
+        fleet_sox = sum(u['sox'] for u in units_data)/len(units_data) if units_data else 0
+        st.metric("Avg SOx", f"{fleet_sox:.0f} mg/Nm3", delta=f"{lim_sox-fleet_sox:.0f} headroom")
+        if fleet_sox > lim_sox: st.error("⚠️ FLEET ACID RAIN RISK")
     with c2:
         st.markdown("#### 🌳 Greenbelt Reality Check")
         real_trees = 354762
@@ -595,24 +740,28 @@ with tabs[1]:
         c_g2.metric("Virtual Offset", f"{virtual_trees:,.0f}")
 
 # TAB 3: ASH
-with tabs[2]:
+@timed_tab(TAB_NAMES[2])
+def tab_ash():
     display_info("Ash Utilization, Stock, and Brick Potential.", "Pond Life = Remaining Cap / (Gen - Util)")
     c1, c2 = st.columns(2)
     with c1:
         st.metric("Ash Generated", f"{fleet_ash_gen:,.0f} T")
         st.metric("Ash Utilized", f"{fleet_ash_util:,.0f} T", delta=f"{(fleet_ash_util/fleet_ash_gen*100 if fleet_ash_gen else 0):.1f}%")
         if units_data:
-            ash_breakdown = pd.DataFrame({'Type': ['Cement', 'Bricks'], 'Tons': [sum(u['ash']['cem_util'] for u in units_data), sum(u['ash']['brick_util'] for u in units_data)]})
-            fig_pie = px.pie(ash_breakdown, values='Tons', names='Type', hole=0.4, template='plotly_dark')
-            fig_pie.update_layout(height=200, margin=dict(l=0,r=0,t=0,b=0), paper_bgcolor='rgba(0,0,0,0)')
-            st.plotly_chart(fig_pie, use_container_width=True)
+            tons = (sum(u['ash']['cem_util'] for u in units_data), sum(u['ash']['brick_util'] for u in units_data))
+            fig_pie = memo.get('ash_pie', tons, lambda: ash_figure(*tons))
+            plotly_chart(st, fig_pie, use_container_width=True)
     with c2:
         burj = sum(u['ash']['burj_pct'] for u in units_data) if units_data else 0
         st.markdown(f'<div class="burj-text">{burj:.2f}%</div>', unsafe_allow_html=True)
         st.markdown("of a **Burj Khalifa** (Volume Equivalent)")
+        if len(pond):
+            trend_fill = pond.fill_date(date_in_ts, pond_cap)
+            st.metric("Pond Full (30-day trend)", f"{trend_fill:%d-%b-%Y}" if trend_fill is not None else "Not filling", delta=f"{pond.daily_rate(date_in_ts):,.0f} T/day net", delta_color="inverse")
 
 # TAB 4: RENEWABLES
-with tabs[3]:
+@timed_tab(TAB_NAMES[3])
+def tab_renewables():
     display_info("Impact of Biomass Co-firing and Solar Power.", "CO2 Saved = Coal Equiv * 1.7")
     st.markdown("#### ⚡ Green Power Impact")
     
@@ -647,51 +796,217 @@ with tabs[3]:
         - **CO2:** 0.95 kg/kWh for Solar, Net-Zero for Biomass (Avoided Coal).
         """)
         
-    if anim_sun: st_lottie(anim_sun, height=150, key="sun_anim")
-
-# TABS 5-7: UNITS
-if units_data:
-    for i, tab in enumerate([tabs[4], tabs[5], tabs[6]]):
-        with tab:
-            u = units_data[i]
-            render_unit_detail(u, configs)
+    anim_sun = lottie.get("sun")
+    if anim_sun: streamlit_lottie.st_lottie(anim_sun, height=150, key="sun_anim")
+
+# TAB 5: UNITS
+# One tab for the whole fleet: only the selected unit's detail is rendered
+@timed_tab(TAB_NAMES[4])
+def tab_units():
+    if not shown_units: return
+    by_id = {u['id']: u for u in shown_units}
+    pick = st.selectbox("Unit", list(by_id), format_func=lambda i: f"{fleet.plants[plant_of[i]]} - Unit {i}" if len(fleet.plants) > 1 else f"Unit {i}", key="unit_detail")
+    render_unit_detail(by_id[pick])
+    render_quality_flags(pick)
+
+def render_quality_flags(u_id, days=30):
+    # Data-quality flags for the unit over the last `days` (quality.py); shown even for a shutdown unit
+    flags = quality.flags(date_in_ts - timedelta(days=days - 1), date_in_ts, [u_id])
+    st.markdown(f"#### 🚩 Data Quality ({days} days)")
+    if flags.empty:
+        st.caption("No outliers, stuck readings or incomplete rows.")
+    else:
+        st.dataframe(flags.drop(columns='Unit').round({'Value': 2, 'Mean': 2, 'z': 1}), hide_index=True, width="stretch")
+    hr = quality.window_stats(u_id, 'HR')
+    if hr: st.caption(f"HR window: last {hr['n']} running days, mean {hr['mean']:,.1f} ± {hr['std']:,.1f}, IQR {hr['q1']:,.1f}-{hr['q3']:,.1f}")
 
 # TAB 8: TRENDS
-with tabs[7]:
-    display_info("Historical Performance Analysis", "Double-click legend to isolate Unit.")
-    filter_opt = st.radio("Duration", ["7 Days", "30 Days"], horizontal=True)
-    if not hist_df.empty:
-        days_back = 7 if filter_opt=="7 Days" else 30
-        cutoff = date_in - timedelta(days=days_back)
-        cutoff_ts = pd.Timestamp(cutoff)
-        filtered_df = hist_df[(hist_df['Date'] >= cutoff_ts) & (hist_df['Date'] <= date_in_ts)]
-        
-        filtered_df = filtered_df[filtered_df['HR'] > 100] # Hide Shutdowns
-        
-        filtered_df['Date_dt'] = filtered_df['Date'].dt.date
-        filtered_df['Unit'] = filtered_df['Unit'].astype(str)
-        fig = make_subplots(specs=[[{"secondary_y": True}]])
-        colors = {'1': '#00ccff', '2': '#ff8c00', '3': '#00ff9d'}
-        for u_id in filtered_df['Unit'].unique():
-            u_df = filtered_df[filtered_df['Unit'] == u_id]
-            fig.add_trace(go.Scatter(x=u_df['Date_dt'], y=u_df['HR'], name=f"Unit {u_id} HR", mode='lines+markers', line=dict(color=colors.get(u_id, 'white'))), secondary_y=False)
-        fleet_trend = filtered_df.groupby('Date_dt')['Profit'].sum().reset_index()
-        fig.add_trace(go.Bar(x=fleet_trend['Date_dt'], y=fleet_trend['Profit'], name="Fleet Profit", opacity=0.3, marker_color='white'), secondary_y=True)
-        fig.update_layout(title="Heat Rate vs Profit", template="plotly_dark", paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', hovermode="x unified", legend=dict(orientation="h", y=1.1))
-        fig.update_yaxes(title_text="Heat Rate", secondary_y=False, showgrid=False)
-        fig.update_yaxes(title_text="Profit", secondary_y=True, showgrid=False)
-        st.plotly_chart(fig, use_container_width=True)
-    else: st.info("No history data available.")
+TREND_RANGES = {"7 Days": 7, "30 Days": 30, "90 Days": 90, "1 Year": 365, "All": None}
+TREND_METRICS = [c for c in NUM_COLS if c != 'Target HR'] + ['Coal Ash %']
+# Fragments: the Duration radio / Simulator controls rerun only their own tab
+def trends_figure(metric, fleet_metric, traces, fleet_xy, flags):
+    # traces: [(unit id, x, y)]; fleet_xy: (x, y) or None; flags: quality.flags() frame or None
+    fig = plotly_subplots.make_subplots(specs=[[{"secondary_y": True}]])
+    for u_id, x, y in traces:
+        fig.add_trace(go.Scattergl(x=x, y=y, name=f"Unit {u_id} {metric}", mode='lines+markers' if len(x) <= 120 else 'lines', line=dict(color=unit_color(u_id))), secondary_y=False)
+    if fleet_xy is not None:
+        x, y = fleet_xy
+        fig.add_trace(go.Scattergl(x=x, y=y, name=f"Fleet {fleet_metric}", mode='lines', fill='tozeroy', opacity=0.3, line=dict(color='white', width=1)), secondary_y=True)
+    if flags is not None:
+        # Flagged readings on top of the (downsampled) lines, so none are hidden by the point budget
+        for u_id, f in flags.groupby('Unit'):
+            fig.add_trace(go.Scatter(x=f['Date'], y=f['Value'], name=f"Unit {u_id} flags", mode='markers', customdata=f['Flag'],
+                                     marker=dict(symbol='x', size=9, color=unit_color(u_id), line=dict(width=1, color='#FF3333')),
+                                     hovertemplate="%{customdata}: %{y}<extra></extra>"), secondary_y=False)
+    fig.update_layout(title=f"{metric} vs Fleet {fleet_metric}" if fleet_metric != "None" else metric, template="plotly_dark", paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', hovermode="x unified", legend=dict(orientation="h", y=1.1))
+    fig.update_xaxes(rangeslider_visible=True)
+    fig.update_yaxes(title_text=metric, secondary_y=False, showgrid=False)
+    fig.update_yaxes(title_text=fleet_metric, secondary_y=True, showgrid=False)
+    return fig
+
+@st.fragment
+@timed_tab(TAB_NAMES[5])
+def tab_trends():
+    display_info("Historical Performance Analysis", "Double-click legend to isolate Unit. Long ranges are downsampled on the server.")
+    c1, c2, c3, c4 = st.columns([3, 2, 2, 2])
+    filter_opt = c1.radio("Duration", list(TREND_RANGES), horizontal=True)
+    metric = c2.selectbox("Unit metric", TREND_METRICS, index=TREND_METRICS.index('HR'))
+    fleet_metric = c3.selectbox("Fleet total", ["None"] + TREND_METRICS, index=1 + TREND_METRICS.index('Profit'))
+    method = c4.radio("Downsampling", list(DOWNSAMPLE_METHODS), horizontal=True)
+    recalc = st.toggle("Recompute Profit with current Config", value=False)
+    if mirror.empty:
+        st.info("No history data available.")
+        return
+    days_back = TREND_RANGES[filter_opt]
+    start_ts = date_in_ts - timedelta(days=days_back) if days_back else pd.Timestamp(mirror.months()[0] + "-01")
+    # Recomputed profit depends on the Config tab, so it is part of the cache key
+    extra = (tuple(sorted((k, v['target_hr'], v['gcv']) for k, v in unit_configs.items())), coal_ash) if recalc else None
+
+    def rows(col):
+        def load():
+            cols = None if recalc and col == 'Profit' else list(dict.fromkeys(['Unit', 'HR', col]))
+            df = mirror.read(start_ts, date_in_ts, columns=cols)
+            df = df[df['HR'] > 100] # Hide Shutdowns
+            if recalc and col == 'Profit': df = df.assign(Profit=calculate_fleet(df, unit_configs, coal_ash)['profit'])
+            return df
+        return load
+
+    units = [u['id'] for u in shown_units]
+    unit_series = series_cache.series(rows(metric), start_ts, date_in_ts, units, metric, method, extra=extra if metric == 'Profit' else None)
+    traces = [(u_id, *unit_series[u_id]) for u_id in units if len(unit_series[u_id][0])]
+    fleet_xy = series_cache.series(rows(fleet_metric), start_ts, date_in_ts, [SERIES_FLEET], fleet_metric, method, extra=extra if fleet_metric == 'Profit' else None)[SERIES_FLEET] if fleet_metric != "None" else None
+    flags = quality.flags(start_ts, date_in_ts, units, metric) if metric in QUALITY_METRICS else None
+    n_points = sum(len(x) for _, x, _ in traces) + (len(fleet_xy[0]) if fleet_xy else 0)
+    # Keyed on the plotted arrays themselves, so a new day or a re-save rebuilds it and a widget elsewhere does not
+    fig = memo.get('trends', (metric, fleet_metric, traces, fleet_xy, flags, [unit_color(u) for u in units]), lambda: trends_figure(metric, fleet_metric, traces, fleet_xy, flags))
+    plotly_chart(st, fig, use_container_width=True)
+    c_stats = series_cache.stats()
+    st.caption(f"{n_points:,} points plotted (budget {POINT_BUDGET:,} per trace, {method}) | Series cache: {c_stats['hits']} hits / {c_stats['misses']} misses")
+    all_flags = quality.flags(start_ts, date_in_ts, units)
+    with st.expander(f"🚩 Data-quality flags ({len(all_flags):,})"):
+        if all_flags.empty: st.caption("None in this range.")
+        else:
+            st.caption(" | ".join(f"{k}: {v:,}" for k, v in all_flags['Flag'].value_counts().items()))
+            st.dataframe(all_flags.round({'Value': 2, 'Mean': 2, 'z': 1}), hide_index=True, width="stretch")
 
 # TAB 9: SIMULATOR
-with tabs[8]:
-    st.markdown("### 🎮 Simulator")
-    s_vac = st.slider("Target Vacuum", -0.85, -0.99, -0.92)
-    new_loss = (abs(s_vac) - 0.92) * 100 * 15
-    st.metric("Impact", f"{new_loss:.1f} kcal/kWh")
+SIM_MODES = ["Tornado", "Surface", "Monte Carlo"]
+@st.fragment
+@timed_tab(TAB_NAMES[6])
+def tab_simulator():
+    display_info("What-If Simulator", "Scenarios run through the same loss/profit engine as the dashboard. Changing vacuum, temperatures or spray shifts the heat rate by the change in controllable losses.")
+    running = [u['id'] for u in shown_units if u['status'] == "RUNNING"]
+    if not running:
+        st.info("No running units to simulate for this date.")
+        return
+    c1, c2 = st.columns([2, 3])
+    uid = c1.selectbox("Unit", running, format_func=lambda i: f"Unit {i}", key="sim_unit")
+    mode = c2.radio("Analysis", SIM_MODES, horizontal=True, key="sim_mode")
+    base = dict(unit_inputs.loc[uid, [c for c in SIM_BASE_COLS if c != 'GCV']].astype(float), GCV=unit_configs[uid]['gcv'])
+    target_hr = unit_configs[uid]['target_hr']
+    seed_ranges = pd.DataFrame([{"Param": p, "Unit": SIM_UNITS[p], "Current": base[p], "Low": lo, "High": hi} for p, (lo, hi) in default_ranges(base).items()])
+    with st.expander("Parameter ranges", expanded=False):
+        rng_df = st.data_editor(seed_ranges, hide_index=True, disabled=["Param", "Unit", "Current"], use_container_width=True, key=f"sim_ranges_{uid}")
+    ranges = {r['Param']: (min(r['Low'], r['High']), max(r['Low'], r['High'])) for r in rng_df.to_dict('records')}
+
+    t0 = time.perf_counter()
+    if mode == "Tornado":
+        tor, base_profit = sim_tornado(base, target_hr, ranges)
+        fig = go.Figure()
+        labels = [f"{p} ({lo:g} – {hi:g})" for p, lo, hi in zip(tor['Param'], tor['Low'], tor['High'])]
+        fig.add_trace(go.Bar(y=labels, x=tor['Profit @ Low'] / 1e5, orientation='h', name="At Low", marker_color='#3498db'))
+        fig.add_trace(go.Bar(y=labels, x=tor['Profit @ High'] / 1e5, orientation='h', name="At High", marker_color='#e67e22'))
+        fig.update_layout(barmode='overlay', title=f"Profit change vs baseline (₹ {base_profit / 1e5:,.2f} Lac)", xaxis_title="Δ Profit (₹ Lac)", template="plotly_dark", paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', legend=dict(orientation="h", y=1.1))
+        plotly_chart(st, fig, use_container_width=True)
+    elif mode == "Surface":
+        params = list(ranges)
+        c1, c2, c3 = st.columns(3)
+        x = c1.selectbox("X axis", params, index=params.index('Vacuum'), key="sim_x")
+        y = c2.selectbox("Y axis", [p for p in params if p != x], key="sim_y")
+        steps = c3.slider("Grid steps", 20, 150, 60, 10, key="sim_steps")
+        xs, ys, profit = sim_surface(base, target_hr, ranges, x, y, steps)
+        fig = go.Figure(go.Contour(x=xs, y=ys, z=profit / 1e5, colorscale='RdYlGn', colorbar=dict(title="₹ Lac"), contours=dict(showlabels=True)))
+        fig.add_trace(go.Scatter(x=[base[x]], y=[base[y]], mode='markers', marker=dict(symbol='x', size=12, color='white'), name="Current"))
+        fig.update_layout(title=f"Profit over {x} × {y} ({steps}×{steps} grid)", xaxis_title=f"{x} ({SIM_UNITS[x]})", yaxis_title=f"{y} ({SIM_UNITS[y]})", template="plotly_dark", paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)')
+        plotly_chart(st, fig, use_container_width=True)
+    else:
+        c1, c2 = st.columns(2)
+        n = c1.select_slider("Samples", [10_000, 50_000, 100_000, 200_000, 500_000], value=MC_SAMPLES, key="sim_n")
+        seed = c2.number_input("Seed", 0, 10_000, 0, key="sim_seed")
+        samples, sens = sim_monte_carlo(base, target_hr, ranges, n, seed)
+        p5, p50, p95 = np.percentile(samples['profit'], [5, 50, 95]) / 1e5
+        m1, m2, m3, m4 = st.columns(4)
+        m1.metric("P5", f"₹ {p5:,.2f} L"); m2.metric("P50", f"₹ {p50:,.2f} L"); m3.metric("P95", f"₹ {p95:,.2f} L")
+        m4.metric("P(Profit > 0)", f"{(samples['profit'] > 0).mean():.1%}")
+        c1, c2 = st.columns([3, 2])
+        counts, edges = np.histogram(samples['profit'] / 1e5, bins=80)
+        fig = go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, marker_color='#00C853'))
+        for v, lbl in ((p5, "P5"), (p50, "P50"), (p95, "P95")):
+            fig.add_vline(x=v, line_dash="dash", line_color="white", annotation_text=lbl)
+        fig.update_layout(title="Profit distribution", xaxis_title="₹ Lac", bargap=0, template="plotly_dark", paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)')
+        plotly_chart(c1, fig, use_container_width=True)
+        fig = go.Figure(go.Bar(x=sens.values, y=sens.index, orientation='h', marker_color=np.where(sens.values > 0, '#00C853', '#FF3D00')))
+        fig.update_layout(title="Rank sensitivity (Spearman)", xaxis=dict(range=[-1, 1]), template="plotly_dark", paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)')
+        plotly_chart(c2, fig, use_container_width=True)
+    info = sim_cache_info()
+    st.caption(f"{mode} in {(time.perf_counter() - t0) * 1000:.1f} ms | Cache: " + ", ".join(f"{k} {v.hits}/{v.hits + v.misses} hits" for k, v in info.items()))
 
 # TAB 10: INFO
-with tabs[9]:
+@timed_tab(TAB_NAMES[7])
+def tab_info():
     try: st.image("1000051705.jpg", use_container_width=True)
     except: pass
     st.markdown("### 5S Pillars: Sort, Set in Order, Shine, Standardize, Sustain")
+
+render_tab(0, tab_war_room)
+render_tab(1, tab_compliance)
+render_tab(2, tab_ash)
+render_tab(3, tab_renewables)
+render_tab(4, tab_units)
+render_tab(5, tab_trends)
+render_tab(6, tab_simulator)
+render_tab(7, tab_info)
+
+# --- PROFILER ---
+prof.tags['tab'] = st.session_state.get('main_tabs')
+rerun_rec = profiler.finish(prof, profile_log)
+
+@st.cache_data(ttl=60, show_spinner=False)
+def profile_history(path, days):
+    # Keyed on the log and window only: new runs show up once the TTL expires
+    log_df = profiler.load_log(path, days)
+    if not len(log_df): return None, None, None
+    cold = log_df[log_df['seq'] == 1] if 'seq' in log_df.columns else log_df.iloc[:0]
+    return profiler.percentiles(log_df), profiler.daily(log_df), cold.reindex(columns=['ts', 'total_ms', 'span:imports']).tail(10)
+
+if show_admin:
+    with st.sidebar.expander("🛠️ Performance", expanded=False):
+        c_run, c_rss = st.columns(2)
+        c_run.metric("This rerun", f"{rerun_rec['total_ms']:,.0f} ms")
+        c_rss.metric("Process RSS", f"{rerun_rec['rss_mb']:,.0f} MB", help="One process serves every session; history frames are shared, not per session")
+        st.dataframe(pd.DataFrame([{'Span': k, 'ms': v, 'Calls': rerun_rec['calls'][k]} for k, v in sorted(rerun_rec['spans'].items(), key=lambda kv: -kv[1])]),
+                     hide_index=True, width="stretch")
+        if rerun_rec['counters']:
+            st.caption(" | ".join(f"{k}: {v:,}" for k, v in rerun_rec['counters'].items()))
+        if profile_log:
+            days = st.radio("Log window", [1, 7, 30], format_func=lambda d: f"{d}d", horizontal=True, key="profile_days")
+            pct, per_day, cold = profile_history(profile_log, days)
+            if pct is not None:
+                st.dataframe(pct.round(1), width="stretch")
+                if len(per_day) > 1: st.line_chart(per_day[['p50', 'p95']])
+                if len(cold):
+                    st.markdown("**Cold starts** (first rerun of a process: time to first paint)")
+                    st.dataframe(cold.rename(columns={'total_ms': 'first paint ms', 'span:imports': 'imports ms'}).round({'first paint ms': 0, 'imports ms': 0}), hide_index=True, width="stretch")
+            st.caption(f"Log: {profile_log}")
+        shared = mirror.memory()
+        if shared:
+            st.markdown(f"**Shared history frames** ({sum(r['MB'] for r in shared):.2f} MB)")
+            st.dataframe(pd.DataFrame(shared).round(3), hide_index=True, width="stretch")
+        memo_stats = memo.stats()
+        if memo_stats:
+            hits, total = sum(r['Hits'] for r in memo_stats), sum(r['Hits'] + r['Misses'] for r in memo_stats)
+            st.markdown(f"**Memoized results** ({hits / max(1, total):.0%} hit rate, {sum(r['Saved ms'] for r in memo_stats) / 1000:,.1f} s saved since start)")
+            st.dataframe(pd.DataFrame(memo_stats).round({'Hit rate': 3, 'Build ms': 0, 'Saved ms': 0}), hide_index=True, width="stretch",
+                         column_config={'Hit rate': st.column_config.NumberColumn(format="percent")})
+        st.markdown("**Imports**" + (" (cold start)" if rerun_rec['seq'] == 1 else ""))
+        st.dataframe(pd.DataFrame(import_report()), hide_index=True, width="stretch")
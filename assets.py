@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from profiler import count
+
+# --- LOTTIE ASSET STORE ---
+LOTTIE_URLS = {
+    "tree": "https://lottie.host/6e35574d-8651-477d-b570-56965c276b3b/22572535-373f-42a9-823c-99e582862594.json",
+    "smoke": "https://lottie.host/575a66c6-1215-4688-9189-b57579621379/10839556-9141-4712-a89e-224429715783.json",
+    "money": "https://lottie.host/02008323-2895-4673-863a-4934e402802d/41838634-11d9-430c-992a-356c92d529d3.json",
+    "sun": "https://lottie.host/3c6c9e04-0391-4e9e-99f2-2b6f3c02d139/2Y7Q1j1j1j.json",
+}
+CACHE_DIR = ".lottie_cache"
+
+
+class LottieStore:
+    # Animations are served from memory and never fetched on the render path.
+    # Whatever is on disk (checksum-verified) is loaded at start-up; anything
+    # missing is downloaded concurrently in the background and written back, so
+    # the first rerun after that picks it up. get() returns None until then.
+    def __init__(self, urls=LOTTIE_URLS, cache_dir=CACHE_DIR, timeout=5, retry_after=600):
+        self.urls, self.cache_dir, self.timeout, self.retry_after = dict(urls), cache_dir, timeout, retry_after
+        self._data = {}
+        self._failed = {}  # name -> time of last failed fetch
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, len(self.urls)), thread_name_prefix="lottie")
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_disk()
+        self._schedule([n for n in self.urls if n not in self._data])
+
+    def _path(self, name):
+        return os.path.join(self.cache_dir, f"{name}.json")
+
+    def _manifest(self):
+        try:
+            with open(os.path.join(self.cache_dir, "manifest.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _load_disk(self):
+        manifest = self._manifest()
+        for name, url in self.urls.items():
+            meta = manifest.get(name)
+            if not meta or meta.get("url") != url: continue
+            try:
+                with open(self._path(name), 'rb') as f:
+                    raw = f.read()
+                if hashlib.sha256(raw).hexdigest() == meta.get("sha256"):
+                    self._data[name] = json.loads(raw)
+            except (OSError, ValueError):
+                pass
+
+    def _schedule(self, names):
+        with self._lock:
+            names = [n for n in names if n not in self._pending]
+            self._pending.update(names)
+        for name in names:
+            self._pool.submit(self._fetch, name)
+
+    def _fetch(self, name):
+        t0 = time.perf_counter()
+        try:
+            import requests  # background thread only, so it stays off the first paint
+            r = requests.get(self.urls[name], timeout=self.timeout)
+            if r.status_code != 200: raise ValueError(r.status_code)
+            raw = r.content
+            count("lottie_bytes", len(raw))
+            data = json.loads(raw)
+            with self._lock:
+                self._data[name] = data
+                self._failed.pop(name, None)
+                manifest = self._manifest()
+                tmp = self._path(name) + ".tmp"
+                with open(tmp, 'wb') as f:
+                    f.write(raw)
+                os.replace(tmp, self._path(name))
+                manifest[name] = {"url": self.urls[name], "sha256": hashlib.sha256(raw).hexdigest(), "fetched": time.time()}
+                with open(os.path.join(self.cache_dir, "manifest.json"), 'w') as f:
+                    json.dump(manifest, f, indent=1)
+        except Exception:
+            with self._lock:
+                self._failed[name] = time.monotonic()
+        finally:
+            count("lottie_ms", round((time.perf_counter() - t0) * 1000))
+            with self._lock:
+                self._pending.discard(name)
+
+    def get(self, name):
+        data = self._data.get(name)
+        if data is None:
+            failed = self._failed.get(name)
+            if failed is not None and time.monotonic() - failed > self.retry_after:
+                self._schedule([name])
+        return data
+
+    def status(self):
+        return {n: ("ready" if n in self._data else "failed" if n in self._failed else "loading") for n in self.urls}
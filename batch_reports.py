@@ -0,0 +1,209 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from engine import calculate_unit
+from fleet import FLEET_FILE, INPUT_DEFAULTS, load_fleet
+from history_mirror import MIRROR_DIR, HistoryMirror, merge_rows, typed
+from history_store import LocalRepo, parse_history
+from pdf_engine import create_full_pdf
+
+# --- HEADLESS BATCH REPORTS ---
+# Same report as the "📄 A4 PDF" button, generated unattended for a date range:
+# one PDF per day and/or one consolidated PDF per month, rendered in a process
+# pool. <out>/manifest.json records a hash of each finished report's inputs, so
+# a re-run (e.g. after a crash) only renders what is missing or has changed.
+#
+#   python batch_reports.py --fy 2025 --mode both --workers 4
+#   python batch_reports.py --start 2025-04-01 --end 2025-06-30 --csv plant_history_v28.csv
+
+BIO_GCV = 3000.0
+REPORT_COLS = ['Date', 'Unit', 'Coal Ash %'] + list(INPUT_DEFAULTS)
+
+
+def open_repo():
+    # Same sources as the app: a local stand-in repo, or GitHub from the environment
+    if os.environ.get("HISTORY_LOCAL_REPO"): return LocalRepo(os.environ["HISTORY_LOCAL_REPO"])
+    if os.environ.get("GITHUB_TOKEN") and os.environ.get("REPO_NAME"):
+        from github import Auth, Github
+        return Github(auth=Auth.Token(os.environ["GITHUB_TOKEN"])).get_repo(os.environ["REPO_NAME"], lazy=True)
+    return None
+
+
+def load_range(start, end, csv=None, mirror_dir=MIRROR_DIR, branch="main"):
+    if csv:
+        with open(csv, encoding='utf-8', errors='replace') as f:
+            df = merge_rows(None, typed(parse_history(f.read())).drop_duplicates(subset=['Date', 'Unit'], keep='last'))
+        df = df[(df['Date'] >= start) & (df['Date'] <= end)]
+    else:
+        mirror = HistoryMirror(mirror_dir)
+        mirror.pull(open_repo(), branch, ttl=0)
+        df = mirror.read(start, end)
+    return df.reindex(columns=[c for c in REPORT_COLS if c in df.columns])
+
+
+# --- KPIs (calculate_unit, as the dashboard computes a day) ---
+def unit_kpis(row, configs, ash_pct):
+    v = lambda c: float(row[c]) if c in row and pd.notna(row[c]) else INPUT_DEFAULTS[c]
+    design = configs[row['Unit']]
+    pct = float(row['Coal Ash %']) if pd.notna(row.get('Coal Ash %')) and row.get('Coal Ash %') else ash_pct
+    ash_p = {'ash_pct': pct, 'util_cem': v('Ash Cement'), 'util_brick': v('Ash Bricks'), 'biomass': v('Biomass')}
+    inputs = {'vac': v('Vacuum'), 'ms': v('MS Temp'), 'fg': v('FG Temp'), 'spray': v('Spray'), 'sox': v('SOx'), 'nox': v('NOx')}
+    return calculate_unit(row['Unit'], v('Gen'), v('HR'), inputs, design, ash_p)
+
+
+def report_inputs(rows, configs, ash_pct):
+    units = [unit_kpis(r, configs, ash_pct) for r in rows]
+    bio = sum(float(r.get('Biomass') or 0) for r in rows)
+    solar = sum(float(r.get('Solar') or 0) for r in rows)
+    bio_co2 = (bio * BIO_GCV * 1000 / 3600) * 1.7
+    sol_co2 = solar * 1000 * 0.95
+    ash_d = {'gen': sum(u['ash']['generated'] for u in units), 'util': sum(u['ash']['utilized'] for u in units)}
+    grn_d = {'bio_co2': bio_co2, 'sol_co2': sol_co2, 'trees': (bio_co2 + sol_co2) / 0.025}
+    return units, sum(u['profit'] for u in units), ash_d, grn_d
+
+
+def consolidate(units):
+    # One row per unit for a month: totals for flows, generation-weighted HR, means for the rest
+    out = []
+    for uid in sorted({u['id'] for u in units}, key=lambda x: (len(x), x)):
+        us = [u for u in units if u['id'] == uid]
+        gen = sum(u['gen'] for u in us)
+        mean = lambda f: sum(f(u) for u in us) / len(us)
+        out.append({
+            'id': uid, 'gen': round(gen, 2), 'hr': round(sum(u['hr'] * u['gen'] for u in us) / gen, 1) if gen else 0,
+            'profit': sum(u['profit'] for u in us), 'sox': round(mean(lambda u: u['sox']), 1), 'nox': round(mean(lambda u: u['nox']), 1),
+            'escerts': sum(u['escerts'] for u in us), 'carbon': sum(u['carbon'] for u in us),
+            'losses': {k: mean(lambda u: u['losses'][k]) for k in us[0]['losses']},
+        })
+    return out
+
+
+def render_task(task):
+    # Runs in a worker process: KPIs + PDF for one day or one month, written atomically
+    name, kind, period, rows, configs, ash_pct, path = task
+    t0 = time.perf_counter()
+    units, pnl, ash_d, grn_d = report_inputs(rows, configs, ash_pct)
+    if kind == 'month':
+        days = len({r['Date'] for r in rows})
+        data = create_full_pdf(consolidate(units), pnl, ash_d, grn_d, parallel=False, period=f"{period} ({days} days)")
+    else:
+        data = create_full_pdf(units, pnl, ash_d, grn_d, report_date=pd.Timestamp(period), parallel=False)
+    with open(path + ".tmp", 'wb') as f:
+        f.write(data)
+    os.replace(path + ".tmp", path)
+    return name, len(data), time.perf_counter() - t0
+
+
+# --- PLANNING / RESUME ---
+def plan(df, mode, configs, ash_pct, out_dir):
+    df = df.assign(Date=df['Date'].dt.strftime('%Y-%m-%d'))
+    groups = []
+    if mode in ('daily', 'both'):
+        groups += [('day', day, rows) for day, rows in df.groupby('Date')]
+    if mode in ('monthly', 'both'):
+        groups += [('month', month, rows) for month, rows in df.groupby(df['Date'].str[:7])]
+    tasks = []
+    for kind, period, rows in groups:
+        records = rows.sort_values(['Date', 'Unit']).to_dict('records')
+        name = f"{kind}/GMR_Report_{period.replace('-', '')}.pdf"
+        digest = hashlib.sha256(json.dumps([records, configs, ash_pct], sort_keys=True, default=str).encode()).hexdigest()
+        tasks.append((name, digest, (name, kind, period, records, configs, ash_pct, os.path.join(out_dir, name))))
+    return tasks
+
+
+def load_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, "manifest.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(out_dir, manifest):
+    path = os.path.join(out_dir, "manifest.json")
+    with open(path + ".tmp", 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def run(df, out_dir, mode='both', workers=None, fleet=None, ash_pct=None, force=False, log=print):
+    fleet = fleet or load_fleet()
+    configs = fleet.configs()
+    ash_pct = fleet.coal_ash_pct if ash_pct is None else ash_pct
+    # Rows for units the fleet config does not know have no design values to report against
+    unknown = sorted(set(df['Unit']) - set(configs))
+    if unknown:
+        log(f"Skipping rows for units not in the fleet config: {', '.join(unknown)}")
+        df = df[df['Unit'].isin(list(configs))]
+    for kind in ('day', 'month'): os.makedirs(os.path.join(out_dir, kind), exist_ok=True)
+    manifest = {} if force else load_manifest(out_dir)
+    tasks = plan(df, mode, configs, ash_pct, out_dir)
+    todo = [t for t in tasks if force or manifest.get(t[0]) != t[1] or not os.path.exists(os.path.join(out_dir, t[0]))]
+    stats = {'planned': len(tasks), 'skipped': len(tasks) - len(todo), 'done': 0, 'failed': 0, 'bytes': 0}
+    log(f"{len(tasks)} reports planned, {stats['skipped']} already up to date, {len(todo)} to render")
+    t0 = time.perf_counter()
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(render_task, t[2]): t for t in todo}
+            for fut in as_completed(futures):
+                name, digest, _ = futures[fut]
+                try:
+                    _, size, _ = fut.result()
+                except Exception as e:
+                    stats['failed'] += 1
+                    log(f"FAILED {name}: {e}")
+                    continue
+                stats['done'] += 1
+                stats['bytes'] += size
+                # Recorded as each report lands, so a crash loses at most the ones in flight
+                manifest[name] = digest
+                save_manifest(out_dir, manifest)
+                if stats['done'] % 25 == 0 or stats['done'] == len(todo):
+                    elapsed = time.perf_counter() - t0
+                    log(f"{stats['done']}/{len(todo)} rendered, {stats['done'] / elapsed:.1f} reports/s")
+    stats['elapsed'] = time.perf_counter() - t0
+    stats['rate'] = stats['done'] / stats['elapsed'] if stats['elapsed'] > 0 else 0.0
+    return stats
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Render GMR 5S PDF reports for a date range")
+    span = p.add_mutually_exclusive_group(required=True)
+    span.add_argument("--fy", type=int, help="financial year starting April of this year, e.g. 2025 for FY2025-26")
+    span.add_argument("--start", help="first day, YYYY-MM-DD")
+    p.add_argument("--end", help="last day, YYYY-MM-DD (default: same as --start)")
+    p.add_argument("--mode", choices=['daily', 'monthly', 'both'], default='both')
+    p.add_argument("--out", default="reports")
+    p.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    p.add_argument("--csv", help="read this history CSV instead of the local mirror")
+    p.add_argument("--mirror", default=os.environ.get("HISTORY_MIRROR_DIR", MIRROR_DIR))
+    p.add_argument("--branch", default=os.environ.get("BRANCH", "main"))
+    p.add_argument("--fleet", default=os.environ.get("FLEET_CONFIG", FLEET_FILE), help="fleet config (plants, units, design values)")
+    p.add_argument("--ash-pct", type=float, default=None, help="default Coal Ash %% (default: from the fleet config)")
+    p.add_argument("--force", action="store_true", help="re-render everything, ignoring the manifest")
+    args = p.parse_args(argv)
+
+    if args.fy:
+        start, end = pd.Timestamp(args.fy, 4, 1), pd.Timestamp(args.fy + 1, 3, 31)
+    else:
+        start = pd.Timestamp(args.start)
+        end = pd.Timestamp(args.end) if args.end else start
+    df = load_range(start, end, args.csv, args.mirror, args.branch)
+    if df.empty:
+        print(f"No history between {start.date()} and {end.date()}")
+        return 1
+    stats = run(df, args.out, args.mode, args.workers, fleet=load_fleet(args.fleet), ash_pct=args.ash_pct, force=args.force)
+    print(f"Done: {stats['done']} rendered, {stats['skipped']} skipped, {stats['failed']} failed, "
+          f"{stats['bytes'] / 1e6:.1f} MB in {stats['elapsed']:.1f}s ({stats['rate']:.1f} reports/s)")
+    return 1 if stats['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
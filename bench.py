@@ -0,0 +1,359 @@
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from engine import calculate_fleet, calculate_unit, fleet_units
+from fleet import FLEET_FILE, INPUT_FIELDS, load_fleet
+from history_store import HISTORY_FILE, HistoryIndex, parse_history
+
+# --- BENCHMARK SUITE ---
+# Times the dashboard's hot paths against synthetic histories of growing size.
+# Each size is generated once into a temp dir, then every case runs in its own
+# worker process (memory is returned in between, and a case that runs out of
+# memory is recorded as failed instead of killing the run). Results go to a JSON file; --compare flags cases that got slower.
+#
+#   python bench.py --sizes 10k,1M,10M --out bench_results.json
+#   python bench.py --sizes 1M --compare bench_baseline.json --threshold 1.25
+#   python bench.py --sizes 1M --write-csv synthetic.csv
+
+SIZES = "10k,1M,10M"
+CASES = ['parse', 'mirror_write', 'day_lookup', 'rollup_build', 'mtd', 'ash_pond', 'calculate_unit', 'calculate_fleet', 'trends', 'pdf']
+MAX_YEARS = 30           # history longer than this gets more units instead (Timestamps end in 2262)
+SCALAR_ROWS = 20_000     # calculate_unit is timed on a sample; the per-row cost is what matters
+TREND_UNITS = 3
+GEN_CHUNK = 1_000_000
+TIME_BUDGET = 10.0       # stop repeating a case once it has used this many seconds
+MIN_DELTA = 0.005        # slowdowns smaller than this (s) are timer noise, not regressions
+START = "2015-04-01"
+SAMPLED = ['Gen', 'HR', 'Vacuum', 'MS Temp', 'FG Temp', 'Spray', 'SOx', 'NOx', 'Ash Util', 'Ash Cement', 'Ash Bricks', 'Coal Ash %', 'Biomass', 'Solar']
+HIST_COLS = ['Date', 'Unit', 'Gen', 'HR', 'Target HR', 'Profit', 'Vacuum', 'MS Temp', 'FG Temp', 'Spray', 'SOx', 'NOx', 'Ash Util', 'Ash Cement', 'Ash Bricks', 'Coal Ash %', 'Biomass', 'Solar']
+# Running-unit ranges and zero share seen in plant_history_v28.csv, used when no real CSV is at hand
+DEFAULT_PROFILE = {
+    'Gen': (6.0, 8.56, 0.0), 'HR': (1655.0, 2900.0, 0.0), 'Vacuum': (-0.94, -0.88, 0.0), 'MS Temp': (530.0, 542.0, 0.0),
+    'FG Temp': (128.0, 140.0, 0.0), 'Spray': (10.0, 25.0, 0.0), 'SOx': (450.0, 650.0, 0.0), 'NOx': (350.0, 480.0, 0.0),
+    'Ash Util': (2200.0, 2710.0, 0.0), 'Ash Cement': (1100.0, 1625.0, 0.0), 'Ash Bricks': (550.0, 812.0, 0.0),
+    'Coal Ash %': (44.0, 47.1, 0.0), 'Biomass': (300.0, 600.0, 0.933), 'Solar': (0.01, 0.02, 0.0),
+}
+DEFAULT_SHUTDOWN = 0.074
+
+
+# --- SYNTHETIC HISTORY ---
+def parse_size(s):
+    s = s.strip().lower()
+    mult = {'k': 1_000, 'm': 1_000_000}.get(s[-1], 1)
+    return int(float(s[:-1] if mult > 1 else s) * mult)
+
+
+def layout(rows, n_fleet):
+    # (units, days) for a history of about `rows` rows: the fleet's own units for
+    # up to MAX_YEARS of days, more units beyond that
+    units = max(n_fleet, math.ceil(rows / (MAX_YEARS * 365)))
+    return units, math.ceil(rows / units)
+
+
+def profile_from(df):
+    # Empirical distribution of each column over running unit-days: 101 quantiles
+    # of the non-zero values plus the share of zeros, and the shutdown share
+    df = df[df['Date'].notna()]
+    running = df[(df['Gen'] > 0) & (df['HR'] > 0)]
+    prof = {}
+    for c in SAMPLED:
+        s = pd.to_numeric(running[c], errors='coerce').dropna()
+        nz = s[s != 0]
+        prof[c] = (np.quantile(nz, np.linspace(0, 1, 101)) if len(nz) else np.zeros(101), float((s == 0).mean()) if len(s) else 0.0)
+    return prof, 1 - len(running) / len(df)
+
+
+def default_profile():
+    return {c: (np.linspace(lo, hi, 101), zero) for c, (lo, hi, zero) in DEFAULT_PROFILE.items()}, DEFAULT_SHUTDOWN
+
+
+def unit_configs(units, fleet):
+    # Synthetic units reuse the fleet's design values in turn
+    base = list(fleet.configs().values())
+    return {str(i + 1): base[i % len(base)] for i in range(units)}
+
+
+def synth_history(units, days, profile=None, shutdown=None, noise=1.0, seed=0, start=START, configs=None, ash_pct=35.0):
+    # units x days of history with the checked-in CSV's columns. Each column is drawn
+    # from its empirical distribution (inverse CDF of the profile quantiles);
+    # noise scales the spread around the median (1.0 = as observed).
+    if profile is None: profile, default_shutdown = default_profile()
+    else: default_shutdown = DEFAULT_SHUTDOWN
+    shutdown = default_shutdown if shutdown is None else shutdown
+    configs = configs or unit_configs(units, load_fleet())
+    rng = np.random.default_rng(seed)
+    n = units * days
+    dates = pd.date_range(start, periods=days, freq='D')
+    ids = [str(i + 1) for i in range(units)]
+    cols = {'Date': np.repeat(dates.to_numpy(), units), 'Unit': np.tile(np.array(ids, dtype=object), days)}
+    grid = np.linspace(0, 1, 101)
+    for c in SAMPLED:
+        q, zero = profile[c]
+        med = q[50]
+        v = np.interp(rng.random(n), grid, q)
+        if noise != 1.0: v = med + (v - med) * noise
+        if zero: v[rng.random(n) < zero] = 0.0
+        cols[c] = np.round(v, 2, out=v)
+    cols['HR'][rng.random(n) < shutdown] = 0.0
+    cols['Target HR'] = np.tile(np.array([configs[u]['target_hr'] for u in ids], dtype='float64'), days)
+    cols['Profit'] = np.empty(n)
+    df = pd.DataFrame({c: cols[c] for c in HIST_COLS}, copy=False)
+    # In slices, so 10M rows do not need calculate_fleet's temporaries for all of them at once
+    for lo in range(0, n, GEN_CHUNK):
+        part = df.iloc[lo:lo + GEN_CHUNK]
+        cols['Profit'][lo:lo + GEN_CHUNK] = np.round(calculate_fleet(part, configs, ash_pct)['profit'].to_numpy(), 2)
+    return df
+
+
+def load_profile(like):
+    if not like: return None, None
+    with open(like, encoding='utf-8', errors='replace') as f:
+        return profile_from(parse_history(f.read()))
+
+
+# --- TIMING ---
+def timed(fn, repeat):
+    runs, out = [], None
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        out = fn()
+        runs.append(time.perf_counter() - t0)
+        if sum(runs) > TIME_BUDGET: break
+    return runs, out
+
+
+def result(case, runs, **extra):
+    return {'case': case, 'seconds': min(runs), 'mean': float(np.mean(runs)), 'runs': len(runs), **extra}
+
+
+def prepare(rows, workdir, repeat, noise, seed, like, fleet_path, time_mirror):
+    # Worker: generate one size into workdir (history.parquet + a mirror), once for all its cases
+    from history_mirror import HistoryMirror
+    fleet = load_fleet(fleet_path)
+    units, days = layout(rows, len(fleet.unit_ids))
+    profile, shutdown = load_profile(like)
+    t0 = time.perf_counter()
+    df = synth_history(units, days, profile, shutdown, noise, seed, configs=unit_configs(units, fleet), ash_pct=fleet.coal_ash_pct)
+    setup = {'rows': len(df), 'units': units, 'days': days, 'generate_s': round(time.perf_counter() - t0, 3), 'last': str(df['Date'].iloc[-1].date())}
+    df.to_parquet(os.path.join(workdir, "history.parquet"), index=False)
+    runs, _ = timed(lambda: HistoryMirror(os.path.join(workdir, "mirror")).replace_all(df, sha="bench"), repeat if time_mirror else 1)
+    return setup, [result('mirror_write', runs, months=len(HistoryMirror(os.path.join(workdir, "mirror")).months()))] if time_mirror else []
+
+
+def run_case(case, workdir, setup, repeat, fleet_path):
+    # Worker: time one case against a prepared size
+    from history_mirror import HistoryMirror
+    from rollups import POND_COLS, ROLLUP_COLS, AshPondIndex, RollupStore
+    fleet = load_fleet(fleet_path)
+    configs = unit_configs(setup['units'], fleet)
+    mirror = HistoryMirror(os.path.join(workdir, "mirror"))
+    last = pd.Timestamp(setup['last'])
+    history = lambda: pd.read_parquet(os.path.join(workdir, "history.parquet"))
+
+    if case == 'parse':
+        # load_history's cost once the blob is fetched: CSV text -> typed frame
+        text = history().to_csv(index=False, date_format='%Y-%m-%d')
+        runs, _ = timed(lambda: parse_history(text), repeat)
+        return [result(case, runs, mb=round(len(text) / 1e6, 1))]
+    if case == 'day_lookup':
+        # As app.py: the day's month as a shared index of the input columns, then the day.
+        # Timed cold (index built); warm_ms is every later session/rerun on that month.
+        month, cols = last.strftime('%Y-%m'), ['Unit'] + [c for c, _, _ in INPUT_FIELDS] + ['Coal Ash %']
+
+        def cold():
+            mirror._indexes.clear()
+            return mirror.index(month, cols).day(last)
+        runs, snap = timed(cold, repeat)
+        warm, _ = timed(lambda: mirror.index(month, cols).day(last), repeat)
+        return [result(case, runs, units_found=len(snap), warm_ms=round(min(warm) * 1000, 2))]
+    if case in ('rollup_build', 'mtd'):
+        store = RollupStore()
+        frame = mirror.read(columns=ROLLUP_COLS)
+        runs, _ = timed(lambda: store.on_reset(frame), repeat if case == 'rollup_build' else 1)
+        if case == 'rollup_build': return [result(case, runs)]
+        runs, _ = timed(lambda: (store.mtd(last), store.fytd(last)), repeat)
+        return [result(case, runs)]
+    if case == 'ash_pond':
+        frame = mirror.read(columns=POND_COLS)
+        pond = AshPondIndex()
+        build, _ = timed(lambda: pond.on_reset(frame), repeat)
+        query, _ = timed(lambda: (pond.net_as_of(last), pond.fill_date(last, fleet.pond_cap)), repeat)
+        return [result(case, build), result('ash_pond_query', query)]
+    if case == 'calculate_unit':
+        recs = pd.read_parquet(os.path.join(workdir, "history.parquet")).tail(SCALAR_ROWS).to_dict('records')
+
+        def scalar():
+            for r in recs:
+                inputs = {'vac': r['Vacuum'], 'ms': r['MS Temp'], 'fg': r['FG Temp'], 'spray': r['Spray'], 'sox': r['SOx'], 'nox': r['NOx']}
+                ash_p = {'ash_pct': r['Coal Ash %'], 'util_cem': r['Ash Cement'], 'util_brick': r['Ash Bricks'], 'biomass': r['Biomass']}
+                calculate_unit(r['Unit'], r['Gen'], r['HR'], inputs, configs[r['Unit']], ash_p)
+        runs, _ = timed(scalar, repeat)
+        return [result(case, runs, sample_rows=len(recs), us_per_row=round(min(runs) / len(recs) * 1e6, 2))]
+    if case == 'calculate_fleet':
+        df = history()
+        runs, _ = timed(lambda: calculate_fleet(df, configs, fleet.coal_ash_pct), repeat)
+        return [result(case, runs)]
+    if case == 'trends':
+        # tab_trends on "All": fresh series cache, a few units plus the fleet total, Scattergl figure
+        from plotly.subplots import make_subplots
+        import plotly.graph_objects as go
+        from downsample import FLEET, SeriesCache
+        shown = [str(i + 1) for i in range(min(setup['units'], TREND_UNITS))]
+        start = pd.Timestamp(mirror.months()[0] + "-01")
+
+        def rows_fn(col):
+            def load():
+                df = mirror.read(start, last, columns=list(dict.fromkeys(['Unit', 'HR', col])))
+                return df[df['HR'] > 100]
+            return load
+
+        def trends():
+            cache = SeriesCache()
+            fig = make_subplots(specs=[[{"secondary_y": True}]])
+            for u, (x, y) in cache.series(rows_fn('HR'), start, last, shown, 'HR').items():
+                fig.add_trace(go.Scattergl(x=x, y=y, name=f"Unit {u} HR", mode='lines'), secondary_y=False)
+            x, y = cache.series(rows_fn('Profit'), start, last, [FLEET], 'Profit')[FLEET]
+            fig.add_trace(go.Scattergl(x=x, y=y, name="Fleet Profit", mode='lines', fill='tozeroy'), secondary_y=True)
+            return fig.to_json()
+        runs, _ = timed(trends, repeat)
+        return [result(case, runs, units_plotted=len(shown))]
+    if case == 'pdf':
+        # One day's report for the configured fleet (the PDF does not grow with history)
+        from pdf_engine import create_full_pdf
+        day = HistoryIndex(mirror.read(last, last)).day(last).reset_index()
+        units_data = fleet_units(day[day['Unit'].isin(fleet.unit_ids)], configs, fleet.coal_ash_pct)
+        ash_d = {'gen': sum(u['ash']['generated'] for u in units_data), 'util': sum(u['ash']['utilized'] for u in units_data), 'pond_days': 365,
+                 'bricks': sum(u['ash']['bricks_made'] for u in units_data), 'burj_pct': sum(u['ash']['burj_pct'] for u in units_data)}
+        grn_d = {'bio_co2': 0.0, 'sol_co2': 0.0, 'trees': 0.0}
+        runs, pdf = timed(lambda: create_full_pdf(units_data, sum(u['profit'] for u in units_data), ash_d, grn_d, last, parallel=False), repeat)
+        return [result(case, runs, units=len(units_data), kb=round(len(pdf) / 1024, 1))]
+    raise ValueError(f"unknown case {case}")
+
+
+def in_worker(fn, *args):
+    # One process per call: memory goes back to the OS afterwards, and an
+    # out-of-memory kill fails just this call
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        return pool.submit(fn, *args).result()
+
+
+# --- RESULTS ---
+def git_rev():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def meta():
+    return {'when': datetime.now().isoformat(timespec='seconds'), 'git': git_rev(), 'python': platform.python_version(),
+            'pandas': pd.__version__, 'numpy': np.__version__, 'platform': platform.platform(), 'cpus': os.cpu_count()}
+
+
+def compare(results, baseline, threshold):
+    # -> rows of (size, case, old s, new s, ratio, regressed)
+    old = {(r['size'], r['case']): r['seconds'] for r in baseline.get('results', []) if 'seconds' in r}
+    out = []
+    for r in results:
+        key = (r['size'], r['case'])
+        if key not in old or 'seconds' not in r: continue
+        ratio = r['seconds'] / old[key] if old[key] > 0 else float('inf')
+        out.append((r['size'], r['case'], old[key], r['seconds'], ratio, ratio > threshold and r['seconds'] - old[key] > MIN_DELTA))
+    return out
+
+
+def fmt_s(s):
+    return f"{s * 1000:.1f} ms" if s < 1 else f"{s:.2f} s"
+
+
+def show(r):
+    extra = ", ".join(f"{k}={v}" for k, v in r.items() if k not in ('case', 'seconds', 'mean', 'runs'))
+    print(f"  {r['case']:<16}{fmt_s(r['seconds']):>12}  (best of {r['runs']}{', ' + extra if extra else ''})", flush=True)
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Benchmark the dashboard's hot paths on synthetic history")
+    p.add_argument("--sizes", default=SIZES, help=f"comma-separated row counts, e.g. 10k,1M (default: {SIZES})")
+    p.add_argument("--cases", default=",".join(CASES), help="comma-separated subset of: " + ", ".join(CASES))
+    p.add_argument("--repeat", type=int, default=3, help="runs per case; the best is reported")
+    p.add_argument("--noise", type=float, default=1.0, help="spread of the synthetic values around the median (1.0 = as observed)")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--like", default=HISTORY_FILE if os.path.exists(HISTORY_FILE) else None, help="history CSV whose column distributions to mimic")
+    p.add_argument("--fleet", default=os.environ.get("FLEET_CONFIG", FLEET_FILE))
+    p.add_argument("--out", default="bench_results.json")
+    p.add_argument("--compare", help="earlier results file to compare against")
+    p.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio that counts as a regression")
+    p.add_argument("--write-csv", help="only write the synthetic history for the (first) size to this CSV")
+    args = p.parse_args(argv)
+
+    sizes = [s.strip() for s in args.sizes.split(",") if s.strip()]
+    cases = [c.strip() for c in args.cases.split(",") if c.strip()]
+    unknown = sorted(set(cases) - set(CASES))
+    if unknown: p.error(f"unknown case(s): {', '.join(unknown)}")
+
+    if args.write_csv:
+        fleet = load_fleet(args.fleet)
+        units, days = layout(parse_size(sizes[0]), len(fleet.unit_ids))
+        profile, shutdown = load_profile(args.like)
+        df = synth_history(units, days, profile, shutdown, args.noise, args.seed, configs=unit_configs(units, fleet), ash_pct=fleet.coal_ash_pct)
+        df.to_csv(args.write_csv, index=False, date_format='%Y-%m-%d')
+        print(f"Wrote {len(df):,} rows ({units} units x {days} days) to {args.write_csv}")
+        return 0
+
+    report = {'meta': meta(), 'config': {'repeat': args.repeat, 'noise': args.noise, 'seed': args.seed, 'like': args.like}, 'sizes': {}, 'results': []}
+    for size in sizes:
+        rows = parse_size(size)
+        print(f"== {size} rows ==", flush=True)
+        with tempfile.TemporaryDirectory(prefix="bench_") as workdir:
+            try:
+                setup, results = in_worker(prepare, rows, workdir, args.repeat, args.noise, args.seed, args.like, args.fleet, 'mirror_write' in cases)
+            except Exception as e:
+                reason = "worker died (out of memory?)" if isinstance(e, BrokenProcessPool) else str(e)
+                print(f"  generating failed: {reason}; skipping this size")
+                report['sizes'][size] = {'rows': rows, 'error': reason}
+                continue
+            report['sizes'][size] = setup
+            print(f"  {setup['rows']:,} rows ({setup['units']} units x {setup['days']} days), generated in {setup['generate_s']:.1f}s", flush=True)
+            for r in results: show(r)
+            for case in [c for c in cases if c != 'mirror_write']:
+                try:
+                    results += in_worker(run_case, case, workdir, setup, args.repeat, args.fleet)
+                except Exception as e:
+                    reason = "worker died (out of memory?)" if isinstance(e, BrokenProcessPool) else str(e)
+                    results.append({'case': case, 'error': reason})
+                    print(f"  {case:<16}{'FAILED':>12}  ({reason})", flush=True)
+                    continue
+                for r in results[-2:] if case == 'ash_pond' else results[-1:]: show(r)
+        for r in results: r['size'] = size
+        report['results'] += results
+
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=1)
+    print(f"Results written to {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            rows = compare(report['results'], json.load(f), args.threshold)
+        regressed = [r for r in rows if r[5]]
+        print(f"\nvs {args.compare} (regression > {args.threshold:.2f}x):")
+        for size, case, old, new, ratio, bad in rows:
+            print(f"  {size:>5} {case:<16}{fmt_s(old):>12} -> {fmt_s(new):>10}  {ratio:5.2f}x{'  REGRESSION' if bad else ''}")
+        return 1 if regressed else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# --- SERVER-SIDE DOWNSAMPLING FOR TRENDS ---
+# Long ranges are reduced to a fixed number of points per trace before they are
+# sent to the browser. lttb keeps the visual shape (Largest-Triangle-Three-
+# Buckets); minmax keeps every bucket's extremes, so spikes are never lost.
+POINT_BUDGET = 1000
+FLEET = '*'
+
+
+def lttb(x, y, n):
+    # Indices of the n points LTTB keeps; x, y are float arrays sorted by x
+    size = len(x)
+    if n >= size or n < 3: return np.arange(size)
+    edges = np.linspace(1, size - 1, n - 1).astype(np.int64)  # n-2 buckets between the fixed end points
+    keep = np.empty(n, dtype=np.int64)
+    keep[0], keep[-1] = 0, size - 1
+    a = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nhi = edges[i + 2] if i + 2 < len(edges) else size
+        avg_x, avg_y = x[hi:nhi].mean(), y[hi:nhi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+def minmax(x, y, n):
+    # Indices of the first and last points plus each bucket's min and max ((n-2)/2 buckets), in x order
+    size = len(x)
+    if n >= size or n < 2: return np.arange(size)
+    if n < 4: return np.array([0, size - 1])
+    buckets = np.arange(size) * ((n - 2) // 2) // size
+    s = pd.Series(y).groupby(buckets)
+    return np.unique(np.concatenate([[0, size - 1], s.idxmin().to_numpy(), s.idxmax().to_numpy()]))
+
+
+METHODS = {'LTTB': lttb, 'Min/Max': minmax}
+
+
+def downsample(dates, values, n=POINT_BUDGET, method='LTTB'):
+    # -> (dates, values) with at most ~n points; NaNs are dropped first
+    dates, values = np.asarray(dates, dtype='datetime64[ns]'), np.asarray(values, dtype='float64')
+    ok = ~np.isnan(values)
+    dates, values = dates[ok], values[ok]
+    keep = METHODS[method](dates.astype('int64').astype('float64'), values, n)
+    return dates[keep], values[keep]
+
+
+class SeriesCache:
+    # Downsampled series keyed by (start, end, unit, metric, method, budget, extra).
+    # Attached to the HistoryMirror as a listener, so a save drops only the cached
+    # ranges that contain the saved dates.
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._items.move_to_end(key)
+            return item
+
+    def put(self, key, series):
+        with self._lock:
+            self._items[key] = series
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries: self._items.popitem(last=False)
+
+    def series(self, frame_fn, start, end, units, metric, method='LTTB', n=POINT_BUDGET, extra=None):
+        # {unit: (dates, values)}; unit FLEET is the daily fleet sum. frame_fn() returns
+        # the (Date, Unit, metric) rows and is only called on a cache miss.
+        keys = {u: (pd.Timestamp(start), pd.Timestamp(end), u, metric, method, n, extra) for u in units}
+        out = {u: self.get(k) for u, k in keys.items()}
+        missing = [u for u, v in out.items() if v is None]
+        if missing:
+            df = frame_fn()
+            for u in missing:
+                if u == FLEET:
+                    rows = df.groupby('Date')[metric].sum(min_count=1)
+                    out[u] = downsample(rows.index.to_numpy(), rows.to_numpy(), n, method)
+                else:
+                    rows = df[df['Unit'] == u].sort_values('Date')
+                    out[u] = downsample(rows['Date'].to_numpy(), rows[metric].to_numpy(), n, method)
+                self.put(keys[u], out[u])
+        return out
+
+    # -- listener hooks --
+    def on_reset(self, df):
+        with self._lock:
+            self._items.clear()
+
+    def on_rows(self, df):
+        if df.empty: return
+        lo, hi = pd.Timestamp(df['Date'].min()), pd.Timestamp(df['Date'].max())
+        with self._lock:
+            for key in [k for k in self._items if k[0] <= hi and k[1] >= lo]:
+                del self._items[key]
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._items)}
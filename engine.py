@@ -0,0 +1,155 @@
+import numpy as np
+import pandas as pd
+
+# --- 5. CALCULATION ENGINE ---
+SHUTDOWN_LOSS = 350 * 1000 * 24 * 3
+# calculate_unit loss names -> column names used by calculate_fleet
+LOSS_COLS = {"Vacuum": "loss_vacuum", "MS Temp": "loss_ms", "Flue Gas": "loss_fg", "Spray": "loss_spray", "Unaccounted": "loss_unacc"}
+
+
+def calculate_unit(u_id, gen, hr, inputs, design_vals, ash_params):
+    TARGET_HR = design_vals['target_hr']; DESIGN_HR = 2250; COAL_GCV = design_vals['gcv']
+
+    if gen <= 0 or hr <= 0:
+        profit = -1 * (350 * 1000 * 24 * 3)
+        score = 0
+        l_vac = l_ms = l_fg = l_spray = l_unacc = 0
+        carbon_tons = escerts = 0
+        status = "SHUTDOWN"
+    else:
+        status = "RUNNING"
+        kcal_diff = (TARGET_HR - hr) * gen * 1_000_000
+        escerts = kcal_diff / 10_000_000
+        coal_saved_kg = kcal_diff / COAL_GCV
+        carbon_tons = (coal_saved_kg / 1000) * 1.7
+        profit = (escerts * 1000) + (carbon_tons * 500) + (coal_saved_kg * 4.5)
+
+        l_vac = max(0, (inputs['vac'] - (-0.92)) / 0.01 * 18) * -1
+        l_ms = max(0, (540 - inputs['ms']) * 1.2)
+        l_fg = max(0, (inputs['fg'] - 130) * 1.5)
+        l_spray = max(0, (inputs['spray'] - 15) * 2.0)
+        l_unacc = max(0, hr - (DESIGN_HR + l_ms + l_fg + l_spray + 50) - abs(l_vac))
+        score = max(0, 100 - (abs(l_vac) + l_ms + l_fg + l_spray + l_unacc)/3)
+
+    coal_consumed = (gen * hr * 1000) / COAL_GCV if COAL_GCV > 0 and gen > 0 else 0
+    ash_gen = coal_consumed * (ash_params['ash_pct'] / 100)
+    ash_util = ash_params['util_cem'] + ash_params['util_brick']
+    ash_stocked = ash_gen - ash_util
+    bricks_current = ash_params['util_brick'] * 666
+    bricks_potential_total = ash_gen * 666
+    burj_pct = (bricks_current / 165_000_000) * 100
+
+    bio_units = ash_params.get('biomass', 0) * 1000 * 1.2
+    homes_bio = bio_units / 4
+
+    return {
+        "id": u_id, "gen": gen, "hr": hr, "profit": profit, "escerts": escerts if status=="RUNNING" else 0, "carbon": carbon_tons if status=="RUNNING" else 0,
+        "score": score, "sox": inputs['sox'], "nox": inputs['nox'],
+        "losses": {"Vacuum": abs(l_vac), "MS Temp": l_ms, "Flue Gas": l_fg, "Spray": l_spray, "Unaccounted": l_unacc},
+        "ash": {"generated": ash_gen, "utilized": ash_util, "stocked": ash_stocked,
+                "bricks_made": bricks_current, "cem_util": ash_params['util_cem'],
+                "brick_util": ash_params['util_brick'], "burj_pct": burj_pct},
+        "limits": design_vals['limits'], "trees": abs((carbon_tons if status=="RUNNING" else 0) / 0.025),
+        "target_hr": TARGET_HR, "homes_bio": homes_bio,
+        "inputs": inputs, "status": status
+    }
+
+
+# --- 5b. VECTORIZED FLEET ENGINE ---
+# Same formulas as calculate_unit, evaluated over whole columns at once so any
+# number of units x days (e.g. the full history) is one pass. Operation order is
+# kept identical to the scalar code so results match it bit for bit.
+def _pos(x):
+    # Python's max(0, x): x when x > 0, else 0 (NaN included)
+    return np.where(x > 0, x, 0.0)
+
+
+def _col(df, name, default=0.0):
+    if name in df.columns:
+        return pd.to_numeric(df[name], errors='coerce').fillna(0).to_numpy(dtype='float64')
+    return np.full(len(df), default, dtype='float64')
+
+
+def loss_terms(vac, ms, fg, spray):
+    # calculate_unit's controllable losses in kcal/kWh (vacuum is returned negative, as there)
+    l_vac = _pos((vac - (-0.92)) / 0.01 * 18) * -1
+    l_ms = _pos((540 - ms) * 1.2)
+    l_fg = _pos((fg - 130) * 1.5)
+    l_spray = _pos((spray - 15) * 2.0)
+    return l_vac, l_ms, l_fg, l_spray
+
+
+def calculate_fleet(df, configs, ash_pct=35.0):
+    # df: history-shaped frame (Date, Unit, Gen, HR, Vacuum, MS Temp, FG Temp, Spray,
+    # Ash Cement, Ash Bricks, Coal Ash %, Biomass). configs: {unit id: design_vals};
+    # units missing from configs fall back to the row's 'Target HR' column, and an
+    # optional 'GCV' column overrides the configured coal GCV row by row.
+    unit = df['Unit'].astype(str)
+    gen, hr = _col(df, 'Gen'), _col(df, 'HR')
+    vac, ms, fg, spray = _col(df, 'Vacuum'), _col(df, 'MS Temp'), _col(df, 'FG Temp'), _col(df, 'Spray')
+    cem, brick, bio = _col(df, 'Ash Cement'), _col(df, 'Ash Bricks'), _col(df, 'Biomass')
+    pct = _col(df, 'Coal Ash %', ash_pct) if 'Coal Ash %' in df.columns else np.full(len(df), ash_pct)
+    target = unit.map({str(k): v['target_hr'] for k, v in configs.items()}).astype('float64').to_numpy()
+    if np.isnan(target).any():
+        target = np.where(np.isnan(target), _col(df, 'Target HR'), target)
+    gcv = unit.map({str(k): v['gcv'] for k, v in configs.items()}).astype('float64').to_numpy()
+    if 'GCV' in df.columns: gcv = _col(df, 'GCV')  # per-row coal GCV (what-if scenarios)
+
+    running = ~((gen <= 0) | (hr <= 0))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        kcal_diff = (target - hr) * gen * 1_000_000
+        escerts = kcal_diff / 10_000_000
+        coal_saved_kg = kcal_diff / gcv
+        carbon = (coal_saved_kg / 1000) * 1.7
+        profit = (escerts * 1000) + (carbon * 500) + (coal_saved_kg * 4.5)
+
+        l_vac, l_ms, l_fg, l_spray = loss_terms(vac, ms, fg, spray)
+        l_unacc = _pos(hr - (2250 + l_ms + l_fg + l_spray + 50) - np.abs(l_vac))
+        score = _pos(100 - (np.abs(l_vac) + l_ms + l_fg + l_spray + l_unacc)/3)
+
+        coal_consumed = np.where((gcv > 0) & (gen > 0), (gen * hr * 1000) / gcv, 0.0)
+    ash_gen = coal_consumed * (pct / 100)
+    ash_util = cem + brick
+    bricks = brick * 666
+    off = lambda a: np.where(running, a, 0.0)
+    carbon = off(carbon)
+
+    return pd.DataFrame({
+        "Date": df['Date'].to_numpy() if 'Date' in df.columns else pd.NaT, "Unit": unit.to_numpy(),
+        "status": np.where(running, "RUNNING", "SHUTDOWN"),
+        "profit": np.where(running, profit, -1.0 * SHUTDOWN_LOSS), "escerts": off(escerts), "carbon": carbon,
+        "score": off(score),
+        "loss_vacuum": off(np.abs(l_vac)), "loss_ms": off(l_ms), "loss_fg": off(l_fg), "loss_spray": off(l_spray), "loss_unacc": off(l_unacc),
+        "ash_generated": ash_gen, "ash_utilized": ash_util, "ash_stocked": ash_gen - ash_util,
+        "bricks_made": bricks, "burj_pct": (bricks / 165_000_000) * 100,
+        "trees": np.abs(carbon / 0.025), "homes_bio": bio * 1000 * 1.2 / 4,
+    }, index=df.index)
+
+
+def fleet_units(inputs_df, configs, ash_pct=35.0):
+    # One batch for the whole fleet: the calculate_fleet pass, reshaped into the
+    # per-unit dicts calculate_unit returns (what the cards, tabs and PDF use)
+    k = calculate_fleet(inputs_df, configs, ash_pct)
+    cols = {c: _col(inputs_df, c).tolist() for c in ['Gen', 'HR', 'Vacuum', 'MS Temp', 'FG Temp', 'Spray', 'SOx', 'NOx', 'Ash Cement', 'Ash Bricks']}
+    out = []
+    for i, (u_id, r) in enumerate(zip(inputs_df['Unit'].astype(str), k.itertuples(index=False))):
+        design = configs[u_id]
+        out.append({
+            "id": u_id, "gen": cols['Gen'][i], "hr": cols['HR'][i], "profit": r.profit, "escerts": r.escerts, "carbon": r.carbon,
+            "score": r.score, "sox": cols['SOx'][i], "nox": cols['NOx'][i],
+            "losses": {name: getattr(r, col) for name, col in LOSS_COLS.items()},
+            "ash": {"generated": r.ash_generated, "utilized": r.ash_utilized, "stocked": r.ash_stocked,
+                    "bricks_made": r.bricks_made, "cem_util": cols['Ash Cement'][i],
+                    "brick_util": cols['Ash Bricks'][i], "burj_pct": r.burj_pct},
+            "limits": design['limits'], "trees": r.trees,
+            "target_hr": design['target_hr'], "homes_bio": r.homes_bio,
+            "inputs": {'vac': cols['Vacuum'][i], 'ms': cols['MS Temp'][i], 'fg': cols['FG Temp'][i], 'spray': cols['Spray'][i], 'sox': cols['SOx'][i], 'nox': cols['NOx'][i]},
+            "status": r.status
+        })
+    return out
+
+
+def backfill_kpis(hist_df, configs, ash_pct=35.0):
+    # Whole-history KPI recompute in one pass; returns hist_df with the KPI columns appended
+    kpis = calculate_fleet(hist_df, configs, ash_pct).drop(columns=['Date', 'Unit'])
+    return hist_df.join(kpis)
@@ -0,0 +1,158 @@
+import argparse
+import glob
+import os
+import re
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+from engine import calculate_fleet
+from fleet import FLEET_FILE, load_fleet
+from history_mirror import MIRROR_DIR, HistoryMirror
+from history_store import widen
+from profiler import count, profiled
+
+# --- STREAMING EXCEL EXPORT ---
+# History ranges as .xlsx: the raw rows plus the KPIs recomputed with the
+# current design values (engine.calculate_fleet, identical to calculate_unit),
+# one sheet per unit or per month. The workbook is written in xlsxwriter's
+# constant_memory mode straight from the mirror, one month partition at a time,
+# so memory stays at one month of rows however long the range; the file itself
+# is built in a temp file, never in RAM.
+#
+#   python excel_export.py --start 2022-04-01 --end 2025-03-31 --by unit --out history.xlsx
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), "gmr_exports")
+KEEP_EXPORTS = 3600      # seconds an export stays in EXPORT_DIR for download
+MAX_ROWS = 1_048_576     # Excel's sheet limit; a longer sheet continues on "<name> (2)"
+RAW_COLS = ['Gen', 'HR', 'Vacuum', 'MS Temp', 'FG Temp', 'Spray', 'SOx', 'NOx', 'Coal Ash %', 'Ash Cement', 'Ash Bricks', 'Ash Util', 'Biomass', 'Solar', 'Profit']
+KPI_COLS = {'status': 'Status', 'profit': 'Profit (recalc)', 'score': '5S Score', 'escerts': 'ESCerts', 'carbon': 'Carbon (T)',
+            'loss_vacuum': 'Loss Vacuum', 'loss_ms': 'Loss MS Temp', 'loss_fg': 'Loss FG Temp', 'loss_spray': 'Loss Spray', 'loss_unacc': 'Loss Unaccounted',
+            'ash_generated': 'Ash Generated (T)'}
+HEADER = ['Date', 'Unit'] + RAW_COLS + list(KPI_COLS.values())
+
+
+def _sheet_name(name, taken):
+    name = re.sub(r'[\[\]:*?/\\]', '-', str(name))[:31]
+    base, i = name, 2
+    while name.lower() in taken:
+        name = f"{base[:31 - len(f' ({i})')]} ({i})"
+        i += 1
+    taken.add(name.lower())
+    return name
+
+
+class _Sheets:
+    # Sheets opened on first use; rows only ever go downwards (constant_memory needs that)
+    def __init__(self, wb):
+        self.wb, self.taken, self.open = wb, set(), {}
+        self.head = wb.add_format({'bold': True, 'bg_color': '#1F2937', 'font_color': 'white'})
+        self.date = wb.add_format({'num_format': 'yyyy-mm-dd'})
+
+    def _new(self, key, part=1):
+        ws = self.wb.add_worksheet(_sheet_name(key if part == 1 else f"{key} ({part})", self.taken))
+        ws.set_column(0, 0, 11)
+        ws.set_column(1, len(HEADER) - 1, 12)
+        ws.freeze_panes(1, 2)
+        ws.write_row(0, 0, HEADER, self.head)
+        return [ws, 1, part]
+
+    def write(self, key, serials, rows):
+        sheet = self.open.get(key) or self.open.setdefault(key, self._new(key))
+        for serial, row in zip(serials, rows):
+            if sheet[1] >= MAX_ROWS: sheet = self.open[key] = self._new(key, sheet[2] + 1)
+            ws, r, _ = sheet
+            ws.write_number(r, 0, serial, self.date)
+            ws.write_row(r, 1, row)
+            sheet[1] = r + 1
+
+
+def _chunk(df, configs, ash_pct):
+    # -> (Excel date serials, row tuples) for one month of history
+    df = widen(df.sort_values(['Date', 'Unit'], kind='stable'))
+    kpis = calculate_fleet(df, configs, ash_pct)
+    serials = ((df['Date'] - pd.Timestamp("1899-12-30")) / pd.Timedelta(days=1)).to_numpy()
+    cols = [df['Unit'].astype(str).to_numpy()] + [df[c].to_numpy() if c in df.columns else np.full(len(df), None) for c in RAW_COLS]
+    cols += [kpis[c].to_numpy() for c in KPI_COLS]
+    return serials, cols
+
+
+@profiled("excel_export")
+def export_range(path, mirror, start, end, configs, ash_pct=35.0, by='unit', units=None, progress=None):
+    # Writes the workbook to `path`; -> stats dict with rows, sheets, bytes, seconds and rows_per_s.
+    # progress(done_months, total_months) is called after each month.
+    t0 = time.perf_counter()
+    months = mirror.months(start, end)
+    units = None if units is None else [str(u) for u in units]
+    stats = {'rows': 0, 'months': len(months)}
+    wb = xlsxwriter.Workbook(path, {'constant_memory': True, 'nan_inf_to_errors': True, 'tmpdir': os.path.dirname(os.path.abspath(path))})
+    sheets = _Sheets(wb)
+    try:
+        for i, month in enumerate(months):
+            df = mirror.read(max(pd.Timestamp(f"{month}-01"), pd.Timestamp(start)), min(pd.Timestamp(f"{month}-01") + pd.offsets.MonthEnd(0), pd.Timestamp(end)))
+            if units is not None: df = df[df['Unit'].astype(str).isin(units)]
+            if len(df):
+                serials, cols = _chunk(df, configs, ash_pct)
+                if by == 'month':
+                    sheets.write(month, serials, zip(*cols))
+                else:
+                    unit = cols[0]
+                    # Units in a natural order (2 before 10), as in the fleet config
+                    for u in sorted(pd.unique(unit), key=lambda x: (len(x), x)):
+                        pos = np.flatnonzero(unit == u)
+                        sheets.write(f"Unit {u}", serials[pos], zip(*(c[pos] for c in cols)))
+                stats['rows'] += len(df)
+            if progress: progress(i + 1, len(months))
+        if not sheets.open: sheets.write("No data", [], [])
+    finally:
+        wb.close()
+    count("rows_exported", stats['rows'])
+    stats['sheets'] = len(sheets.taken)
+    stats['bytes'] = os.path.getsize(path)
+    stats['seconds'] = time.perf_counter() - t0
+    stats['rows_per_s'] = stats['rows'] / stats['seconds'] if stats['seconds'] > 0 else 0.0
+    return stats
+
+
+def export_path(start, end, by):
+    # A fresh file under EXPORT_DIR; exports older than KEEP_EXPORTS are removed on the way
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    for old in glob.glob(os.path.join(EXPORT_DIR, "*.xlsx")):
+        try:
+            if time.time() - os.path.getmtime(old) > KEEP_EXPORTS: os.remove(old)
+        except OSError:
+            pass
+    fd, path = tempfile.mkstemp(prefix=f"history_{pd.Timestamp(start):%Y%m%d}_{pd.Timestamp(end):%Y%m%d}_{by}_", suffix=".xlsx", dir=EXPORT_DIR)
+    os.close(fd)
+    return path
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Export a history range to Excel (raw rows + recomputed KPIs)")
+    p.add_argument("--start", required=True, help="first day, YYYY-MM-DD")
+    p.add_argument("--end", required=True, help="last day, YYYY-MM-DD")
+    p.add_argument("--by", choices=['unit', 'month'], default='unit', help="one sheet per unit or per month")
+    p.add_argument("--units", help="comma-separated unit ids (default: all)")
+    p.add_argument("--out", default="history_export.xlsx")
+    p.add_argument("--mirror", default=os.environ.get("HISTORY_MIRROR_DIR", MIRROR_DIR))
+    p.add_argument("--branch", default=os.environ.get("BRANCH", "main"))
+    p.add_argument("--fleet", default=os.environ.get("FLEET_CONFIG", FLEET_FILE), help="fleet config (design values for the KPIs)")
+    args = p.parse_args(argv)
+
+    from batch_reports import open_repo
+    fleet = load_fleet(args.fleet)
+    mirror = HistoryMirror(args.mirror)
+    mirror.pull(open_repo(), args.branch, ttl=0)
+    tick = lambda done, total: print(f"\r{done}/{total} months", end="", file=sys.stderr)
+    stats = export_range(args.out, mirror, args.start, args.end, fleet.configs(), fleet.coal_ash_pct, args.by,
+                         args.units.split(",") if args.units else None, progress=tick)
+    print(f"\n{stats['rows']:,} rows in {stats['sheets']} sheets, {stats['bytes'] / 1e6:.1f} MB in {stats['seconds']:.1f}s "
+          f"({stats['rows_per_s']:,.0f} rows/s) -> {args.out}")
+    return 0 if stats['rows'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
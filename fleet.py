@@ -0,0 +1,67 @@
+import json
+import os
+
+# --- FLEET CONFIGURATION ---
+# Plants and units come from fleet.json instead of being hard-coded, so the
+# same dashboard runs one station or several. Unit ids are the history's Unit
+# key and must be unique across the whole fleet.
+FLEET_FILE = "fleet.json"
+DEFAULT_LIMITS = {'sox': 600, 'nox': 450}
+DEFAULT_FLEET = {
+    "defaults": {"limits": DEFAULT_LIMITS, "coal_ash_pct": 35.0, "pond_cap": 500000},
+    "plants": [{"id": "KAM", "name": "GMR Kamalanga", "units": [
+        {"id": "1", "target_hr": 2300, "gcv": 3600},
+        {"id": "2", "target_hr": 2310, "gcv": 3550},
+        {"id": "3", "target_hr": 2295, "gcv": 3620},
+    ]}],
+}
+# Daily inputs per unit: (history column, daily-template parameter, default)
+INPUT_FIELDS = [
+    ('Gen', 'Generation (MU)', 8.4), ('HR', 'Heat Rate (kcal/kWh)', 2380.0), ('Vacuum', 'Vacuum (kg/cm2)', -0.90),
+    ('MS Temp', 'MS Temp (C)', 535.0), ('FG Temp', 'FG Temp (C)', 135.0), ('Spray', 'Spray (TPH)', 20.0),
+    ('SOx', 'SOx (mg/Nm3)', 550.0), ('NOx', 'NOx (mg/Nm3)', 400.0), ('Ash Cement', 'Ash to Cement (Tons)', 1000.0),
+    ('Ash Bricks', 'Ash to Bricks (Tons)', 500.0), ('Biomass', 'Biomass (Tons)', 0.0), ('Solar', 'Solar (MU)', 0.0),
+]
+INPUT_DEFAULTS = {col: default for col, _, default in INPUT_FIELDS}
+
+
+class Fleet:
+    def __init__(self, spec):
+        defaults = spec.get("defaults", {})
+        self.limits = dict(DEFAULT_LIMITS, **defaults.get("limits", {}))
+        self.coal_ash_pct = float(defaults.get("coal_ash_pct", 35.0))
+        self.pond_cap = float(defaults.get("pond_cap", 500000))
+        self.plants = {}
+        self.units = []
+        for plant in spec.get("plants", []):
+            pid = str(plant["id"])
+            self.plants[pid] = plant.get("name", pid)
+            for unit in plant.get("units", []):
+                self.units.append({
+                    "id": str(unit["id"]), "plant": pid, "name": unit.get("name", f"Unit {unit['id']}"),
+                    "target_hr": float(unit["target_hr"]), "gcv": float(unit["gcv"]),
+                })
+        ids = [u["id"] for u in self.units]
+        dupes = sorted({i for i in ids if ids.count(i) > 1})
+        if dupes: raise ValueError(f"duplicate unit id(s) in fleet config: {', '.join(dupes)}")
+        if not ids: raise ValueError("fleet config has no units")
+
+    @property
+    def unit_ids(self):
+        return [u["id"] for u in self.units]
+
+    def plant_of(self):
+        return {u["id"]: u["plant"] for u in self.units}
+
+    def units_in(self, plant=None):
+        return [u for u in self.units if plant is None or u["plant"] == plant]
+
+    def configs(self):
+        # {unit id: design values} as calculate_unit / calculate_fleet take them
+        return {u["id"]: {'target_hr': u["target_hr"], 'gcv': u["gcv"], 'limits': dict(self.limits)} for u in self.units}
+
+
+def load_fleet(path=FLEET_FILE):
+    if not path or not os.path.exists(path): return Fleet(DEFAULT_FLEET)
+    with open(path) as f:
+        return Fleet(json.load(f))
@@ -0,0 +1,375 @@
+import argparse
+import os
+import socket
+import sys
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from engine import calculate_fleet, fleet_units
+from fleet import FLEET_FILE, INPUT_DEFAULTS, load_fleet
+from history_mirror import MIRROR_DIR, HistoryMirror
+from history_store import KEY, widen
+from ingest import RANGES
+from profiler import count
+
+# --- LIVE HISTORIAN FEED ---
+# Minute-resolution DCS/historian points (timestamp, unit, tag, value) from a
+# tailed CSV file or a TCP line feed, aggregated as they arrive into the daily
+# Date/Unit rows the history holds:
+#   Gen  - MW integrated over time (each gap capped at MAX_GAP) -> MU so far today
+#   rest - running mean of the day's samples
+# Each (unit, tag) also keeps its last RING_POINTS raw samples in a ring buffer
+# for the live chart; memory is those buffers plus the open days' aggregates.
+# Open days are flushed into the history every `flush_interval` (the fields the
+# feed does not carry, e.g. ash dispatch, are kept from the saved row), and a
+# day is closed LATE_GRACE after midnight; points for a closed day are dropped.
+#
+#   python historian.py simulate feed.csv --minutes 1440        # the local stand-in feed
+#   python historian.py serve feed.csv --port 9100 --rate 50    # ...served as a TCP line feed
+#   python historian.py load feed.csv                           # aggregate a file into the history
+TAGS = ['Gen', 'HR', 'Vacuum', 'MS Temp', 'FG Temp', 'Spray', 'SOx', 'NOx']
+# Lower-cased source tag names -> history columns
+TAG_ALIASES = {t.lower(): t for t in TAGS} | {'mw': 'Gen', 'gen_mw': 'Gen', 'heat_rate': 'HR', 'vac': 'Vacuum', 'ms_temp': 'MS Temp', 'mst': 'MS Temp',
+                                              'fg_temp': 'FG Temp', 'fgt': 'FG Temp', 'spray_tph': 'Spray'}
+POINT_RANGES = {t: RANGES[t] for t in TAGS if t in RANGES} | {'Gen': (0, 2000), 'Vacuum': (-1.1, 1.1)}  # Gen is MW here
+RING_POINTS = 1440       # raw samples kept per (unit, tag): a day of minutes
+MAX_GAP = 300.0          # seconds of Gen credited per sample at most (a feed outage is not generation)
+LATE_GRACE = 7200.0      # seconds after midnight a day stays open for stragglers
+FLUSH_INTERVAL = 900.0   # seconds between flushes into the history
+EPOCH = datetime(1970, 1, 1)
+
+
+def parse_line(line):
+    # "2025-12-15T10:01:00,1,HR,2390.5" -> (seconds since 1970 in plant time, unit, tag, value); None for anything else.
+    # Times are kept as the plant's wall clock (an offset, if sent, is dropped), like the history's dates.
+    parts = line.strip().split(',')
+    if len(parts) != 4: return None
+    try:
+        ts = (datetime.fromisoformat(parts[0].strip()).replace(tzinfo=None) - EPOCH).total_seconds()
+        value = float(parts[3])
+    except ValueError:
+        return None
+    tag = TAG_ALIASES.get(parts[2].strip().lower())
+    return (ts, parts[1].strip(), tag, value) if tag else None
+
+
+# -- sources: iterables of line batches, until `stop` is set --
+def tail_lines(path, stop, poll=1.0, from_start=True):
+    # Follows a file being appended to; a truncated or replaced file is read again from the top
+    f, pos, buf = None, 0, ""
+    while not stop.is_set():
+        try:
+            if f is None:
+                f = open(path, encoding='utf-8', errors='replace')
+                if not from_start: f.seek(0, os.SEEK_END)
+                pos, buf, from_start = f.tell(), "", True
+            if os.stat(path).st_size < pos:
+                f.close()
+                f = None
+                continue
+            chunk = f.read()
+        except OSError:
+            f = None
+            stop.wait(poll)
+            continue
+        if not chunk:
+            stop.wait(poll)
+            continue
+        pos = f.tell()
+        lines = (buf + chunk).split("\n")
+        buf = lines.pop()  # an unfinished last line waits for the rest
+        if lines: yield lines
+    if f is not None: f.close()
+
+
+def socket_lines(host, port, stop, retry=5.0):
+    # Newline-delimited points over TCP, reconnecting after a drop
+    while not stop.is_set():
+        try:
+            with socket.create_connection((host, port), timeout=retry) as s:
+                s.settimeout(1.0)
+                buf = b""
+                while not stop.is_set():
+                    try:
+                        data = s.recv(65536)
+                    except socket.timeout:
+                        continue
+                    if not data: break
+                    lines = (buf + data).split(b"\n")
+                    buf = lines.pop()
+                    if lines: yield [line.decode('utf-8', 'replace') for line in lines]
+        except OSError:
+            pass
+        stop.wait(retry)
+
+
+def open_source(spec, stop):
+    # "tcp://host:port" or a file path
+    if spec.startswith("tcp://"):
+        host, port = spec[6:].rsplit(":", 1)
+        return socket_lines(host, int(port), stop)
+    return tail_lines(spec, stop)
+
+
+class _Ring:
+    # Last `size` samples of one (unit, tag)
+    __slots__ = ('ts', 'val', 'n', 'i')
+
+    def __init__(self, size):
+        self.ts, self.val = np.empty(size), np.empty(size)
+        self.n = self.i = 0
+
+    def append(self, t, v):
+        self.ts[self.i], self.val[self.i] = t, v
+        self.i = (self.i + 1) % len(self.ts)
+        self.n = min(self.n + 1, len(self.ts))
+
+    def arrays(self):
+        if self.n < len(self.ts): return self.ts[:self.n].copy(), self.val[:self.n].copy()
+        return np.concatenate((self.ts[self.i:], self.ts[:self.i])), np.concatenate((self.val[self.i:], self.val[:self.i]))
+
+
+class _Agg:
+    # One day of one (unit, tag)
+    __slots__ = ('n', 'sum', 'last_t', 'last_v', 'mwh')
+
+    def __init__(self):
+        self.n, self.sum, self.mwh = 0, 0.0, 0.0
+        self.last_t = self.last_v = None
+
+    def add(self, t, v):
+        if self.last_t is not None: self.mwh += self.last_v * min(t - self.last_t, MAX_GAP) / 3600
+        self.n += 1
+        self.sum += v
+        self.last_t, self.last_v = t, v
+
+    def value(self, tag):
+        return self.mwh / 1000 if tag == 'Gen' else self.sum / self.n
+
+
+class Historian:
+    def __init__(self, mirror, configs, ash_pct=35.0, sync=None, flush_interval=FLUSH_INTERVAL, ring_points=RING_POINTS):
+        self.mirror, self.configs, self.ash_pct, self.sync = mirror, configs, ash_pct, sync
+        self.units = {str(u) for u in configs}
+        self.flush_interval, self.ring_points = flush_interval, ring_points
+        self._lock = threading.Lock()
+        self._rings = {}        # (unit, tag) -> _Ring
+        self._aggs = {}         # (day, unit, tag) -> _Agg, open days only
+        self._dirty = set()     # days changed since the last flush
+        self._closed = None     # newest closed day; its points and older ones are late
+        self.latest = None      # newest point's time (the feed's clock, not the wall clock)
+        self.version = 0        # bumped on every accepted batch, for the live view
+        self.stats = {'points': 0, 'rejected': 0, 'late': 0, 'stale': 0, 'flushes': 0, 'rows_flushed': 0, 'last_flush': None, 'error': None}
+        self._stop = threading.Event()
+        self._threads = []
+
+    # -- intake --
+    def feed(self, lines):
+        # Raw lines (or parsed tuples) -> aggregates; -> points accepted
+        accepted = 0
+        with self._lock:
+            for line in lines:
+                if isinstance(line, str) and line.startswith("ts,"): continue  # a header
+                p = parse_line(line) if isinstance(line, str) else line
+                if p is None or p[1] not in self.units or not np.isfinite(p[3]):
+                    self.stats['rejected'] += 1
+                    continue
+                t, unit, tag, v = p
+                lo, hi = POINT_RANGES.get(tag, (-np.inf, np.inf))
+                if not lo <= v <= hi:
+                    self.stats['rejected'] += 1
+                    continue
+                day = int(t // 86400)
+                if self._closed is not None and day <= self._closed:
+                    self.stats['late'] += 1
+                    continue
+                agg = self._aggs.get((day, unit, tag))
+                if agg is None: agg = self._aggs[(day, unit, tag)] = _Agg()
+                elif t <= agg.last_t:
+                    self.stats['stale'] += 1  # repeated or out of order
+                    continue
+                agg.add(t, v)
+                ring = self._rings.get((unit, tag))
+                if ring is None: ring = self._rings[(unit, tag)] = _Ring(self.ring_points)
+                ring.append(t, v)
+                self._dirty.add(day)
+                self.latest = t if self.latest is None else max(self.latest, t)
+                accepted += 1
+            if accepted:
+                self.stats['points'] += accepted
+                self.version += 1
+        count("historian_points", accepted)
+        return accepted
+
+    def start(self, source):
+        # Background threads: one reading `source` (see open_source), one flushing on a timer
+        def read():
+            for lines in open_source(source, self._stop):
+                self.feed(lines)
+
+        def flush_loop():
+            while not self._stop.wait(self.flush_interval):
+                try:
+                    self.flush()
+                except Exception as e:
+                    self.stats['error'] = str(e)  # rows stay dirty; the next flush retries
+        for target in (read, flush_loop):
+            t = threading.Thread(target=target, name=f"historian-{target.__name__}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def stop(self, flush=True):
+        self._stop.set()
+        if flush: self.flush()
+
+    # -- aggregates --
+    def _rows(self, days):
+        rows = {}
+        for (day, unit, tag), agg in self._aggs.items():
+            if day in days: rows.setdefault((day, unit), {})[tag] = agg.value(tag)
+        return pd.DataFrame([{'Date': pd.Timestamp(np.datetime64(d, 'D')), 'Unit': u, **vals} for (d, u), vals in sorted(rows.items())], columns=KEY + TAGS)
+
+    def today(self):
+        # Intraday aggregates of the feed's current day, one row per unit, in the history schema
+        if self.latest is None: return pd.DataFrame(columns=KEY + TAGS)
+        with self._lock:
+            return self._rows({int(self.latest // 86400)})
+
+    def partial(self, configs=None, ash_pct=None):
+        # -> (day, unit dicts) for today so far, via the engine's calculate_unit formulas;
+        # inputs the feed does not carry come from the saved row or the input defaults
+        configs, ash_pct = configs or self.configs, self.ash_pct if ash_pct is None else ash_pct
+        df = self.today()
+        if df.empty: return None, []
+        df = self._complete(df, configs, ash_pct)
+        return df['Date'].iloc[0], fleet_units(df, configs, ash_pct)
+
+    def _complete(self, df, configs, ash_pct):
+        # Feed values over the saved row for the same (Date, Unit); Profit and Ash Util recomputed
+        base = self.mirror.read(df['Date'].min(), df['Date'].max())
+        base = widen(base.assign(Unit=base['Unit'].astype(str))).drop_duplicates(KEY, keep='last').set_index(KEY)
+        df = df.set_index(KEY).combine_first(base.reindex(df.set_index(KEY).index)).reset_index()
+        for col, default in (INPUT_DEFAULTS | {'Coal Ash %': ash_pct}).items():
+            df[col] = df[col].fillna(default) if col in df.columns else default
+        kpis = calculate_fleet(df, configs, ash_pct)
+        return df.assign(Profit=kpis['profit'].to_numpy(), **{'Ash Util': kpis['ash_utilized'].to_numpy()})
+
+    def series(self, unit, tag):
+        # -> (datetime64 times, values) of the raw samples in the ring buffer
+        with self._lock:
+            ring = self._rings.get((str(unit), tag))
+            ts, val = ring.arrays() if ring else (np.empty(0), np.empty(0))
+        return (ts * 1e6).astype('int64').astype('datetime64[us]'), val
+
+    # -- into the history --
+    def flush(self):
+        # Writes every day changed since the last flush; -> rows written. Days more than
+        # LATE_GRACE behind the feed are closed afterwards and their aggregates freed.
+        with self._lock:
+            days, self._dirty = self._dirty, set()
+            df = self._rows(days)
+            if self.latest is not None:
+                # From here on, points for these days count as late
+                closing = [d for d, _, _ in self._aggs if self.latest >= (d + 1) * 86400 + LATE_GRACE]
+                if closing: self._closed = max(closing + ([self._closed] if self._closed is not None else []))
+        if not df.empty:
+            try:
+                df = self._complete(df, self.configs, self.ash_pct)
+                if self.sync: self.sync.submit(df)
+                else: self.mirror.upsert(df)
+            except Exception:
+                with self._lock: self._dirty |= days
+                raise
+        with self._lock:
+            if self._closed is not None:
+                for key in [k for k in self._aggs if k[0] <= self._closed]: del self._aggs[key]
+            self.stats['flushes'] += 1
+            self.stats['rows_flushed'] += len(df)
+            self.stats['last_flush'] = time.time()
+            self.stats['error'] = None
+        return len(df)
+
+    def status(self):
+        with self._lock:
+            return dict(self.stats, latest=self.latest, open_days=len({d for d, _, _ in self._aggs}), series=len(self._rings),
+                        buffered=sum(r.n for r in self._rings.values()), dirty=len(self._dirty))
+
+
+# --- LOCAL STAND-IN ---
+def simulate(units, start, minutes, seed=0):
+    # Plausible minute data for every unit and tag (what the DCS feed would send)
+    rng = np.random.default_rng(seed)
+    base = {'Gen': 340.0, 'HR': 2330.0, 'Vacuum': -0.91, 'MS Temp': 537.0, 'FG Temp': 133.0, 'Spray': 17.0, 'SOx': 540.0, 'NOx': 390.0}
+    noise = {'Gen': 6.0, 'HR': 12.0, 'Vacuum': 0.004, 'MS Temp': 1.5, 'FG Temp': 1.0, 'Spray': 1.2, 'SOx': 8.0, 'NOx': 6.0}
+    t0 = pd.Timestamp(start)
+    for m in range(minutes):
+        ts = (t0 + pd.Timedelta(minutes=m)).isoformat()
+        for u in units:
+            for tag in TAGS:
+                yield f"{ts},{u},{tag},{base[tag] + rng.normal(0, noise[tag]):.3f}"
+
+
+def serve(path, port, rate):
+    # Replays a feed file to every client of a TCP port at `rate` lines per second
+    srv = socket.create_server(("", port))
+    print(f"serving {path} on tcp://localhost:{port}", file=sys.stderr)
+    while True:
+        conn, _ = srv.accept()
+        with conn, open(path, encoding='utf-8') as f:
+            try:
+                for line in f:
+                    conn.sendall(line.encode())
+                    time.sleep(1 / rate)
+            except OSError:
+                pass
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Historian feed: stand-in generator/server and headless loader")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    s = sub.add_parser("simulate", help="write a synthetic minute feed")
+    s.add_argument("out")
+    s.add_argument("--start", default=pd.Timestamp.now().normalize().isoformat())
+    s.add_argument("--minutes", type=int, default=1440)
+    s.add_argument("--units", default="1,2,3")
+    v = sub.add_parser("serve", help="serve a feed file over TCP")
+    v.add_argument("path")
+    v.add_argument("--port", type=int, default=9100)
+    v.add_argument("--rate", type=float, default=50.0, help="lines per second")
+    ld = sub.add_parser("load", help="aggregate a feed file into the history and push it")
+    ld.add_argument("path")
+    ld.add_argument("--mirror", default=os.environ.get("HISTORY_MIRROR_DIR", MIRROR_DIR))
+    ld.add_argument("--branch", default=os.environ.get("BRANCH", "main"))
+    ld.add_argument("--fleet", default=os.environ.get("FLEET_CONFIG", FLEET_FILE))
+    args = p.parse_args(argv)
+
+    if args.cmd == "simulate":
+        with open(args.out, "w") as f:
+            f.write("ts,unit,tag,value\n")
+            for line in simulate(args.units.split(","), args.start, args.minutes): f.write(line + "\n")
+        return 0
+    if args.cmd == "serve":
+        serve(args.path, args.port, args.rate)
+        return 0
+
+    from batch_reports import open_repo
+    repo, fleet = open_repo(), load_fleet(args.fleet)
+    mirror = HistoryMirror(args.mirror)
+    if repo: mirror.pull(repo, args.branch, ttl=0)
+    hist = Historian(mirror, fleet.configs(), fleet.coal_ash_pct)
+    with open(args.path, encoding='utf-8', errors='replace') as f:
+        hist.feed(f)
+    rows = hist.flush()
+    if repo: mirror.push(repo, args.branch)
+    stats = hist.status()
+    print(f"{stats['points']:,} points -> {rows} daily rows ({stats['rejected']:,} rejected, {stats['stale']:,} repeated/out of order)")
+    return 0 if rows else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
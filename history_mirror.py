@@ -0,0 +1,357 @@
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from history_store import HISTORY_CACHE, KEY, NUM_COLS, HistoryIndex, compact, compact_dtypes, empty_history, frame_bytes, list_deltas, load_history, read_delta, resolve, write_delta
+from profiler import count, profiled
+
+# --- LOCAL COLUMNAR MIRROR ---
+# The GitHub CSV stays the shared record; this is a per-host copy split into one
+# Parquet file per month (mirror/month=YYYY-MM/part.parquet) so a rerun only
+# opens the months it needs. Rows saved locally are also kept in pending/, one
+# file per write (appending never rewrites what is already pending), until the
+# background SyncWorker has pushed them to the repo as delta files.
+# Files and frames use the compact dtypes (history_store.compact_dtypes).
+MIRROR_DIR = "mirror"
+SHARED_INDEXES = 12
+DELTA_ROWS = 200_000     # pending rows per delta file at most (a big ingest becomes several)
+
+
+def typed(df):
+    df = df.copy()
+    df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
+    df['Unit'] = df['Unit'].astype(str)
+    for c in df.columns:
+        if c in NUM_COLS or c == 'Coal Ash %':
+            df[c] = pd.to_numeric(df[c], errors='coerce').fillna(0)
+    # Rows without a date cannot be placed in a month partition
+    return compact_dtypes(df[df['Date'].notna()])
+
+
+def merge_rows(base, new):
+    if base is None or base.empty: return new.sort_values(KEY, ignore_index=True)
+    if new is None or new.empty: return base
+    return pd.concat([base, new], ignore_index=True).drop_duplicates(subset=KEY, keep='last').sort_values(KEY, ignore_index=True)
+
+
+class HistoryMirror:
+    def __init__(self, root=MIRROR_DIR):
+        self.root = root
+        self._lock = threading.RLock()
+        self._checked_at = 0.0
+        # (month, columns) -> HistoryIndex shared by every session; dropped when the month is written
+        self._indexes = OrderedDict()
+        # Maintained indexes (rollups.py): told about every write so they never rescan
+        self.listeners = []
+        os.makedirs(root, exist_ok=True)
+        self.manifest = self._load_manifest()
+        if "rev" not in self.manifest and self.manifest["months"]:
+            # Mirror written before revisions: give its data one, once
+            self.manifest["rev"] = uuid.uuid4().hex
+            self._save_manifest()
+
+    def attach(self, listener):
+        if listener not in self.listeners: self.listeners.append(listener)
+        return listener
+
+    def _notify(self, df, reset=False):
+        for listener in self.listeners:
+            listener.on_reset(df) if reset else listener.on_rows(df)
+
+    # -- files --
+    def _path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    def _part(self, month):
+        return self._path(f"month={month}", "part.parquet")
+
+    def _load_manifest(self):
+        try:
+            with open(self._path("manifest.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"sha": None, "deltas": [], "months": {}}
+
+    def _save_manifest(self):
+        tmp = self._path("manifest.json.tmp")
+        with open(tmp, 'w') as f:
+            json.dump(self.manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp, self._path("manifest.json"))
+
+    @staticmethod
+    def _write_table(df, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp"
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp)
+        # Atomic swap: readers holding a memory map of the old file are unaffected
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _read_table(path, columns=None):
+        return pq.read_table(path, columns=columns, memory_map=True).to_pandas()
+
+    # -- reads --
+    def months(self, start=None, end=None):
+        lo = pd.Timestamp(start).strftime('%Y-%m') if start is not None else None
+        hi = pd.Timestamp(end).strftime('%Y-%m') if end is not None else None
+        return [m for m in sorted(self.manifest["months"]) if (lo is None or m >= lo) and (hi is None or m <= hi)]
+
+    @profiled("mirror_read")
+    def read(self, start=None, end=None, columns=None):
+        if columns is not None and 'Date' not in columns: columns = ['Date'] + list(columns)
+        parts = [self._read_table(self._part(m), columns) for m in self.months(start, end)]
+        if not parts: return empty_history() if columns is None else pd.DataFrame(columns=columns)
+        # Months with different unit sets concat to plain strings; files from older mirrors may be float64
+        df = compact_dtypes(pd.concat(parts, ignore_index=True))
+        count("rows_scanned", len(df))
+        if start is not None: df = df[df['Date'] >= pd.Timestamp(start)]
+        if end is not None: df = df[df['Date'] <= pd.Timestamp(end)]
+        return df.reset_index(drop=True)
+
+    def index(self, month, columns=None):
+        # One month as a HistoryIndex, built once and shared by every session on this
+        # host. Callers must treat it as read-only; derived slices are copy-on-write.
+        key = (month, tuple(columns) if columns is not None else None)
+        with self._lock:
+            idx = self._indexes.get(key)
+            if idx is None:
+                start = pd.Timestamp(f"{month}-01")
+                idx = self._indexes[key] = HistoryIndex(self.read(start, start + pd.offsets.MonthEnd(0), columns))
+                while len(self._indexes) > SHARED_INDEXES: self._indexes.popitem(last=False)
+            self._indexes.move_to_end(key)
+            return idx
+
+    def memory(self):
+        # Shared in-memory frames: one row per cached month index
+        with self._lock:
+            return [{'Frame': f"{m} ({len(cols) if cols else 'all'} cols)", 'Rows': len(idx.df), 'MB': frame_bytes(idx.df) / 1e6}
+                    for (m, cols), idx in self._indexes.items()]
+
+    def pending_parts(self):
+        # Pending files in write order (a pending.parquet from an older mirror first)
+        legacy = self._path("pending.parquet")
+        return ([legacy] if os.path.exists(legacy) else []) + sorted(glob.glob(self._path("pending", "*.parquet")))
+
+    def pending(self, parts=None):
+        parts = self.pending_parts() if parts is None else parts
+        if not parts: return None
+        return merge_rows(None, pd.concat([self._read_table(p) for p in parts], ignore_index=True).drop_duplicates(subset=KEY, keep='last'))
+
+    def _add_pending(self, df):
+        self._write_table(df, self._path("pending", f"{time.time_ns()}.parquet"))
+
+    @property
+    def empty(self):
+        return not self.manifest["months"]
+
+    @property
+    def revision(self):
+        # Changes on every write to the month files, from any process sharing this mirror
+        return self.manifest.get("rev")
+
+    # -- writes --
+    def _write_months(self, df, replace=False):
+        months = df['Date'].dt.strftime('%Y-%m')
+        for month, rows in df.groupby(months):
+            path = self._part(month)
+            if not replace and os.path.exists(path):
+                rows = merge_rows(self._read_table(path), rows)
+            else:
+                rows = rows.sort_values(KEY, ignore_index=True)
+            self._write_table(rows, path)
+            self.manifest["months"][month] = {"rows": len(rows), "max": str(rows['Date'].max().date())}
+            for key in [k for k in self._indexes if k[0] == month]: del self._indexes[key]
+        self.manifest["rev"] = uuid.uuid4().hex
+
+    def upsert(self, df, pending=True):
+        df = typed(df)
+        if df.empty: return 0
+        with self._lock:
+            self._write_months(df)
+            if pending: self._add_pending(df)
+            self._save_manifest()
+            self._notify(df)
+        return len(df)
+
+    def replace_all(self, df, sha, deltas=()):
+        # (Date, Unit) is the key everywhere else, so duplicate rows in the snapshot collapse here too
+        df = typed(df).drop_duplicates(subset=KEY, keep='last')
+        with self._lock:
+            for month in list(self.manifest["months"]):
+                if os.path.exists(self._part(month)): os.remove(self._part(month))
+            self.manifest["months"] = {}
+            self._indexes.clear()
+            self._write_months(df, replace=True)
+            self.manifest["sha"] = sha
+            self.manifest["deltas"] = sorted(deltas)
+            self._save_manifest()
+            self._notify(df, reset=True)
+
+    # -- sync with the repo --
+    def pull(self, repo, branch, ttl=60):
+        # Cheap when nothing changed: one sha probe and one delta listing per `ttl`
+        if not repo or time.monotonic() - self._checked_at < ttl: return False
+        self._checked_at = time.monotonic()
+        try:
+            sha = HISTORY_CACHE.sha(repo, branch)
+            deltas = list_deltas(repo, branch, strict=True)
+            if sha != self.manifest["sha"]:
+                # New base snapshot (first run or a compaction): rebuild once. strict, so a
+                # failed fetch leaves the mirror as it was instead of emptying it or marking
+                # unread deltas as applied; the next pull retries.
+                remote, sha = load_history(repo, branch, strict=True, deltas=deltas)
+                with self._lock:
+                    self.replace_all(merge_rows(typed(remote), self.pending()), sha, [e.path for e in deltas])
+                # The mirror now holds the data; don't keep a second full copy in memory
+                HISTORY_CACHE.invalidate()
+                return True
+            seen = set(self.manifest["deltas"])
+            new = [e for e in deltas if e.path not in seen]
+            if not new: return False
+            rows = typed(resolve(empty_history(), [read_delta(repo, e) for e in new]))
+        except Exception:
+            return False
+        with self._lock:
+            pend = self.pending()
+            if pend is not None:
+                # Local rows not yet pushed are newer than anything already in the repo
+                rows = rows.merge(pend[KEY], on=KEY, how='left', indicator=True)
+                rows = rows[rows['_merge'] == 'left_only'].drop(columns='_merge')
+            if not rows.empty: self._write_months(rows)
+            self.manifest["deltas"] = sorted(seen | {e.path for e in new})
+            self._save_manifest()
+            self._notify(rows)
+        return True
+
+    def push(self, repo, branch, parts=None):
+        # -> names of the deltas written ([] when nothing was pending). `parts`: a
+        # snapshot of pending_parts() taken by the caller (SyncWorker) under the lock.
+        if parts is None: parts = self.pending_parts()
+        # Pending files grouped in write order into deltas of up to DELTA_ROWS rows
+        batches, size = [], 0
+        for p in parts:
+            n = pq.ParquetFile(p).metadata.num_rows
+            if not batches or size + n > DELTA_ROWS:
+                batches.append([])
+                size = 0
+            batches[-1].append(p)
+            size += n
+        names = []
+        for batch in batches:
+            # Only pending rows go up, as new delta files. Delta names are unique (and
+            # ordered), so concurrent pushes from any number of hosts never conflict.
+            name = write_delta(repo, self.pending(batch), branch)
+            names.append(name)
+            with self._lock:
+                # Files written while uploading are not in `parts` and stay pending
+                for p in batch: os.remove(p)
+                self.manifest["deltas"] = sorted(set(self.manifest["deltas"]) | {name})
+                self._save_manifest()
+        return names
+
+
+class SyncWorker:
+    # Write-behind queue shared by every session on this host. A save writes the
+    # mirror, gets a ticket and returns; the worker batches everything saved within
+    # `flush_interval` into one delta commit (several for a big ingest, DELTA_ROWS
+    # each) and then marks those tickets committed.
+    # A failed push leaves rows pending and tickets queued; the next flush retries.
+    FLUSH_INTERVAL = 2.0
+    MAX_TICKETS = 1000
+
+    def __init__(self, mirror, repo, branch, interval=30, flush_interval=FLUSH_INTERVAL):
+        self.mirror, self.repo, self.branch, self.interval = mirror, repo, branch, interval
+        self.flush_interval = flush_interval
+        self.last_sync = None
+        self.last_error = None
+        self._seq = 0
+        self._tickets = OrderedDict()  # ticket -> {'state': 'queued' | 'committed', 'rows', 'delta', 'error'}
+        self._cond = threading.Condition()
+        self._wake = threading.Event()
+        self._last_flush = 0.0
+        self._failures = 0
+        self._thread = threading.Thread(target=self._run, name="history-sync", daemon=True)
+        self._thread.start()
+
+    def submit(self, df=None, rows=0):
+        # Save `df` to the mirror (or, with df=None, cover rows already upserted, e.g. by
+        # ingest) and queue it for the next commit. -> ticket for status()/wait()
+        with self.mirror._lock:
+            if df is not None: rows = self.mirror.upsert(df)
+            with self._cond:
+                # Issued under the mirror lock: a flush that snapshots pending after
+                # this point is guaranteed to contain these rows
+                self._seq += 1
+                tid = self._seq
+                self._tickets[tid] = {'state': 'queued', 'rows': rows, 'delta': None, 'error': None}
+                while len(self._tickets) > self.MAX_TICKETS: self._tickets.popitem(last=False)
+        self._wake.set()
+        return tid
+
+    def request(self):
+        self._wake.set()
+
+    def status(self, tid):
+        with self._cond:
+            t = self._tickets.get(tid)
+            return dict(t) if t else None
+
+    def wait(self, tid, timeout=None):
+        # Block until the ticket's rows are committed (-> its status) or the timeout passes
+        with self._cond:
+            self._cond.wait_for(lambda: self._tickets.get(tid, {}).get('state') != 'queued', timeout)
+            t = self._tickets.get(tid)
+            return dict(t) if t else None
+
+    @property
+    def queued(self):
+        with self._cond:
+            return sum(t['state'] == 'queued' for t in self._tickets.values())
+
+    def flush(self):
+        with self.mirror._lock:
+            parts = self.mirror.pending_parts()
+            with self._cond: hi = self._seq
+        try:
+            names = self.mirror.push(self.repo, self.branch, parts)
+        except Exception as e:
+            # Only the tickets this push carried failed; later ones have not been tried yet
+            with self._cond:
+                for tid, t in self._tickets.items():
+                    if tid <= hi and t['state'] == 'queued': t['error'] = str(e)
+                self._cond.notify_all()
+            raise
+        with self._cond:
+            for tid, t in self._tickets.items():
+                if tid <= hi and t['state'] == 'queued':
+                    t.update(state='committed', delta=names[-1] if names else None, error=None)
+            self._cond.notify_all()
+        return names
+
+    def _fail(self, err):
+        self.last_error = err
+        self._failures += 1
+
+    def _run(self):
+        while True:
+            # Back off while GitHub keeps failing; queued tickets make the next pass retry
+            self._wake.wait(min(self.interval, self.flush_interval * 2 ** self._failures) if self._failures else self.interval)
+            # Let saves arriving close together share one commit
+            time.sleep(max(0.0, self._last_flush + self.flush_interval - time.monotonic()))
+            self._wake.clear()
+            self._last_flush = time.monotonic()
+            try:
+                self.flush()
+                self.last_sync, self.last_error, self._failures = time.time(), None, 0
+                if compact(self.repo, self.branch):
+                    self.mirror.pull(self.repo, self.branch, ttl=0)
+            except Exception as e:
+                self._fail(str(e))
@@ -0,0 +1,396 @@
+import base64
+import hashlib
+import os
+import threading
+import time
+import uuid
+from io import StringIO
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from profiler import count, profiled
+
+# --- HISTORY STORE (GitHub CSV) ---
+HISTORY_FILE = "plant_history_v28.csv"
+# Each save adds one small CSV here instead of rewriting HISTORY_FILE;
+# compact() folds them back into the base snapshot once enough pile up.
+DELTA_DIR = "history_deltas"
+COMPACT_AFTER = 50
+# First line of a compacted snapshot: the delta names folded into it. A folded
+# delta whose delete failed is skipped from then on, never re-applied on top.
+FOLDED_TAG = "# folded: "
+# Answer to a write with a stale sha: someone else committed first
+CONFLICT_STATUSES = (409, 412, 422)
+KEY = ['Date', 'Unit']
+NUM_COLS = ['Gen', 'HR', 'Target HR', 'Profit', 'Vacuum', 'MS Temp', 'FG Temp', 'Spray', 'SOx', 'NOx', 'Ash Util', 'Ash Cement', 'Ash Bricks', 'Biomass', 'Solar']
+EMPTY_COLS = ["Date", "Unit", "Profit", "HR", "SOx", "NOx", "Gen", "Ash Util", "Coal Ash %", "Biomass", "Solar", "Vacuum", "MS Temp", "FG Temp", "Spray", "Ash Cement", "Ash Bricks"]
+# In-memory dtypes (mirror files, shared frames): 'Unit' is a category of string ids,
+# measurements are float32. Profit stays float64: it is summed into rupee totals.
+FLOAT64_COLS = ['Profit']
+
+
+def empty_history():
+    return pd.DataFrame(columns=EMPTY_COLS)
+
+
+def compact_dtypes(df):
+    # Columns already in their compact dtype are not copied
+    df = df.copy(deep=False)
+    if 'Date' in df.columns and not pd.api.types.is_datetime64_any_dtype(df['Date']): df['Date'] = pd.to_datetime(df['Date'])
+    if 'Unit' in df.columns and not isinstance(df['Unit'].dtype, pd.CategoricalDtype): df['Unit'] = df['Unit'].astype(str).astype('category')
+    for c in df.columns:
+        if c in NUM_COLS or c == 'Coal Ash %':
+            dtype = 'float64' if c in FLOAT64_COLS else 'float32'
+            if df[c].dtype != dtype: df[c] = df[c].astype(dtype)
+    return df
+
+
+def widen(df):
+    # float32 columns -> float64 of the same decimal (2401.37, not 2401.3701171875), for display and export
+    narrow = [c for c in df.columns if df[c].dtype == 'float32']
+    return df.assign(**{c: df[c].to_numpy().astype(str).astype('float64') for c in narrow}) if narrow else df
+
+
+def frame_bytes(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+@profiled("csv_parse")
+def parse_history(text):
+    folded = []
+    if text.startswith(FOLDED_TAG):
+        line, _, text = text.partition("\n")
+        folded = line[len(FOLDED_TAG):].split()
+    # Unit as text: a column of plain numbers would otherwise come back as int
+    df = pd.read_csv(StringIO(text), dtype={'Unit': str})
+    if folded: df.attrs['folded'] = folded
+    count("rows_parsed", len(df))
+    cols = [c for c in NUM_COLS if c in df.columns]
+    df[cols] = df[cols].apply(pd.to_numeric, errors='coerce').fillna(0)
+    # CRITICAL FIX: Convert to Pandas Timestamp
+    df['Date'] = pd.to_datetime(df['Date'])
+    return df
+
+
+@profiled("github_probe")
+def remote_sha(repo, branch, path=HISTORY_FILE):
+    # Directory listing carries blob shas without the file body, so this is the cheap "has it changed?" probe
+    folder, _, name = path.rpartition("/")
+    for entry in repo.get_contents(folder, ref=branch):
+        if entry.path == path or entry.name == name:
+            return entry.sha
+    return None
+
+
+@profiled("github_fetch")
+def fetch_text(repo, sha):
+    # Git blob API works for files over the 1 MB contents-API limit
+    blob = repo.get_git_blob(sha)
+    raw = base64.b64decode(blob.content)
+    count("bytes_fetched", len(raw))
+    return raw.decode()
+
+
+class HistoryIndex:
+    # History sorted on a (Date, Unit) MultiIndex. Every lookup is a binary search
+    # on the sorted dates plus a positional slice, instead of a full-column mask.
+    def __init__(self, df):
+        df = compact_dtypes(df[df['Date'].notna()])
+        self.df = df.drop_duplicates(subset=KEY, keep='last').set_index(KEY).sort_index()
+        self._dates = self.df.index.get_level_values('Date').to_numpy()
+        units = self.df.index.get_level_values('Unit').to_numpy()
+        self._unit_pos = {u: np.flatnonzero(units == u) for u in pd.unique(units)}
+
+    def _bounds(self, start=None, end=None):
+        lo = 0 if start is None else np.searchsorted(self._dates, np.datetime64(pd.Timestamp(start)), 'left')
+        hi = len(self._dates) if end is None else np.searchsorted(self._dates, np.datetime64(pd.Timestamp(end)), 'right')
+        return lo, hi
+
+    def day(self, date):
+        # Snapshot of one day, indexed by Unit (widened: it feeds the input table)
+        lo, hi = self._bounds(date, date)
+        return widen(self.df.iloc[lo:hi].droplevel('Date'))
+
+    def range(self, start=None, end=None):
+        lo, hi = self._bounds(start, end)
+        return self.df.iloc[lo:hi]
+
+    def unit(self, unit, start=None, end=None):
+        # One unit's rows in [start, end], indexed by Date
+        pos = self._unit_pos.get(str(unit), np.empty(0, dtype=int))
+        lo, hi = self._bounds(start, end)
+        pos = pos[np.searchsorted(pos, lo):np.searchsorted(pos, hi)]
+        return self.df.iloc[pos].droplevel('Unit')
+
+    def last_n_days(self, n, end=None):
+        end = pd.Timestamp(end if end is not None else self._dates[-1])
+        return self.range(end - pd.Timedelta(days=n - 1), end)
+
+    def units(self):
+        return sorted(self._unit_pos)
+
+    @property
+    def empty(self):
+        return self.df.empty
+
+
+class LocalRepo:
+    # Offline stand-in for a PyGithub Repository: the same calls used above,
+    # backed by a plain directory. Shas are git blob shas, like GitHub's.
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+        self._blobs = {}
+        os.makedirs(root, exist_ok=True)
+
+    def _abs(self, path):
+        return os.path.join(self.root, path)
+
+    @staticmethod
+    def _blob_sha(data):
+        return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+    def _entry(self, path):
+        with open(self._abs(path), 'rb') as f:
+            data = f.read()
+        sha = self._blob_sha(data)
+        self._blobs[sha] = path
+        return SimpleNamespace(path=path, name=os.path.basename(path), sha=sha, decoded_content=data)
+
+    def get_contents(self, path, ref=None):
+        full = self._abs(path)
+        if os.path.isdir(full):
+            return [self._entry(os.path.join(path, n) if path else n) for n in sorted(os.listdir(full)) if os.path.isfile(os.path.join(full, n))]
+        if not os.path.exists(full):
+            raise FileNotFoundError(path)
+        return self._entry(path)
+
+    def get_git_blob(self, sha):
+        path = self._blobs.get(sha)
+        entry = self._entry(path) if path and os.path.exists(self._abs(path)) else None
+        if entry is None or entry.sha != sha:
+            raise FileNotFoundError(sha)
+        return SimpleNamespace(sha=sha, content=base64.b64encode(entry.decoded_content).decode())
+
+    def _write(self, path, content):
+        data = content.encode() if isinstance(content, str) else content
+        full = self._abs(path)
+        os.makedirs(os.path.dirname(full) or ".", exist_ok=True)
+        tmp = f"{full}.tmp{os.getpid()}"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, full)
+        return {"content": self._entry(path)}
+
+    def create_file(self, path, message, content, branch=None):
+        with self._lock:
+            return self._write(path, content)
+
+    def update_file(self, path, message, content, sha, branch=None):
+        with self._lock:
+            if self.get_contents(path).sha != sha:
+                from github import GithubException
+                raise GithubException(409, {"message": f"{path} does not match {sha}"}, None)
+            return self._write(path, content)
+
+    def delete_file(self, path, message, sha, branch=None):
+        with self._lock:
+            if self.get_contents(path).sha != sha:
+                from github import GithubException
+                raise GithubException(409, {"message": f"{path} does not match {sha}"}, None)
+            os.remove(self._abs(path))
+
+
+class HistoryCache:
+    # One parsed history frame per process, shared by every Streamlit session.
+    # Within `ttl` seconds the frame is served without touching GitHub; after that
+    # only the blob sha is re-checked and the CSV is re-downloaded when it changed.
+    # The delta listing follows the same `ttl`, and base+deltas is kept per
+    # (sha, delta shas), so a cached load makes no GitHub calls at all.
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.checks = 0
+        self._lock = threading.Lock()
+        self._df = None
+        self._sha = None
+        self._probed = None
+        self._checked_at = 0.0
+        self._deltas, self._deltas_at = None, 0.0   # delta listing, re-listed at most once per `ttl`
+        self._resolved = None                       # ((sha, delta shas), base + deltas)
+
+    def _probe(self, repo, branch, path):
+        now = time.monotonic()
+        if self._checked_at and now - self._checked_at < self.ttl:
+            return self._probed
+        self._probed = remote_sha(repo, branch, path)
+        self.checks += 1
+        self._checked_at = now
+        return self._probed
+
+    def sha(self, repo, branch, path=HISTORY_FILE):
+        with self._lock:
+            return self._probe(repo, branch, path)
+
+    def get(self, repo, branch, path=HISTORY_FILE):
+        with self._lock:
+            sha = self._probe(repo, branch, path)
+            if sha is None:
+                raise FileNotFoundError(path)
+            if self._df is not None and sha == self._sha:
+                self.hits += 1
+                return self._df, self._sha
+            self.misses += 1
+            self._df, self._sha = parse_history(fetch_text(repo, sha)), sha
+            return self._df, self._sha
+
+    def deltas(self, repo, branch):
+        with self._lock:
+            now = time.monotonic()
+            if self._deltas is None or now - self._deltas_at >= self.ttl:
+                self._deltas, self._deltas_at = list_deltas(repo, branch), now
+            return self._deltas
+
+    def resolved(self, repo, base, sha, entries):
+        # base with its deltas applied, rebuilt only when the snapshot or the delta set changed
+        entries = unfolded(base, entries)
+        key = (sha, tuple(e.sha for e in entries))
+        with self._lock:
+            if self._resolved is not None and self._resolved[0] == key:
+                return self._resolved[1]
+        df = resolve(base, [read_delta(repo, e) for e in entries]) if entries else base
+        with self._lock:
+            self._resolved = (key, df)
+        return df
+
+    def invalidate_deltas(self):
+        with self._lock:
+            self._deltas, self._deltas_at = None, 0.0
+
+    def invalidate(self):
+        with self._lock:
+            self._df, self._sha, self._probed, self._checked_at = None, None, None, 0.0
+            self._deltas, self._deltas_at, self._resolved = None, 0.0, None
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "checks": self.checks, "ttl": self.ttl,
+                "hit_rate": self.hits / total if total else 0.0, "sha": self._sha}
+
+
+HISTORY_CACHE = HistoryCache()
+
+
+def load_history(repo, branch, strict=False, deltas=None):
+    # strict: raise on any fetch error instead of serving what could be read (the
+    # mirror must not record a snapshot or delta it did not get). deltas: the
+    # list_deltas() entries to apply, default the current listing.
+    if not repo: return empty_history(), None
+    if strict:
+        if HISTORY_CACHE.sha(repo, branch) is None: base, sha = empty_history(), None
+        else: base, sha = HISTORY_CACHE.get(repo, branch)
+        return HISTORY_CACHE.resolved(repo, base, sha, list_deltas(repo, branch, strict=True) if deltas is None else deltas), sha
+    try:
+        base, sha = HISTORY_CACHE.get(repo, branch)
+    except FileNotFoundError:
+        base, sha = empty_history(), None
+    except Exception:
+        return empty_history(), None
+    try:
+        return HISTORY_CACHE.resolved(repo, base, sha, HISTORY_CACHE.deltas(repo, branch) if deltas is None else deltas), sha
+    except Exception:
+        return base, sha
+
+
+def is_conflict(e):
+    return getattr(e, 'status', None) in CONFLICT_STATUSES
+
+
+def save_history(repo, df, sha, branch, folded=()):
+    # Raises on failure (is_conflict(e) when `sha` is stale); callers decide whether to retry.
+    # folded: names of the deltas merged into df (compact)
+    try:
+        df = df.copy()
+        df['Date'] = pd.to_datetime(df['Date']).dt.strftime('%Y-%m-%d')
+        csv_content = (FOLDED_TAG + " ".join(folded) + "\n" if folded else "") + df.to_csv(index=False)
+        msg = "Update" if sha else "Init"
+        if sha: repo.update_file(HISTORY_FILE, msg, csv_content, sha, branch=branch)
+        else: repo.create_file(HISTORY_FILE, msg, csv_content, branch=branch)
+        return True
+    finally:
+        HISTORY_CACHE.invalidate()
+
+
+# --- DELTA LOG ---
+_DELTA_FRAMES = {}  # blob sha -> parsed delta; deltas are never edited, only deleted
+
+
+def list_deltas(repo, branch, strict=False):
+    try:
+        entries = repo.get_contents(DELTA_DIR, ref=branch)
+    except Exception as e:
+        # No deltas/ folder yet is an empty log; with strict, any other failure raises
+        if strict and not (isinstance(e, FileNotFoundError) or getattr(e, 'status', None) == 404): raise
+        return []
+    # Names start with a nanosecond timestamp, so name order is write order
+    return sorted((e for e in entries if e.name.endswith('.csv')), key=lambda e: e.name)
+
+
+def unfolded(base, entries):
+    # Deltas still to apply on top of `base`: those it was not compacted from
+    folded = set(base.attrs.get('folded', ()))
+    return [e for e in entries if e.name not in folded] if folded else list(entries)
+
+
+def read_delta(repo, entry):
+    df = _DELTA_FRAMES.get(entry.sha)
+    if df is None:
+        df = _DELTA_FRAMES[entry.sha] = parse_history(fetch_text(repo, entry.sha))
+    return df
+
+
+def resolve(base, deltas):
+    # Last writer wins on (Date, Unit): later deltas override earlier ones and the base
+    df = pd.concat([base] + list(deltas), ignore_index=True)
+    df['Unit'] = df['Unit'].astype(str)
+    return df.drop_duplicates(subset=KEY, keep='last').sort_values(KEY, ignore_index=True)
+
+
+def write_delta(repo, rows, branch):
+    rows = rows.copy()
+    rows['Date'] = pd.to_datetime(rows['Date']).dt.strftime('%Y-%m-%d')
+    name = f"{DELTA_DIR}/{time.time_ns()}-{uuid.uuid4().hex[:8]}.csv"
+    repo.create_file(name, f"Delta ({len(rows)} rows)", rows.to_csv(index=False), branch=branch)
+    HISTORY_CACHE.invalidate_deltas()
+    return name
+
+
+def compact(repo, branch, min_deltas=COMPACT_AFTER):
+    deltas = list_deltas(repo, branch)
+    if len(deltas) < min_deltas: return False
+    try:
+        base, sha = HISTORY_CACHE.get(repo, branch)
+    except FileNotFoundError:
+        base, sha = empty_history(), None
+    # Deltas written meanwhile are not in this list; they stay and still apply on top.
+    # All listed deltas go in the new snapshot's folded list, including ones a previous
+    # compaction folded but failed to delete (already in the base, not re-applied).
+    merged = resolve(base, [read_delta(repo, e) for e in unfolded(base, deltas)])
+    try:
+        save_history(repo, merged, sha, branch, folded=[e.name for e in deltas])
+    except Exception as e:
+        # Another host compacted first. Re-merging these deltas onto its snapshot could
+        # roll back newer rows it folded in, so leave it to that host; nothing is lost.
+        if is_conflict(e): return False
+        raise
+    errors = []
+    for e in deltas:
+        try: repo.delete_file(e.path, "Compact", e.sha, branch=branch)
+        except Exception as err: errors.append(err)
+        _DELTA_FRAMES.pop(e.sha, None)
+    # The snapshot is saved and skips the leftovers; report them, the next compaction retries
+    if errors: raise errors[0]
+    return True
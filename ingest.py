@@ -0,0 +1,150 @@
+import codecs
+import time
+
+import numpy as np
+import pandas as pd
+
+from history_store import EMPTY_COLS, KEY, NUM_COLS
+
+# --- BULK INGEST ---
+# Streams a history export into the mirror in chunks: the encoding is sniffed
+# once from the first block, each chunk is validated with column-wise checks,
+# duplicates on (Date, Unit) collapse to the last row seen (later chunks and
+# later uploads win), and rejected rows are kept with their line and reason.
+CHUNK_ROWS = 200_000
+SNIFF_BYTES = 1 << 16
+ENCODINGS = ['utf-8-sig', 'cp1252', 'latin-1']
+KNOWN_COLS = list(dict.fromkeys(EMPTY_COLS + NUM_COLS))
+# Physically possible values; anything outside is a typo or a unit mix-up
+RANGES = {
+    'Gen': (0, 30), 'HR': (0, 20000), 'Target HR': (0, 5000), 'Coal Ash %': (0, 100),
+    'SOx': (0, 5000), 'NOx': (0, 5000), 'MS Temp': (0, 700), 'FG Temp': (0, 400), 'Spray': (0, 500),
+    'Ash Util': (0, 1e6), 'Ash Cement': (0, 1e6), 'Ash Bricks': (0, 1e6), 'Biomass': (0, 1e5), 'Solar': (0, 100),
+}
+MAX_KEPT_REJECTS = 10_000  # all rejects are counted; only this many are kept for download
+
+
+def detect_encoding(f):
+    pos = f.tell()
+    head = f.read(SNIFF_BYTES)
+    f.seek(pos)
+    if isinstance(head, str): return None
+    for enc in ENCODINGS:
+        try:
+            # Incremental, so a multi-byte character cut at the block edge is not an error
+            codecs.getincrementaldecoder(enc)().decode(head, final=False)
+            return enc
+        except UnicodeDecodeError:
+            continue
+    return 'latin-1'
+
+
+def read_chunks(f, encoding, chunksize=CHUNK_ROWS):
+    # Everything as text: blank and non-numeric cells must stay distinguishable for validation
+    reader = pd.read_csv(f, encoding=encoding, encoding_errors='replace', dtype=str, chunksize=chunksize, skipinitialspace=True)
+    for chunk in reader:
+        chunk.columns = chunk.columns.str.strip()
+        yield chunk
+
+
+def check_columns(columns):
+    missing = [c for c in KEY if c not in columns]
+    if missing: raise ValueError(f"missing column(s): {', '.join(missing)}")
+    return [c for c in columns if c not in KNOWN_COLS]
+
+
+def validate(chunk, first_line=2):
+    # -> (clean rows typed like the mirror, rejected rows with 'line' and 'reason')
+    n = len(chunk)
+    reason = np.full(n, '', dtype=object)
+
+    def flag(mask, why):
+        mask = np.asarray(mask, dtype=bool) & (reason == '')
+        reason[mask] = why
+
+    date_txt = chunk['Date'].str.strip()
+    dates = pd.to_datetime(date_txt, errors='coerce')
+    flag(date_txt.isna() | (date_txt == ''), 'missing Date')
+    flag(dates.isna(), 'unparseable Date')
+    unit = chunk['Unit'].str.strip().str.replace(r'\.0+$', '', regex=True)
+    flag(unit.isna() | (unit == ''), 'missing Unit')
+
+    out = pd.DataFrame({'Date': dates, 'Unit': unit}, index=chunk.index)
+    num_cols = [c for c in KNOWN_COLS if c in chunk.columns and c not in KEY]
+    blank = np.ones(n, dtype=bool)
+    for c in num_cols:
+        txt = chunk[c].str.strip().replace('', None)
+        vals = pd.to_numeric(txt.str.replace(',', '', regex=False), errors='coerce')
+        flag(txt.notna() & vals.isna(), f"non-numeric {c}")
+        if c in RANGES:
+            lo, hi = RANGES[c]
+            flag((vals < lo) | (vals > hi), f"{c} out of range [{lo:g}, {hi:g}]")
+        blank &= vals.isna().to_numpy()
+        out[c] = vals.astype('float64')
+    if num_cols: flag(blank, 'no values')
+
+    bad = reason != ''
+    rejects = chunk[bad].copy()
+    rejects.insert(0, 'reason', reason[bad])
+    rejects.insert(0, 'line', np.flatnonzero(bad) + first_line)
+    return out[~bad], rejects
+
+
+def ingest(f, mirror, chunksize=CHUNK_ROWS):
+    # Returns a report dict; raises ValueError when the file has no Date/Unit columns
+    t_total = time.perf_counter()
+    stages = {s: {'seconds': 0.0, 'rows': 0} for s in ('read', 'validate', 'dedupe', 'merge')}
+    report = {'encoding': detect_encoding(f), 'rows': 0, 'accepted': 0, 'rejected': 0, 'duplicates': 0,
+              'ignored_cols': [], 'reasons': {}, 'stages': stages}
+    kept_rejects = []
+    seen = np.empty(0, dtype='uint64')  # sorted hashes of the (Date, Unit) keys merged so far in this run
+    first_line = 2  # line 1 is the header
+    chunks = read_chunks(f, report['encoding'], chunksize)
+    while True:
+        t = time.perf_counter()
+        chunk = next(chunks, None)
+        if chunk is None: break
+        stages['read']['seconds'] += time.perf_counter() - t
+        stages['read']['rows'] += len(chunk)
+        if not report['rows']: report['ignored_cols'] = check_columns(chunk.columns)
+        report['rows'] += len(chunk)
+
+        t = time.perf_counter()
+        clean, rejects = validate(chunk.reset_index(drop=True), first_line)
+        first_line += len(chunk)
+        stages['validate']['seconds'] += time.perf_counter() - t
+        stages['validate']['rows'] += len(chunk)
+        report['rejected'] += len(rejects)
+        for why, count in rejects['reason'].value_counts().items():
+            report['reasons'][why] = report['reasons'].get(why, 0) + int(count)
+        room = MAX_KEPT_REJECTS - sum(len(r) for r in kept_rejects)
+        if room > 0 and len(rejects): kept_rejects.append(rejects.head(room))
+
+        # Last writer wins inside the chunk; the mirror applies the same rule against stored rows.
+        # Keys already merged from an earlier chunk of this upload are duplicates too.
+        t = time.perf_counter()
+        deduped = clean.drop_duplicates(subset=KEY, keep='last')
+        keys = pd.util.hash_pandas_object(deduped[KEY], index=False).to_numpy()
+        pos = np.searchsorted(seen, keys)
+        again = int((seen[np.minimum(pos, len(seen) - 1)] == keys).sum()) if len(seen) else 0
+        seen = np.sort(np.concatenate([seen, keys]), kind='stable')  # two sorted runs: a linear merge
+        report['duplicates'] += len(clean) - len(deduped) + again
+        stages['dedupe']['seconds'] += time.perf_counter() - t
+        stages['dedupe']['rows'] += len(clean)
+
+        t = time.perf_counter()
+        report['accepted'] += (mirror.upsert(deduped) - again) if len(deduped) else 0
+        stages['merge']['seconds'] += time.perf_counter() - t
+        stages['merge']['rows'] += len(deduped)
+
+    for s in stages.values():
+        s['rows_per_s'] = s['rows'] / s['seconds'] if s['seconds'] > 0 else 0.0
+    report['seconds'] = time.perf_counter() - t_total
+    report['rejects'] = pd.concat(kept_rejects, ignore_index=True) if kept_rejects else pd.DataFrame(columns=['line', 'reason'])
+    return report
+
+
+def report_frame(report):
+    # Per-stage throughput table for display
+    return pd.DataFrame([{'Stage': name, 'Rows': s['rows'], 'Seconds': round(s['seconds'], 3), 'Rows/s': round(s['rows_per_s'])}
+                         for name, s in report['stages'].items()])
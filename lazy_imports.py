@@ -0,0 +1,79 @@
+import importlib
+import os
+import subprocess
+import sys
+import threading
+import time
+
+# --- LAZY IMPORTS ---
+# Heavy modules the first paint does not need (PDF/matplotlib, Excel export, PyGithub,
+# plotly.express/subplots, streamlit_lottie) are bound to a LazyModule and only
+# imported when a feature first touches them. LAZY_IMPORTS=0 imports everything
+# up front instead, for comparison. Every timed import is kept in IMPORT_TIMES.
+#
+#   python lazy_imports.py     # cold import cost of each heavy module, one fresh interpreter each
+LAZY = os.environ.get("LAZY_IMPORTS", "1").lower() not in ("0", "false", "no")
+HEAVY = ['pdf_engine', 'excel_export', 'matplotlib.figure', 'fpdf', 'github', 'plotly.express', 'plotly.subplots', 'streamlit_lottie', 'requests', 'openpyxl', 'xlsxwriter']
+IMPORT_TIMES = {}  # module -> {'ms', 'phase' ('startup' | 'first use'), 'at'}
+_lock = threading.Lock()
+
+
+def timed_import(name, phase="startup"):
+    if name in sys.modules: return sys.modules[name]
+    t0 = time.perf_counter()
+    mod = importlib.import_module(name)
+    with _lock:
+        IMPORT_TIMES.setdefault(name, {'ms': round((time.perf_counter() - t0) * 1000, 1), 'phase': phase, 'at': time.time()})
+    return mod
+
+
+class LazyModule:
+    def __init__(self, name):
+        self._name = name
+        self._mod = None
+
+    def _load(self):
+        if self._mod is None: self._mod = timed_import(self._name, "first use")
+        return self._mod
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    @property
+    def loaded(self):
+        return self._mod is not None or self._name in sys.modules
+
+    def __repr__(self):
+        return f"<lazy module '{self._name}' ({'loaded' if self.loaded else 'not loaded'})>"
+
+
+def lazy(name):
+    return LazyModule(name) if LAZY else timed_import(name)
+
+
+def report():
+    # Rows for the admin panel: what has been imported so far, when and at what cost
+    with _lock:
+        rows = [{'Module': m, 'ms': v['ms'], 'Phase': v['phase']} for m, v in IMPORT_TIMES.items()]
+    pending = [{'Module': m, 'ms': None, 'Phase': 'not loaded'} for m in HEAVY if m not in sys.modules]
+    return sorted(rows, key=lambda r: -r['ms']) + pending
+
+
+def cold_costs(modules=HEAVY, base="import streamlit, pandas, numpy"):
+    # Import cost of each module in a fresh interpreter, on top of what every session loads anyway
+    out = {}
+    for m in modules:
+        code = f"{base}; import time; t = time.perf_counter(); import {m}; print((time.perf_counter() - t) * 1000)"
+        r = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        try:
+            out[m] = float(r.stdout.strip().splitlines()[-1])
+        except (ValueError, IndexError):
+            out[m] = None
+    return out
+
+
+if __name__ == "__main__":
+    costs = cold_costs()
+    for m, ms in sorted(costs.items(), key=lambda kv: -(kv[1] or 0)):
+        print(f"{m:<22}{'failed' if ms is None else f'{ms:8.0f} ms'}")
+    print(f"{'total':<22}{sum(v for v in costs.values() if v):8.0f} ms (modules share dependencies, e.g. pdf_engine includes matplotlib, so this over-counts)")
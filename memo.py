@@ -0,0 +1,113 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from engine import fleet_units
+from profiler import count
+
+# --- MEMOIZED RESULTS ---
+# One bounded LRU per process, shared by every session: computed unit dicts and
+# built Plotly figures, keyed by a hash of exactly what they are computed from.
+# A rerun where one unit's input (or an unrelated widget) changed rebuilds only
+# what that change reaches. Cached values are shared, so callers must not
+# mutate them (a figure is passed to st.plotly_chart as is).
+MEMO_ENTRIES = 512
+
+
+def _feed(h, part):
+    if isinstance(part, (pd.Series, pd.Index)): part = part.to_numpy()
+    if isinstance(part, np.ndarray):
+        h.update(f"nd{part.dtype}{part.shape}".encode())
+        h.update(repr(part.tolist()).encode() if part.dtype == object else np.ascontiguousarray(part).tobytes())
+    elif isinstance(part, pd.DataFrame):
+        _feed(h, list(part.columns))
+        for c in part.columns: _feed(h, part[c])
+    elif isinstance(part, dict):
+        h.update(b"{")
+        for k in sorted(part, key=str):
+            _feed(h, k)
+            _feed(h, part[k])
+        h.update(b"}")
+    elif isinstance(part, (list, tuple)):
+        h.update(b"(")
+        for p in part: _feed(h, p)
+        h.update(b")")
+    else:
+        h.update(f"{type(part).__name__}:{part!r}|".encode())
+
+
+def digest(*parts):
+    h = hashlib.blake2b(digest_size=16)
+    for p in parts: _feed(h, p)
+    return h.hexdigest()
+
+
+class Memo:
+    def __init__(self, max_entries=MEMO_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._items = OrderedDict()   # (kind, digest) -> (value, build ms)
+        self._stats = {}              # kind -> {'hits', 'misses', 'build_ms', 'saved_ms'}
+
+    def _kind(self, kind):
+        return self._stats.setdefault(kind, {'hits': 0, 'misses': 0, 'build_ms': 0.0, 'saved_ms': 0.0})
+
+    def lookup(self, kind, key):
+        with self._lock:
+            item = self._items.get((kind, key))
+            s = self._kind(kind)
+            if item is None:
+                s['misses'] += 1
+                count("memo_misses")
+                return None
+            self._items.move_to_end((kind, key))
+            s['hits'] += 1
+            s['saved_ms'] += item[1]
+        count("memo_hits")
+        return item
+
+    def store(self, kind, key, value, ms):
+        with self._lock:
+            self._items[(kind, key)] = (value, ms)
+            self._items.move_to_end((kind, key))
+            self._kind(kind)['build_ms'] += ms
+            while len(self._items) > self.max_entries: self._items.popitem(last=False)
+
+    def get(self, kind, parts, build):
+        # build() on a miss; parts: everything the value depends on
+        key = digest(parts)
+        item = self.lookup(kind, key)
+        if item is not None: return item[0]
+        t0 = time.perf_counter()
+        value = build()
+        self.store(kind, key, value, (time.perf_counter() - t0) * 1000)
+        return value
+
+    def stats(self):
+        # -> one row per kind: hits, misses, hit rate, entries, ms spent building and ms saved by hits
+        with self._lock:
+            entries = {}
+            for kind, _ in self._items: entries[kind] = entries.get(kind, 0) + 1
+            return [{'Kind': k, 'Hits': s['hits'], 'Misses': s['misses'], 'Hit rate': s['hits'] / max(1, s['hits'] + s['misses']),
+                     'Entries': entries.get(k, 0), 'Build ms': s['build_ms'], 'Saved ms': s['saved_ms']} for k, s in sorted(self._stats.items())]
+
+
+def units(memo, inputs_df, configs, ash_pct, date):
+    # fleet_units, with each unit's dict memoized on its own input row, design values, ash % and date;
+    # only the units that missed go through the engine (still as one batch)
+    rows = inputs_df.to_dict('records')
+    keys = [digest(r, configs[str(r['Unit'])], ash_pct, str(date)) for r in rows]
+    out = [memo.lookup('unit', k) for k in keys]
+    missing = [i for i, item in enumerate(out) if item is None]
+    if missing:
+        t0 = time.perf_counter()
+        fresh = fleet_units(inputs_df.iloc[missing], configs, ash_pct)
+        ms = (time.perf_counter() - t0) * 1000 / len(missing)
+        for i, u in zip(missing, fresh):
+            memo.store('unit', keys[i], u, ms)
+            out[i] = (u, ms)
+    return [item[0] for item in out]
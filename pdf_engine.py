@@ -0,0 +1,181 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import fpdf
+import numpy as np
+from fpdf import FPDF
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from profiler import profiled
+
+# --- 4. PDF ENGINE ---
+# PyFPDF 1.7 only embeds images from files; fpdf2 takes PIL images directly.
+# image_rgb registers charts in 1.7.2's internal image table (requirements pin
+# that exact version); any other PyFPDF 1.x refuses to render charts rather
+# than writing a broken PDF.
+LEGACY_FPDF = str(getattr(fpdf, 'FPDF_VERSION', '1')).startswith('1')
+CHART_SIZE = (6, 3)
+CHART_DPI = 100
+PARALLEL_MIN_UNITS = 4  # below this a process pool costs more than it saves
+
+
+class PDF(FPDF):
+    def header(self):
+        self.set_font('Arial', 'B', 16)
+        self.set_text_color(0, 51, 153)
+        self.cell(0, 10, 'GMR Kamalanga - 5S Report', 0, 1, 'C')
+        self.ln(5)
+    def footer(self):
+        self.set_y(-15)
+        self.set_font('Arial', 'I', 8)
+        self.set_text_color(128, 128, 128)
+        self.cell(0, 10, f'Page {self.page_no()}', 0, 0, 'C')
+
+    def image_rgb(self, key, chart, x, y, w):
+        # chart = (width_px, height_px, raw RGB bytes); nothing touches the disk
+        w_px, h_px, rgb = chart
+        if LEGACY_FPDF:
+            if fpdf.FPDF_VERSION != '1.7.2': raise RuntimeError(f"charts need fpdf==1.7.2 or fpdf2, found fpdf {fpdf.FPDF_VERSION}")
+            if key not in self.images:
+                self.images[key] = {'w': w_px, 'h': h_px, 'cs': 'DeviceRGB', 'bpc': 8, 'f': 'FlateDecode',
+                                    'data': zlib.compress(rgb), 'i': len(self.images) + 1}
+            self.image(key, x=x, y=y, w=w)
+        else:
+            from PIL import Image
+            self.image(Image.frombytes('RGB', (w_px, h_px), rgb), x=x, y=y, w=w)
+
+
+# --- CHART RENDERING ---
+_FIG = None  # one reusable figure per process
+_FIG_LOCK = threading.Lock()
+
+
+def render_loss_chart(tech_map):
+    with _FIG_LOCK:
+        return _draw_loss_chart(tech_map)
+
+
+def _draw_loss_chart(tech_map):
+    global _FIG
+    if _FIG is None:
+        _FIG = Figure(figsize=CHART_SIZE, dpi=CHART_DPI)
+        FigureCanvasAgg(_FIG)
+    _FIG.clear()
+    ax = _FIG.add_subplot()
+    ax.bar([x[0] for x in tech_map], [x[1] for x in tech_map], color='#FF3333')
+    ax.set_title("Losses")
+    _FIG.canvas.draw()
+    rgba = np.asarray(_FIG.canvas.buffer_rgba())
+    h_px, w_px = rgba.shape[:2]
+    return w_px, h_px, rgba[:, :, :3].tobytes()
+
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_pool():
+    # Persistent pool: workers keep their matplotlib import and figure between reports.
+    # spawn, not fork, because the Streamlit server process is multi-threaded.
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ProcessPoolExecutor(max_workers=min(4, os.cpu_count() or 1), mp_context=multiprocessing.get_context("spawn"))
+        return _POOL
+
+
+@profiled("pdf_charts")
+def render_unit_charts(units, parallel=None):
+    tech_maps = [[("Vac", u['losses']['Vacuum']), ("MS", u['losses']['MS Temp']), ("FG", u['losses']['Flue Gas'])] for u in units]
+    if parallel is None: parallel = len(units) >= PARALLEL_MIN_UNITS and (os.cpu_count() or 1) > 1
+    if parallel:
+        return list(get_pool().map(render_loss_chart, tech_maps))
+    return [render_loss_chart(t) for t in tech_maps]
+
+
+@profiled("pdf_render")
+def create_full_pdf(units, fleet_pnl, ash_data, green_data, report_date=None, parallel=None, period=None):
+    # period: label printed instead of the date, e.g. "2025-04 (30 days)" for a monthly report
+    report_date = report_date or datetime.now()
+    charts = render_unit_charts(units, parallel)
+    pdf = PDF()
+    pdf.add_page()
+    pdf.set_font("Arial", 'B', 12)
+    pdf.cell(0, 10, f"{'Period: ' + period if period else 'Date: ' + report_date.strftime('%Y-%m-%d')} | P&L: Rs {fleet_pnl:,.0f}", 1, 1, 'C')
+    pdf.ln(10)
+    pdf.set_font("Arial", 'B', 10)
+    pdf.set_fill_color(220, 220, 220)
+    headers = ["Unit", "Gen", "HR", "Profit", "SOx", "NOx"]
+    for h in headers: pdf.cell(30, 10, h, 1, 0, 'C', 1)
+    pdf.ln()
+    pdf.set_font("Arial", size=10)
+    for u in units:
+        pdf.cell(30, 10, f"U{u['id']}", 1)
+        pdf.cell(30, 10, str(u['gen']), 1)
+        pdf.cell(30, 10, str(u['hr']), 1)
+        pdf.cell(30, 10, f"{u['profit']:,.0f}", 1)
+        pdf.cell(30, 10, str(u['sox']), 1)
+        pdf.cell(30, 10, str(u['nox']), 1)
+        pdf.ln()
+    for u, chart in zip(units, charts):
+        pdf.add_page()
+        pdf.set_font("Arial", 'B', 14)
+        pdf.cell(0, 10, f"Unit {u['id']} Analysis", 0, 1)
+        pdf.ln(5)
+        pdf.image_rgb(f"loss_{u['id']}", chart, x=10, y=pdf.get_y(), w=100)
+        pdf.ln(60)
+        pdf.set_font("Arial", size=10)
+        pdf.cell(0, 10, f"ESCerts: {u['escerts']:.2f} | Carbon Credits: {u['carbon']:.2f}", 0, 1)
+    pdf.add_page()
+    pdf.set_font("Arial", 'B', 14)
+    pdf.cell(0, 10, "Environment & Ash", 0, 1)
+    pdf.ln(5)
+    pdf.set_font("Arial", size=10)
+    pdf.cell(0, 10, f"Ash Gen: {ash_data['gen']:.0f} T | Util: {ash_data['util']:.0f} T", 0, 1)
+    pdf.cell(0, 10, f"Solar CO2 Saved: {green_data['sol_co2']:.2f} T", 0, 1)
+    out = pdf.output(dest='S')
+    return out.encode('latin-1') if isinstance(out, str) else bytes(out)
+
+
+# --- REPORT CACHE ---
+class ReportCache:
+    # Finished PDFs keyed by a hash of everything that goes into them (bounded LRU)
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+
+    @staticmethod
+    def key(*inputs):
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode()).hexdigest()
+
+    def get_or_build(self, build, *inputs):
+        k = self.key(*inputs)
+        with self._lock:
+            if k in self._items:
+                self.hits += 1
+                self._items.move_to_end(k)
+                return self._items[k]
+        data = build(*inputs)
+        with self._lock:
+            self.misses += 1
+            self._items[k] = data
+            while len(self._items) > self.max_entries: self._items.popitem(last=False)
+        return data
+
+
+REPORT_CACHE = ReportCache()
+
+
+def build_report(units, fleet_pnl, ash_data, green_data, report_date=None):
+    return REPORT_CACHE.get_or_build(create_full_pdf, units, fleet_pnl, ash_data, green_data, report_date)
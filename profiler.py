@@ -0,0 +1,188 @@
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# --- RERUN PROFILER ---
+# One Profiler per script run (or fragment rerun): named timing spans around the
+# stages of the run plus counters such as bytes fetched and rows scanned. Library
+# code reports through the module-level span()/count()/profiled(), which are
+# no-ops unless a profiler is active on the calling thread. Counts made on other
+# threads (background sync, asset downloads) are pooled and handed to the next
+# finished run as "bg:<name>". Finished runs are appended to a JSON-lines log,
+# rotated to <log>.1 once it passes PROFILE_LOG_BYTES (so at most two files).
+PROFILE_LOG = "profile_log.jsonl"
+PROFILE_LOG_BYTES = 16 * 1024 * 1024
+_local = threading.local()
+_bg_lock = threading.Lock()
+_bg_counts = {}
+_seq = [0]  # runs started in this process; seq 1 is the cold start
+_PAGE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+class Profiler:
+    def __init__(self, kind="rerun", since=None, **tags):
+        # since: perf_counter() value the run actually began at (e.g. before the imports)
+        self.kind, self.tags = kind, tags
+        with _bg_lock:
+            _seq[0] += 1
+            self.seq = _seq[0]
+        self._t0 = time.perf_counter() if since is None else since
+        self.started = time.time() - (time.perf_counter() - self._t0)
+        self.spans = {}      # name -> total ms (a span entered twice accumulates)
+        self.calls = {}      # name -> times entered
+        self.counters = {}
+        self._stack = []
+        self.finished = False
+
+    @contextmanager
+    def span(self, name):
+        # Nested spans are recorded under their full path, e.g. "tab:Trends/plotly"
+        path = "/".join(self._stack + [name])
+        self._stack.append(name)
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            self.spans[path] = self.spans.get(path, 0.0) + (time.perf_counter() - t0) * 1000
+            self.calls[path] = self.calls.get(path, 0) + 1
+
+    def add(self, name, ms):
+        # A span measured elsewhere
+        self.spans[name] = self.spans.get(name, 0.0) + ms
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def record(self):
+        return {"ts": datetime.fromtimestamp(self.started).isoformat(timespec='milliseconds'), "kind": self.kind, "seq": self.seq, **self.tags,
+                "total_ms": round((time.perf_counter() - self._t0) * 1000, 2), "rss_mb": round(rss_bytes() / 1e6, 1),
+                "spans": {k: round(v, 2) for k, v in self.spans.items()}, "calls": self.calls, "counters": self.counters}
+
+
+def rss_bytes():
+    # Resident memory of this process (every session shares it); peak RSS where /proc is missing
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE
+    except (OSError, ValueError, IndexError):
+        try:
+            import resource
+        except ImportError:
+            return 0
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+
+
+def start(kind="rerun", since=None, **tags):
+    _local.prof = Profiler(kind, since, **tags)
+    return _local.prof
+
+
+def current():
+    prof = getattr(_local, "prof", None)
+    return prof if prof is not None and not prof.finished else None
+
+
+def finish(prof, log_path=PROFILE_LOG):
+    prof.finished = True
+    if getattr(_local, "prof", None) is prof: _local.prof = None
+    with _bg_lock:
+        for name, n in _bg_counts.items(): prof.count(f"bg:{name}", n)
+        _bg_counts.clear()
+    rec = prof.record()
+    if log_path: append(log_path, rec)
+    return rec
+
+
+def span(name):
+    prof = current()
+    return prof.span(name) if prof else _noop()
+
+
+@contextmanager
+def _noop():
+    yield
+
+
+def count(name, n=1):
+    prof = current()
+    if prof:
+        prof.count(name, n)
+    else:
+        with _bg_lock:
+            _bg_counts[name] = _bg_counts.get(name, 0) + n
+
+
+def profiled(name):
+    # Decorator: run the function inside span(name)
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+# --- LOG ---
+_log_lock = threading.Lock()
+
+
+def append(path, rec):
+    line = json.dumps(rec, separators=(',', ':')) + "\n"
+    try:
+        with _log_lock:
+            if os.path.exists(path) and os.path.getsize(path) >= PROFILE_LOG_BYTES: os.replace(path, path + ".1")
+            with open(path, "a") as f:
+                f.write(line)
+    except OSError:
+        pass
+
+
+def load_log(path=PROFILE_LOG, days=None):
+    # -> one row per logged run: ts, kind, total_ms, plus span:<name> and counter columns
+    files = [f for f in (path + ".1", path) if os.path.exists(f)] if path else []  # rotated half first
+    if not files: return pd.DataFrame(columns=['ts', 'kind', 'total_ms'])
+    since = (datetime.now() - timedelta(days=days)).isoformat() if days else None
+    rows = []
+    for name in files:
+        with open(name) as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue  # a torn last line from a crash
+                if since and rec.get("ts", "") < since: continue
+                row = {k: v for k, v in rec.items() if k not in ("spans", "calls", "counters")}
+                row.update({f"span:{k}": v for k, v in rec.get("spans", {}).items()})
+                row.update(rec.get("counters", {}))
+                rows.append(row)
+    df = pd.DataFrame(rows)
+    if len(df): df['ts'] = pd.to_datetime(df['ts'])
+    return df
+
+
+def percentiles(df, q=(50, 95)):
+    # p50/p95 (ms) of the total and of every span, over the runs in df
+    cols = ['total_ms'] + sorted(c for c in df.columns if c.startswith("span:"))
+    out = {c.removeprefix("span:"): {f"p{p}": float(np.nanpercentile(df[c].astype('float64'), p)) for p in q} | {"runs": int(df[c].notna().sum())}
+           for c in cols if df[c].notna().any()}
+    return pd.DataFrame.from_dict(out, orient='index')
+
+
+def daily(df, q=(50, 95)):
+    # Per-day p50/p95 of the total rerun latency (and peak RSS), for charting over days of use
+    if df.empty: return pd.DataFrame()
+    g = df.set_index('ts')['total_ms'].astype('float64').groupby(pd.Grouper(freq='D'))
+    out = pd.DataFrame({f"p{p}": g.quantile(p / 100) for p in q} | {"runs": g.size()}).dropna()
+    if 'rss_mb' in df.columns: out['rss_mb'] = df.set_index('ts')['rss_mb'].astype('float64').groupby(pd.Grouper(freq='D')).max()
+    return out
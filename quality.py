@@ -0,0 +1,190 @@
+import threading
+from bisect import bisect_left, insort
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+# --- DATA-QUALITY FLAGS ---
+# A HistoryMirror listener keeping, per unit and metric, a rolling window of
+# the last `window` running days: online mean/variance (Welford, add + evict)
+# and a sorted copy for the quartiles. Every row is scored against the window
+# *before* it, then pushed in, so a save or an ingested row costs O(window)
+# at worst (the sorted insert), independent of how long the history is.
+#   outlier    - outside the IQR fence [Q1 - k*IQR, Q3 + k*IQR] and |z| >= z_min
+#   stuck      - the same reading on `stuck_run` running days in a row
+#   incomplete - generation logged but no plausible heat rate (blank HR)
+# Shutdown days (Gen <= 0) are neither scored nor added to the windows.
+QUALITY_METRICS = ['HR', 'Vacuum', 'MS Temp', 'FG Temp', 'SOx', 'NOx']
+QUALITY_COLS = ['Date', 'Unit', 'Gen'] + QUALITY_METRICS
+MIN_HR = 100.0          # below this a logged HR is a blank, not a reading (as Trends' "Hide Shutdowns")
+FLAG_COLS = ['Date', 'Unit', 'Metric', 'Flag', 'Value', 'Mean', 'z']
+
+
+def _outlier(x, n, mean, std, q1, q3, k, z_min, min_periods):
+    # As arrays even for one reading: a constant window (std 0) must give z = 0 / ±inf, not ZeroDivisionError
+    x, mean, std = np.asarray(x, dtype='float64'), np.asarray(mean, dtype='float64'), np.asarray(std, dtype='float64')
+    iqr = q3 - q1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = np.where(std > 0, (x - mean) / std, np.where(x == mean, 0.0, np.copysign(np.inf, x - mean)))
+    return (n >= min_periods) & ((x < q1 - k * iqr) | (x > q3 + k * iqr)) & (np.abs(z) >= z_min), z
+
+
+class _Window:
+    # Last `size` values of one unit's metric, with running stats
+    __slots__ = ('size', 'vals', 'sorted', 'mean', 'm2', 'last', 'run', 'day', 'undo')
+
+    def __init__(self, size):
+        self.size = size
+        self.vals, self.sorted = deque(), []
+        self.mean = self.m2 = 0.0
+        self.last, self.run, self.day, self.undo = None, 0, None, None
+
+    def _add(self, x):
+        self.vals.append(x)
+        insort(self.sorted, x)
+        d = x - self.mean
+        self.mean += d / len(self.vals)
+        self.m2 += d * (x - self.mean)
+
+    def _remove(self, x, newest):
+        self.vals.pop() if newest else self.vals.popleft()
+        del self.sorted[bisect_left(self.sorted, x)]
+        n = len(self.vals)
+        if not n:
+            self.mean = self.m2 = 0.0
+            return
+        d = x - self.mean
+        self.mean -= d / n
+        self.m2 = max(0.0, self.m2 - d * (x - self.mean))
+
+    def push(self, x, day):
+        self.undo = (self.last, self.run, self.day)
+        self.run = self.run + 1 if x == self.last else 1
+        self.last, self.day = x, day
+        self._add(x)
+        if len(self.vals) > self.size: self._remove(self.vals[0], newest=False)
+
+    def pop_newest(self):
+        # Take back today's value when the same day is saved again (the window is one short until the next day)
+        self._remove(self.vals[-1], newest=True)
+        self.last, self.run, self.day = self.undo
+        self.undo = None
+
+    def quantile(self, q):
+        # Linear interpolation, as numpy / pandas rolling quantile
+        s = self.sorted
+        pos = q * (len(s) - 1)
+        lo = int(pos)
+        return s[lo] + (s[min(lo + 1, len(s) - 1)] - s[lo]) * (pos - lo)
+
+    def stats(self):
+        n = len(self.vals)
+        if not n: return 0, np.nan, np.nan, np.nan, np.nan
+        std = (self.m2 / (n - 1)) ** 0.5 if n > 1 else np.nan
+        return n, self.mean, std, self.quantile(0.25), self.quantile(0.75)
+
+
+class QualityMonitor:
+    def __init__(self, window=30, k=3.0, z_min=3.0, stuck_run=5, min_periods=10, metrics=QUALITY_METRICS):
+        self.window, self.k, self.z_min, self.stuck_run, self.min_periods = window, k, z_min, stuck_run, min_periods
+        self.metrics = list(metrics)
+        self._lock = threading.RLock()
+        self._windows = {}   # (unit, metric) -> _Window
+        self._flags = {}     # (day, unit, metric) -> (flag, value, mean, z)
+
+    def _w(self, unit, metric):
+        w = self._windows.get((unit, metric))
+        if w is None: w = self._windows[(unit, metric)] = _Window(self.window)
+        return w
+
+    # -- listener hooks --
+    def on_reset(self, df):
+        # Full rebuild in one vectorized pass per metric (same rules as on_rows), then
+        # the streaming windows are seeded from each unit's last `window` running days
+        df = df.reindex(columns=['Date', 'Unit', 'Gen'] + self.metrics)
+        df = df[df['Date'].notna()].assign(Unit=df['Unit'].astype(str)).sort_values(['Unit', 'Date'], kind='stable', ignore_index=True)
+        day = pd.to_datetime(df['Date']).to_numpy().astype('datetime64[D]').astype('int64')
+        gen, hr = df['Gen'].astype('float64').to_numpy(), df['HR'].astype('float64').to_numpy()
+        running = (gen > 0) & (hr > MIN_HR)
+        flags, windows = {}, {}
+        for d, u, v in zip(day[(gen > 0) & ~running], df['Unit'].to_numpy()[(gen > 0) & ~running], hr[(gen > 0) & ~running]):
+            flags[(int(d), u, 'HR')] = ('incomplete', float(v), np.nan, np.nan)
+        run = df[running].reset_index(drop=True)
+        days, units = day[running], run['Unit'].to_numpy()
+        for metric in self.metrics:
+            s = run[metric].astype('float64')
+            g = s.groupby(run['Unit'], sort=False)
+            prior = g.shift(1)
+            roll = prior.groupby(run['Unit'], sort=False).rolling(self.window, min_periods=1)
+            stat = {name: getattr(roll, name)().droplevel(0).reindex(s.index) for name in ('mean', 'std', 'count')}
+            q1 = roll.quantile(0.25).droplevel(0).reindex(s.index)
+            q3 = roll.quantile(0.75).droplevel(0).reindex(s.index)
+            out, z = _outlier(s.to_numpy(), stat['count'].fillna(0).to_numpy(), stat['mean'].to_numpy(), stat['std'].to_numpy(),
+                              q1.to_numpy(), q3.to_numpy(), self.k, self.z_min, self.min_periods)
+            streak = s.groupby([run['Unit'], (s != g.shift(1)).cumsum()], sort=False).cumcount().to_numpy() + 1
+            x, mean = s.to_numpy(), stat['mean'].to_numpy()
+            for i in np.flatnonzero(streak >= self.stuck_run):
+                flags[(int(days[i]), units[i], metric)] = ('stuck', float(x[i]), float(mean[i]), float(z[i]))
+            for i in np.flatnonzero(out):
+                flags[(int(days[i]), units[i], metric)] = ('outlier', float(x[i]), float(mean[i]), float(z[i]))
+            for unit, tail in s.groupby(run['Unit'], sort=False).tail(self.window).groupby(run['Unit'], sort=False):
+                w = windows[(unit, metric)] = _Window(self.window)
+                first = tail.index[0]
+                w.last, w.run = x[first], int(streak[first]) - 1  # so the first push continues its streak
+                for i in tail.index: w.push(x[i], int(days[i]))
+        with self._lock:
+            self._windows, self._flags = windows, flags
+
+    def on_rows(self, df):
+        if df.empty: return
+        df = df.reindex(columns=['Date', 'Unit', 'Gen'] + self.metrics).sort_values('Date', kind='stable')
+        with self._lock:
+            for r in zip(pd.to_datetime(df['Date']).to_numpy().astype('datetime64[D]').astype('int64').tolist(), df['Unit'].astype(str).tolist(),
+                         *(df[c].astype('float64').tolist() for c in ['Gen'] + self.metrics)):
+                self._score(r[0], r[1], r[2], dict(zip(self.metrics, r[3:])))
+
+    def _score(self, day, unit, gen, values):
+        for metric in self.metrics:
+            self._flags.pop((day, unit, metric), None)
+            # A re-saved day takes back its earlier reading first, also when it is now a shutdown, incomplete or blank
+            w = self._windows.get((unit, metric))
+            if w is not None and w.day == day and w.undo is not None: w.pop_newest()
+        hr = values.get('HR', np.nan)
+        if not gen > 0: return
+        if not hr > MIN_HR:
+            self._flags[(day, unit, 'HR')] = ('incomplete', hr, np.nan, np.nan)
+            return
+        for metric, x in values.items():
+            if np.isnan(x): continue
+            w = self._w(unit, metric)
+            n, mean, std, q1, q3 = w.stats()
+            out, z = _outlier(x, n, mean, std, q1, q3, self.k, self.z_min, self.min_periods)
+            # Days older than the window's newest (backfills) are scored but do not enter it
+            late = w.day is not None and day < w.day
+            run = 1 if late else (w.run + 1 if x == w.last else 1)
+            if not late: w.push(x, day)
+            if out: self._flags[(day, unit, metric)] = ('outlier', x, mean, float(z))
+            elif run >= self.stuck_run: self._flags[(day, unit, metric)] = ('stuck', x, mean, float(z))
+
+    # -- queries --
+    def flags(self, start=None, end=None, units=None, metric=None):
+        lo = -np.inf if start is None else pd.Timestamp(start).to_datetime64().astype('datetime64[D]').astype('int64')
+        hi = np.inf if end is None else pd.Timestamp(end).to_datetime64().astype('datetime64[D]').astype('int64')
+        units = None if units is None else {str(u) for u in units}
+        with self._lock:
+            rows = [(d, u, m, *v) for (d, u, m), v in self._flags.items()
+                    if lo <= d <= hi and (units is None or u in units) and (metric is None or m == metric)]
+        out = pd.DataFrame(rows, columns=FLAG_COLS)
+        out['Date'] = pd.to_datetime(out['Date'].astype('int64'), unit='D')
+        return out.sort_values(['Date', 'Unit', 'Metric'], ignore_index=True)
+
+    def window_stats(self, unit, metric):
+        # -> {'n', 'mean', 'std', 'q1', 'q3', 'run'} of a unit's current window, or None
+        with self._lock:
+            w = self._windows.get((str(unit), metric))
+            if w is None or not w.vals: return None
+            return dict(zip(('n', 'mean', 'std', 'q1', 'q3'), w.stats())) | {'run': w.run}
+
+    def __len__(self):
+        return len(self._flags)
@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from engine import fleet_units
+from fleet import INPUT_DEFAULTS, INPUT_FIELDS
+from history_store import KEY, widen
+from memo import digest
+from profiler import count
+
+# --- DATE-RANGE REPLAY ---
+# Per-day War Room snapshots of a date range (unit dicts, fleet totals, pond
+# outlook, MTD), built once on a background thread so the dashboard can scrub or
+# play through the days without loading or computing anything per step. Only
+# saved (day, unit) rows are replayed (blank fields filled as the Inputs tab
+# does); units without a row that day are listed as missing, never computed at
+# the input defaults. One fleet_units batch per month; pond and MTD come from
+# the maintained indexes.
+REPLAY_COLS = ['Unit'] + [col for col, _, _ in INPUT_FIELDS] + ['Coal Ash %']
+MAX_DAYS = 366           # longest range one replay holds
+KEEP_REPLAYS = 4         # replays kept per process (LRU), across sessions
+
+
+class Replay:
+    def __init__(self, mirror, pond, rollups, start, end, unit_ids, configs, ash_pct, pond_cap):
+        self.start, self.end = pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize()
+        if self.end < self.start: self.start, self.end = self.end, self.start
+        self.end = min(self.end, self.start + pd.Timedelta(days=MAX_DAYS - 1))
+        self.mirror, self.pond, self.rollups = mirror, pond, rollups
+        self.unit_ids, self.configs, self.ash_pct, self.pond_cap = [str(u) for u in unit_ids], configs, ash_pct, pond_cap
+        self.days = list(pd.date_range(self.start, self.end))
+        self.snapshots = {}   # day -> snapshot dict (filled month by month)
+        self.error, self.seconds = None, None
+        self._thread = threading.Thread(target=self._build, name="replay", daemon=True)
+        self._thread.start()
+
+    @property
+    def ready(self):
+        return self.error is not None or len(self.snapshots) == len(self.days)
+
+    @property
+    def progress(self):
+        return len(self.snapshots) / len(self.days)
+
+    def _build(self):
+        t0 = time.perf_counter()
+        try:
+            for m in pd.period_range(self.start, self.end, freq='M'):
+                self.snapshots.update(self._month(max(self.start, m.start_time), min(self.end, m.end_time.normalize())))
+        except Exception as e:
+            self.error = e
+        self.seconds = time.perf_counter() - t0
+        count("replay_days", len(self.snapshots))
+
+    def _month(self, lo, hi):
+        order = {u: i for i, u in enumerate(self.unit_ids)}
+        hist = widen(self.mirror.read(lo, hi, REPLAY_COLS))
+        hist = hist.assign(Unit=hist['Unit'].astype(str)).drop_duplicates(KEY, keep='last')
+        hist = hist[hist['Unit'].isin(order)]
+        hist = hist.iloc[np.lexsort((hist['Unit'].map(order).to_numpy(), hist['Date'].to_numpy()))].reset_index(drop=True)
+        hist = hist.fillna(INPUT_DEFAULTS | {'Coal Ash %': self.ash_pct})
+        units = fleet_units(hist, self.configs, self.ash_pct) if len(hist) else []
+        by_day = {}
+        for day, u in zip(hist['Date'].tolist(), units): by_day.setdefault(pd.Timestamp(day), []).append(u)
+        return {day: self._snapshot(day, by_day.get(day, [])) for day in pd.date_range(lo, hi)}
+
+    def _snapshot(self, day, units):
+        # units: the day's saved units only; with none, the day has no KPIs (NaN / None), just MTD
+        ids = {u['id'] for u in units}
+        profit = sum(u['profit'] for u in units) if units else np.nan
+        ash_gen, ash_util = sum(u['ash']['generated'] for u in units), sum(u['ash']['utilized'] for u in units)
+        days_left, remaining, fill = self.pond.outlook(day, self.pond_cap, ash_gen - ash_util) if units else (None, None, None)
+        mtd = self.rollups.mtd(day) if len(self.rollups) else None
+        return {'day': day, 'units': units, 'saved': [u['id'] for u in units], 'missing': [u for u in self.unit_ids if u not in ids],
+                'fleet_profit': profit, 'ash_gen': ash_gen, 'ash_util': ash_util,
+                'pond_days_left': days_left, 'remaining_cap': remaining, 'pond_fill_date': fill,
+                'mtd_profit': mtd.loc['Profit', 'sum'] if mtd is not None else (0 if len(self.rollups) or not units else profit),
+                'mtd_ash': mtd.loc['Ash Util', 'sum'] if mtd is not None else (0 if len(self.rollups) or not units else ash_util)}
+
+    def frame(self):
+        # One row per built day: the fleet series a replay chart plots
+        return pd.DataFrame([{'Date': s['day'], 'Profit': s['fleet_profit'], 'Pond days': s['pond_days_left'], 'Saved units': len(s['saved'])}
+                             for s in (self.snapshots[d] for d in self.days if d in self.snapshots)])
+
+
+class ReplayStore:
+    # HistoryMirror listener: replays by range and settings, dropped once a write
+    # lands on or before their last day (pond and MTD carry forward from it)
+    def __init__(self, keep=KEEP_REPLAYS):
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._replays = OrderedDict()
+
+    def get(self, mirror, pond, rollups, start, end, unit_ids, configs, ash_pct, pond_cap):
+        key = digest(str(pd.Timestamp(start).date()), str(pd.Timestamp(end).date()), list(unit_ids), configs, ash_pct, pond_cap)
+        with self._lock:
+            replay = self._replays.get(key)
+            if replay is None:
+                replay = self._replays[key] = Replay(mirror, pond, rollups, start, end, unit_ids, configs, ash_pct, pond_cap)
+                while len(self._replays) > self.keep: self._replays.popitem(last=False)
+            self._replays.move_to_end(key)
+            return replay
+
+    # -- listener hooks --
+    def on_reset(self, df):
+        with self._lock:
+            self._replays.clear()
+
+    def on_rows(self, df):
+        if df.empty: return
+        first = pd.to_datetime(df['Date']).min()
+        with self._lock:
+            for key in [k for k, r in self._replays.items() if r.end >= first]: del self._replays[key]
+
+    def __len__(self):
+        return len(self._replays)
@@ -0,0 +1,304 @@
+import glob
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from quality import MIN_HR
+
+# --- MAINTAINED INDEXES OVER THE HISTORY ---
+# Listeners attached to HistoryMirror: on_reset(df) after a full rebuild,
+# on_rows(df) with just the rows of each save / bulk ingest / pulled delta.
+POND_COLS = ['Date', 'Unit', 'Gen', 'HR', 'Coal Ash %', 'Ash Util']
+POND_PARTS = 64   # per-save contribution files kept beside the pond index before they are folded in
+
+
+def _days(dates):
+    return pd.to_datetime(dates).to_numpy().astype('datetime64[D]').astype('int64')
+
+
+class AshPondIndex:
+    # Cumulative net ash dumped to the pond, by date. Per day the fleet's
+    # (Gen*HR*1000/3600 * Coal Ash% - Ash Util) is summed; `prefix` is the running
+    # total, so "as of D" is one binary search instead of a scan of the history.
+    def __init__(self, path=None, revision=None):
+        # revision: -> the mirror's data revision, saved beside the index (saved_revision)
+        # so a copy made stale by another process's writes can be told apart and rebuilt
+        self.path, self.revision, self.saved_revision = path, revision, None
+        self._lock = threading.RLock()
+        self._contrib = {}  # (day, unit) -> net tons, so a re-saved day replaces its old value
+        self.days = np.empty(0, dtype='int64')
+        self.net = np.empty(0)
+        self.prefix = np.empty(0)
+        if path and (os.path.exists(path) or self._parts()):
+            # The full index, then each save's touched rows in write order (later wins)
+            for f in ([path] if os.path.exists(path) else []) + self._parts():
+                saved = pd.read_parquet(f)
+                self._contrib.update(zip(zip(saved['day'].tolist(), saved['unit'].tolist()), saved['net'].tolist()))
+            self._rebuild_arrays()
+        if path and os.path.exists(path + ".rev"):
+            with open(path + ".rev") as f: self.saved_revision = f.read().strip() or None
+
+    @staticmethod
+    def row_net(df):
+        gen, hr, pct, util = (df[c].astype('float64') for c in ('Gen', 'HR', 'Coal Ash %', 'Ash Util'))
+        return (gen * hr * 1000 / 3600) * (pct / 100) - util
+
+    def _rebuild_arrays(self):
+        per_day = pd.Series(self._contrib, dtype='float64')
+        per_day = per_day.groupby(level=0).sum().sort_index() if len(per_day) else per_day
+        self.days = per_day.index.to_numpy(dtype='int64', copy=True)
+        self.net = per_day.to_numpy(dtype='float64', copy=True)
+        self.prefix = np.cumsum(self.net)
+
+    # Persisted as the full index plus one small file per save holding only the
+    # rows it touched (path.d/), folded back into the full file every POND_PARTS
+    # saves, so a single-day save does not rewrite years of contributions
+    def _parts(self):
+        return sorted(glob.glob(os.path.join(self.path + ".d", "*.parquet")))
+
+    @staticmethod
+    def _write(contrib, path):
+        keys = list(contrib)
+        pd.DataFrame({'day': [k[0] for k in keys], 'unit': [k[1] for k in keys], 'net': list(contrib.values())}).to_parquet(path + ".tmp", index=False)
+        os.replace(path + ".tmp", path)
+
+    def _save(self, touched=None):
+        if not self.path: return
+        parts = self._parts()
+        if touched is not None and len(parts) < POND_PARTS:
+            os.makedirs(self.path + ".d", exist_ok=True)
+            self._write({k: self._contrib[k] for k in touched}, os.path.join(self.path + ".d", f"{time.time_ns()}.parquet"))
+        else:
+            self._write(self._contrib, self.path)
+            for f in parts: os.remove(f)
+        # Written after the data: a crash in between leaves an old revision, i.e. a rebuild
+        if self.revision:
+            self.saved_revision = self.revision()
+            with open(self.path + ".rev.tmp", 'w') as f: f.write(self.saved_revision or "")
+            os.replace(self.path + ".rev.tmp", self.path + ".rev")
+
+    # -- listener hooks --
+    def on_reset(self, df):
+        with self._lock:
+            self._contrib = dict(zip(zip(_days(df['Date']).tolist(), df['Unit'].astype(str).tolist()), self.row_net(df).tolist()))
+            self._rebuild_arrays()
+            self._save()
+
+    def on_rows(self, df):
+        if df.empty: return
+        with self._lock:
+            diffs, touched = {}, []
+            for key, value in zip(zip(_days(df['Date']).tolist(), df['Unit'].astype(str).tolist()), self.row_net(df).tolist()):
+                diffs[key[0]] = diffs.get(key[0], 0.0) + value - self._contrib.get(key, 0.0)
+                self._contrib[key] = value
+                touched.append(key)
+            if len(diffs) > 32:
+                # Bulk ingest: cheaper to rebuild the arrays once than to splice per day
+                self._rebuild_arrays()
+            else:
+                for day, diff in diffs.items():
+                    i = np.searchsorted(self.days, day)
+                    if i < len(self.days) and self.days[i] == day:
+                        self.net[i] += diff
+                    else:
+                        self.days = np.insert(self.days, i, day)
+                        self.net = np.insert(self.net, i, diff)
+                        self.prefix = np.insert(self.prefix, i, self.prefix[i-1] if i else 0.0)
+                    # Saves are almost always for recent days, so this suffix is short
+                    self.prefix[i:] += diff
+            self._save(touched)
+
+    # -- queries --
+    def net_as_of(self, date):
+        i = np.searchsorted(self.days, _days([date])[0], side='right')
+        return float(self.prefix[i-1]) if i else 0.0
+
+    def remaining(self, date, pond_cap):
+        return pond_cap - self.net_as_of(date)
+
+    def daily_rate(self, date, window=30):
+        # Trailing average net dump per day over `window` days ending at `date`
+        return (self.net_as_of(date) - self.net_as_of(pd.Timestamp(date) - pd.Timedelta(days=window))) / window
+
+    def fill_date(self, date, pond_cap, daily_net=None):
+        # Projected date the pond is full; None while the stock is flat or shrinking
+        rate = self.daily_rate(date) if daily_net is None else daily_net
+        if rate <= 0: return None
+        return pd.Timestamp(date) + pd.Timedelta(days=self.remaining(date, pond_cap) / rate)
+
+    def outlook(self, date, pond_cap, daily_net):
+        # -> (days left, remaining tons, projected full date or None) for a day's net dump, as the War Room shows it
+        if not len(self): return 365, pond_cap, None
+        remaining = self.remaining(date, pond_cap)
+        if daily_net > 0: return remaining / daily_net, remaining, self.fill_date(date, pond_cap, daily_net)
+        return (9999 if daily_net < 0 else 365), remaining, None
+
+    def __len__(self):
+        return len(self.days)
+
+
+# --- MATERIALIZED ROLLUPS ---
+ROLLUP_METRICS = ['Profit', 'Gen', 'HR', 'Ash Util', 'SOx', 'NOx', 'Biomass', 'Solar']
+ROLLUP_COLS = ['Date', 'Unit'] + ROLLUP_METRICS
+FLEET = '*'
+STATS = ['sum', 'count', 'min', 'max']
+RATE_METRICS = ['HR']   # averaged over running days only (HR > MIN_HR); the rest are totals
+
+
+def fy_label(ts):
+    # Indian financial year, April to March
+    start = ts.year if ts.month >= 4 else ts.year - 1
+    return f"FY{start}-{(start + 1) % 100:02d}"
+
+
+def fy_start(ts):
+    ts = pd.Timestamp(ts)
+    return pd.Timestamp(ts.year if ts.month >= 4 else ts.year - 1, 4, 1)
+
+
+def _combine(parts):
+    # parts: 4 x M arrays of [sum, count, min, max]; min/max are NaN where a bucket has no readings
+    s = np.stack(parts)
+    return np.array([s[:, 0].sum(0), s[:, 1].sum(0), np.fmin.reduce(s[:, 2], axis=0), np.fmax.reduce(s[:, 3], axis=0)])
+
+
+class RollupStore:
+    # Per-unit and fleet (unit '*') sum/count/min/max of ROLLUP_METRICS at day,
+    # month and financial-year grain. A save only recomputes the buckets it
+    # touched: its days (from the rows), their months (from <= 31 day buckets)
+    # and their FYs (from <= 12 month buckets), so min/max stay exact even when
+    # a day is re-saved with different values.
+    def __init__(self, metrics=ROLLUP_METRICS):
+        self.metrics = list(metrics)
+        self._lock = threading.RLock()
+        self._reset_state()
+
+    def _reset_state(self):
+        self._rows = {}                                  # (day, unit) -> metric vector
+        self._day_units, self._month_days, self._fy_months = {}, {}, {}
+        self.stats = {}                                  # (grain, period, unit) -> 4 x M
+
+    def _frame(self, df):
+        out = pd.DataFrame({'day': _days(df['Date']), 'unit': df['Unit'].astype(str).to_numpy()})
+        values = df.reindex(columns=self.metrics).apply(pd.to_numeric, errors='coerce')
+        # Blank totals count as 0, but a shutdown or blank HR is no reading at all: left NaN,
+        # it is skipped by HR's own count/min/max instead of dragging the average down
+        rates = [m for m in RATE_METRICS if m in self.metrics]
+        values[rates] = values[rates].where(values[rates] > MIN_HR)
+        out[self.metrics] = values.fillna({m: 0 for m in self.metrics if m not in rates}).to_numpy(dtype='float64')
+        dates = pd.to_datetime(out['day'], unit='D')
+        out['month'] = dates.dt.strftime('%Y-%m')
+        start = dates.dt.year - (dates.dt.month < 4)
+        out['fy'] = 'FY' + start.astype(str) + '-' + ((start + 1) % 100).astype(str).str.zfill(2)
+        return out
+
+    # -- listener hooks --
+    def on_reset(self, df):
+        frame = self._frame(df).drop_duplicates(subset=['day', 'unit'], keep='last')
+        with self._lock:
+            self._reset_state()
+            self._rows = dict(zip(zip(frame['day'].tolist(), frame['unit'].tolist()), frame[self.metrics].to_numpy()))
+            for day, unit in self._rows: self._day_units.setdefault(day, set()).add(unit)
+            for day, month in zip(frame['day'].tolist(), frame['month'].tolist()): self._month_days.setdefault(month, set()).add(day)
+            for month, fy in zip(frame['month'].tolist(), frame['fy'].tolist()): self._fy_months.setdefault(fy, set()).add(month)
+            # Full build in one vectorized groupby per grain
+            for grain, key in (('day', 'day'), ('month', 'month'), ('fy', 'fy')):
+                for keys, by in (([key, 'unit'], True), ([key], False)):
+                    agg = frame.groupby(keys)[self.metrics].agg(STATS)
+                    values = agg.to_numpy().reshape(len(agg), len(self.metrics), 4).transpose(0, 2, 1)
+                    for idx, arr in zip(agg.index, values):
+                        period, unit = (idx[0], idx[1]) if by else (idx, FLEET)
+                        self.stats[(grain, period, unit)] = arr
+
+    def on_rows(self, df):
+        if df.empty: return
+        frame = self._frame(df)
+        with self._lock:
+            days, months, fys = set(), set(), set()
+            for day, unit, month, fy, vec in zip(frame['day'].tolist(), frame['unit'].tolist(), frame['month'].tolist(), frame['fy'].tolist(), frame[self.metrics].to_numpy()):
+                self._rows[(day, unit)] = vec
+                self._day_units.setdefault(day, set()).add(unit)
+                self._month_days.setdefault(month, set()).add(day)
+                self._fy_months.setdefault(fy, set()).add(month)
+                days.add(day); months.add(month); fys.add(fy)
+            for day in days:
+                parts = []
+                for unit in self._day_units[day]:
+                    v = self._rows[(day, unit)]
+                    self.stats[('day', day, unit)] = arr = np.array([np.nan_to_num(v), ~np.isnan(v), v, v], dtype='float64')
+                    parts.append(arr)
+                self.stats[('day', day, FLEET)] = _combine(parts)
+            for month in months: self._roll_up('month', month, 'day', self._month_days[month])
+            for fy in fys: self._roll_up('fy', fy, 'month', self._fy_months[fy])
+
+    def _roll_up(self, grain, period, child, children):
+        units = {FLEET}
+        for c in children:
+            units |= self._day_units[c] if child == 'day' else {u for m_day in self._month_days[c] for u in self._day_units[m_day]}
+        for unit in units:
+            parts = [arr for arr in (self.stats.get((child, c, unit)) for c in children) if arr is not None]
+            if parts: self.stats[(grain, period, unit)] = _combine(parts)
+
+    # -- queries --
+    def summary(self, arr):
+        if arr is None: return None
+        out = pd.DataFrame(arr.T, index=self.metrics, columns=STATS)
+        out['mean'] = out['sum'] / out['count'].where(out['count'] > 0)
+        out['count'] = out['count'].astype(int)
+        return out[['sum', 'mean', 'min', 'max', 'count']]
+
+    def get(self, grain, period, unit=FLEET):
+        if grain == 'day': period = int(_days([period])[0])
+        elif grain == 'month': period = pd.Timestamp(period).strftime('%Y-%m') if not isinstance(period, str) else period
+        elif grain == 'fy' and not isinstance(period, str): period = fy_label(pd.Timestamp(period))
+        return self.summary(self.stats.get((grain, period, str(unit))))
+
+    def window(self, start, end, unit=FLEET):
+        # Whole months inside [start, end] come from month buckets, the edges from day buckets.
+        # unit may also be a list of units (e.g. one plant's), combined from their own buckets.
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        units = [str(unit)] if isinstance(unit, (str, int)) else [str(u) for u in unit]
+        lo, hi = int(_days([start])[0]), int(_days([end])[0])
+        parts = []
+        with self._lock:
+            for m in pd.period_range(start, end, freq='M'):
+                m_lo, m_hi = int(_days([m.start_time])[0]), int(_days([m.end_time])[0])
+                whole = lo <= m_lo and m_hi <= hi
+                for u in units:
+                    if whole:
+                        arr = self.stats.get(('month', str(m), u))
+                        if arr is not None: parts.append(arr)
+                    else:
+                        for day in range(max(lo, m_lo), min(hi, m_hi) + 1):
+                            arr = self.stats.get(('day', day, u))
+                            if arr is not None: parts.append(arr)
+        return self.summary(_combine(parts)) if parts else None
+
+    def mtd(self, date, unit=FLEET):
+        return self.window(pd.Timestamp(date).replace(day=1), date, unit)
+
+    def fytd(self, date, unit=FLEET):
+        return self.window(fy_start(date), date, unit)
+
+    def frame(self, grain, metric, stat='sum', groups=None):
+        # Period x unit table of one statistic, e.g. frame('month', 'Profit').
+        # groups ({unit: label}, e.g. unit -> plant) combines the unit buckets per label instead.
+        col, i = self.metrics.index(metric), STATS.index(stat) if stat != 'mean' else None
+        cells = {}
+        for (g, period, unit), arr in list(self.stats.items()):
+            if g != grain: continue
+            if groups is None: cells[(period, unit)] = arr
+            elif unit in groups: cells.setdefault((period, groups[unit]), []).append(arr)
+        rows = {}
+        for (period, label), arr in cells.items():
+            if groups is not None: arr = _combine(arr)
+            rows.setdefault(period, {})[label] = (arr[0, col] / arr[1, col] if arr[1, col] else np.nan) if i is None else arr[i, col]
+        out = pd.DataFrame.from_dict(rows, orient='index').sort_index()
+        if grain == 'day': out.index = pd.to_datetime(out.index, unit='D')
+        return out
+
+    def __len__(self):
+        return len(self._rows)
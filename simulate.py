@@ -0,0 +1,120 @@
+import functools
+
+import numpy as np
+import pandas as pd
+
+from engine import calculate_fleet, loss_terms
+
+# --- WHAT-IF SIMULATOR ---
+# Scenarios are rows pushed through calculate_fleet, so they use exactly the
+# dashboard's loss and profit model. A change in vacuum / MS temp / FG temp /
+# spray moves the unit's heat rate by the change in its controllable losses;
+# 'HR' is the heat rate before that adjustment and 'GCV' the coal GCV.
+PARAMS = ['Vacuum', 'MS Temp', 'FG Temp', 'Spray', 'GCV', 'HR']
+UNITS = {'Vacuum': 'kg/cm2', 'MS Temp': 'C', 'FG Temp': 'C', 'Spray': 'TPH', 'GCV': 'kcal/kg', 'HR': 'kcal/kWh'}
+BASE_COLS = ['Gen', 'HR', 'Vacuum', 'MS Temp', 'FG Temp', 'Spray', 'GCV', 'Ash Cement', 'Ash Bricks', 'Coal Ash %', 'Biomass']
+MC_SAMPLES = 100_000
+
+
+def default_ranges(base):
+    # Plausible operating band around a unit's current point
+    return {
+        'Vacuum': (-0.99, -0.85), 'MS Temp': (520.0, 545.0), 'FG Temp': (120.0, 160.0), 'Spray': (0.0, 40.0),
+        'GCV': (round(base['GCV'] * 0.85), round(base['GCV'] * 1.15)), 'HR': (round(base['HR'] * 0.95), round(base['HR'] * 1.05)),
+    }
+
+
+def _controllable(vac, ms, fg, spray):
+    l_vac, l_ms, l_fg, l_spray = loss_terms(vac, ms, fg, spray)
+    return np.abs(l_vac) + l_ms + l_fg + l_spray
+
+
+def evaluate(base, target_hr, scenarios):
+    # base: {column: value} for one unit; scenarios: {param: array} (missing params stay at base).
+    # Returns calculate_fleet's frame plus the scenario inputs and the adjusted 'hr'.
+    n = len(next(iter(scenarios.values()))) if scenarios else 1
+    cols = {c: np.asarray(scenarios[c], dtype='float64') if c in scenarios else np.full(n, float(base[c])) for c in BASE_COLS}
+    shift = _controllable(cols['Vacuum'], cols['MS Temp'], cols['FG Temp'], cols['Spray']) - \
+        _controllable(*(np.float64(base[c]) for c in ('Vacuum', 'MS Temp', 'FG Temp', 'Spray')))
+    df = pd.DataFrame(cols)
+    df['HR'] = cols['HR'] + shift
+    df['Unit'] = 'sim'
+    out = calculate_fleet(df, {'sim': {'target_hr': target_hr, 'gcv': float(base['GCV'])}})
+    for p in PARAMS: out[p] = cols[p]
+    out['hr'] = df['HR'].to_numpy()
+    return out
+
+
+def _key(base, target_hr, ranges):
+    # Hashable, order-independent scenario key for the LRU caches below
+    return (tuple(sorted((k, float(v)) for k, v in base.items() if k in BASE_COLS)), float(target_hr),
+            tuple(sorted((k, (float(lo), float(hi))) for k, (lo, hi) in ranges.items())))
+
+
+@functools.lru_cache(maxsize=64)
+def _tornado(key):
+    base, target_hr, ranges = dict(key[0]), key[1], dict(key[2])
+    params = [p for p in PARAMS if p in ranges]
+    # One batch: baseline, then low/high for each parameter with everything else at baseline
+    scen = {p: np.full(1 + 2 * len(params), base[p]) for p in params}
+    for i, p in enumerate(params):
+        scen[p][1 + 2 * i], scen[p][2 + 2 * i] = ranges[p]
+    profit = evaluate(base, target_hr, scen)['profit'].to_numpy()
+    rows = [{'Param': p, 'Low': ranges[p][0], 'High': ranges[p][1],
+             'Profit @ Low': profit[1 + 2 * i] - profit[0], 'Profit @ High': profit[2 + 2 * i] - profit[0]} for i, p in enumerate(params)]
+    out = pd.DataFrame(rows)
+    out['Swing'] = (out['Profit @ High'] - out['Profit @ Low']).abs()
+    return out.sort_values('Swing', ignore_index=True), float(profit[0])
+
+
+def tornado(base, target_hr, ranges):
+    # -> (per-parameter profit change at the ends of its range, baseline profit)
+    return _tornado(_key(base, target_hr, ranges))
+
+
+@functools.lru_cache(maxsize=64)
+def _surface(key, x, y, steps):
+    base, target_hr, ranges = dict(key[0]), key[1], dict(key[2])
+    xs, ys = np.linspace(*ranges[x], steps), np.linspace(*ranges[y], steps)
+    gx, gy = np.meshgrid(xs, ys)
+    profit = evaluate(base, target_hr, {x: gx.ravel(), y: gy.ravel()})['profit'].to_numpy()
+    return xs, ys, profit.reshape(steps, steps)
+
+
+def surface(base, target_hr, ranges, x, y, steps=60):
+    # -> (x values, y values, profit[y, x]) over a steps x steps grid of two parameters
+    return _surface(_key(base, target_hr, ranges), x, y, int(steps))
+
+
+@functools.lru_cache(maxsize=16)
+def _monte_carlo(key, n, seed):
+    base, target_hr, ranges = dict(key[0]), key[1], dict(key[2])
+    rng = np.random.default_rng(seed)
+    # Triangular around the current value: the present operating point is the most likely
+    scen = {p: rng.triangular(lo, min(max(base[p], lo), hi), hi, n) if hi > lo else np.full(n, lo) for p, (lo, hi) in ranges.items()}
+    out = evaluate(base, target_hr, scen)
+    samples = out[[p for p in PARAMS if p in ranges] + ['hr', 'profit', 'score']]
+    return samples, rank_sensitivity(samples)
+
+
+def monte_carlo(base, target_hr, ranges, n=MC_SAMPLES, seed=0):
+    # -> (n sampled scenarios with their profit, Spearman sensitivity of profit to each parameter)
+    return _monte_carlo(_key(base, target_hr, ranges), int(n), int(seed))
+
+
+def _ranks(a):
+    r = np.empty(len(a))
+    r[np.argsort(a, kind='stable')] = np.arange(len(a))
+    return r
+
+
+def rank_sensitivity(samples):
+    # Spearman rank correlation of each sampled parameter with profit
+    params = [p for p in PARAMS if p in samples.columns and samples[p].nunique() > 1]
+    target = _ranks(samples['profit'].to_numpy())
+    sens = {p: np.corrcoef(_ranks(samples[p].to_numpy()), target)[0, 1] for p in params}
+    return pd.Series(sens, dtype='float64').sort_values(key=abs)
+
+
+def cache_info():
+    return {name: f.cache_info() for name, f in (('tornado', _tornado), ('surface', _surface), ('monte_carlo', _monte_carlo))}
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from downsample import downsample, lttb, minmax
+
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(0)
+    x = np.arange(10_000, dtype='float64')
+    y = np.sin(x / 500) + rng.normal(0, 0.05, len(x))
+    y[4321] = 25.0   # one spike
+    return x, y
+
+
+@pytest.mark.parametrize('method', [lttb, minmax])
+@pytest.mark.parametrize('n', [4, 100, 1000])
+def test_budget_and_end_points(series, method, n):
+    x, y = series
+    keep = method(x, y, n)
+    assert len(keep) <= n and keep[0] == 0 and keep[-1] == len(x) - 1
+    assert (np.diff(keep) > 0).all()
+
+
+def test_lttb_fills_its_budget_and_minmax_keeps_the_spike(series):
+    x, y = series
+    assert len(lttb(x, y, 1000)) == 1000
+    assert 4321 in minmax(x, y, 100)
+
+
+def test_short_series_are_returned_whole(series):
+    x, y = series
+    for method in (lttb, minmax):
+        assert (method(x[:50], y[:50], 100) == np.arange(50)).all()
+
+
+def test_downsample_drops_gaps_first():
+    dates = pd.date_range('2025-01-01', periods=6).to_numpy()
+    d, v = downsample(dates, [1.0, np.nan, 3.0, 4.0, np.nan, 6.0], n=1000)
+    assert list(v) == [1.0, 3.0, 4.0, 6.0] and d[-1] == dates[-1]
@@ -0,0 +1,41 @@
+import pandas as pd
+import pytest
+
+from engine import LOSS_COLS, calculate_fleet, calculate_unit, fleet_units
+from fleet import DEFAULT_FLEET, Fleet
+
+CONFIGS = Fleet(DEFAULT_FLEET).configs()
+# Running (with losses on both sides of their thresholds), shutdown by Gen, shutdown by HR
+ROWS = pd.DataFrame([
+    {'Unit': '1', 'Gen': 8.4, 'HR': 2380.0, 'Vacuum': -0.85, 'MS Temp': 530.0, 'FG Temp': 140.0, 'Spray': 25.0},
+    {'Unit': '2', 'Gen': 7.9, 'HR': 2250.0, 'Vacuum': -0.95, 'MS Temp': 545.0, 'FG Temp': 120.0, 'Spray': 10.0},
+    {'Unit': '3', 'Gen': 0.0, 'HR': 2400.0, 'Vacuum': -0.90, 'MS Temp': 535.0, 'FG Temp': 135.0, 'Spray': 20.0},
+    {'Unit': '1', 'Gen': 8.0, 'HR': 0.0, 'Vacuum': -0.90, 'MS Temp': 535.0, 'FG Temp': 135.0, 'Spray': 20.0},
+]).assign(**{'Date': pd.Timestamp('2025-01-01'), 'SOx': 550.0, 'NOx': 400.0, 'Ash Cement': 1000.0, 'Ash Bricks': 500.0, 'Biomass': 2.0})
+
+
+def scalar(r, ash_pct=35.0):
+    inputs = {'vac': r['Vacuum'], 'ms': r['MS Temp'], 'fg': r['FG Temp'], 'spray': r['Spray'], 'sox': r['SOx'], 'nox': r['NOx']}
+    ash = {'ash_pct': ash_pct, 'util_cem': r['Ash Cement'], 'util_brick': r['Ash Bricks'], 'biomass': r['Biomass']}
+    return calculate_unit(r['Unit'], r['Gen'], r['HR'], inputs, CONFIGS[r['Unit']], ash)
+
+
+def test_calculate_fleet_matches_calculate_unit_on_mixed_rows():
+    fleet = calculate_fleet(ROWS, CONFIGS)
+    for (_, r), (_, k) in zip(ROWS.iterrows(), fleet.iterrows()):
+        u = scalar(r)
+        assert k['status'] == u['status']
+        for col, key in (('profit', 'profit'), ('escerts', 'escerts'), ('carbon', 'carbon'), ('score', 'score'), ('trees', 'trees'), ('homes_bio', 'homes_bio')):
+            assert k[col] == pytest.approx(u[key], rel=1e-12, abs=1e-9), col
+        for name, col in LOSS_COLS.items():
+            assert k[col] == pytest.approx(u['losses'][name], rel=1e-12, abs=1e-9), col
+        for col, key in (('ash_generated', 'generated'), ('ash_utilized', 'utilized'), ('ash_stocked', 'stocked'), ('bricks_made', 'bricks_made'), ('burj_pct', 'burj_pct')):
+            assert k[col] == pytest.approx(u['ash'][key], rel=1e-12, abs=1e-9), col
+    assert list(fleet['status']) == ['RUNNING', 'RUNNING', 'SHUTDOWN', 'SHUTDOWN']
+
+
+def test_fleet_units_has_calculate_unit_shape():
+    for (_, r), u in zip(ROWS.iterrows(), fleet_units(ROWS, CONFIGS)):
+        ref = scalar(r)
+        assert set(u) == set(ref) and set(u['ash']) == set(ref['ash']) and u['inputs'] == ref['inputs']
+        assert u['profit'] == pytest.approx(ref['profit'], rel=1e-12, abs=1e-9)
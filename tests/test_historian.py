@@ -0,0 +1,50 @@
+import pandas as pd
+import pytest
+
+from fleet import DEFAULT_FLEET, Fleet
+from historian import Historian
+from history_mirror import HistoryMirror
+
+
+def points(unit, tag, start, minutes, value):
+    t0 = pd.Timestamp(start)
+    return [f"{(t0 + pd.Timedelta(minutes=m)).isoformat()},{unit},{tag},{value}" for m in range(minutes)]
+
+
+@pytest.fixture
+def feed(tmp_path):
+    mirror = HistoryMirror(str(tmp_path / "mirror"))
+    return Historian(mirror, Fleet(DEFAULT_FLEET).configs()), mirror
+
+
+def row(mirror, date, unit='1'):
+    df = mirror.read()
+    return df[(df['Date'] == pd.Timestamp(date)) & (df['Unit'].astype(str) == unit)].iloc[0]
+
+
+def test_gen_is_integrated_and_flushed_over_the_saved_row(feed):
+    h, mirror = feed
+    mirror.upsert(pd.DataFrame([{'Date': '2025-12-15', 'Unit': '1', 'Gen': 1.0, 'HR': 2500.0, 'Ash Cement': 777.0}]))
+    # 61 minutes at 120 MW = 120 MWh; then a point after a 1 h outage credits MAX_GAP (300 s) only
+    assert h.feed(points('1', 'MW', '2025-12-15T10:00', 61, 120)) == 61
+    assert h.feed(points('1', 'Gen', '2025-12-15T12:00', 1, 120)) == 1
+    assert h.feed(points('1', 'heat_rate', '2025-12-15T10:00', 2, 2390) + points('1', 'HR', '2025-12-15T10:02', 2, 2400)) == 4
+    assert h.flush() == 1
+    saved = row(mirror, '2025-12-15')
+    assert float(saved['Gen']) == pytest.approx(0.130, rel=1e-6)
+    assert float(saved['HR']) == pytest.approx(2395.0)
+    assert float(saved['Ash Cement']) == 777.0     # not carried by the feed: kept from the saved row
+    assert h.flush() == 0                          # nothing changed since
+
+
+def test_bad_stale_and_late_points_are_counted_not_aggregated(feed):
+    h, mirror = feed
+    ok = points('1', 'Gen', '2025-12-15T10:00', 2, 100)
+    assert h.feed(ok + [ok[1], '2025-12-15T10:05,9,Gen,100', '2025-12-15T10:06,1,Gen,5000', 'garbage', '2025-12-15T10:07,1,Colour,1']) == 2
+    assert h.stats['stale'] == 1 and h.stats['rejected'] == 4
+    # The feed moves past midnight + LATE_GRACE: the day is closed on the next flush
+    h.feed(points('1', 'Gen', '2025-12-16T03:00', 1, 100))
+    h.flush()
+    assert h.status()['open_days'] == 1
+    assert h.feed(points('1', 'Gen', '2025-12-15T23:00', 1, 100)) == 0 and h.stats['late'] == 1
+    assert float(row(mirror, '2025-12-15')['Gen']) == pytest.approx(100 / 60 / 1000, rel=1e-5)
@@ -0,0 +1,101 @@
+import pandas as pd
+import pytest
+
+import history_store
+from history_mirror import HistoryMirror
+from history_store import HISTORY_CACHE, LocalRepo, list_deltas, save_history, write_delta
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    # The history cache and parsed deltas are per process: start every test cold
+    monkeypatch.setattr(HISTORY_CACHE, 'ttl', 0)
+    HISTORY_CACHE.invalidate()
+    history_store._DELTA_FRAMES.clear()
+    yield LocalRepo(str(tmp_path / "repo"))
+    HISTORY_CACHE.invalidate()
+
+
+def rows(*items):
+    # items: (date, unit, gen)
+    return pd.DataFrame([{'Date': d, 'Unit': u, 'Gen': g, 'HR': 2300.0, 'Profit': 1.0} for d, u, g in items])
+
+
+def failing_once(monkeypatch, exc=IOError('blip')):
+    real, calls = history_store.fetch_text, []
+    def fetch(repo, sha):
+        calls.append(sha)
+        if len(calls) == 2: raise exc   # the base is fetched first, then the delta
+        return real(repo, sha)
+    monkeypatch.setattr(history_store, 'fetch_text', fetch)
+
+
+def test_pull_applies_base_and_deltas(repo, tmp_path):
+    save_history(repo, rows(('2025-01-01', '1', 8.0)), None, 'main')
+    write_delta(repo, rows(('2025-01-02', '1', 9.0)), 'main')
+    mirror = HistoryMirror(str(tmp_path / "mirror"))
+    assert mirror.pull(repo, 'main', ttl=0)
+    assert sorted(mirror.read()['Gen'].tolist()) == [8.0, 9.0]
+    write_delta(repo, rows(('2025-01-01', '1', 7.0)), 'main')
+    assert mirror.pull(repo, 'main', ttl=0)
+    assert sorted(mirror.read()['Gen'].tolist()) == [7.0, 9.0]
+    assert not mirror.pull(repo, 'main', ttl=0)
+
+
+def test_failed_delta_read_is_retried_not_marked_seen(repo, tmp_path, monkeypatch):
+    save_history(repo, rows(('2025-01-01', '1', 8.0)), None, 'main')
+    write_delta(repo, rows(('2025-01-02', '1', 9.0)), 'main')
+    failing_once(monkeypatch)
+    mirror = HistoryMirror(str(tmp_path / "mirror"))
+    assert not mirror.pull(repo, 'main', ttl=0)
+    assert mirror.manifest['deltas'] == [] and mirror.empty
+    assert mirror.pull(repo, 'main', ttl=0)
+    assert sorted(mirror.read()['Gen'].tolist()) == [8.0, 9.0]
+    assert mirror.manifest['deltas'] == [e.path for e in list_deltas(repo, 'main')]
+
+
+def test_failed_base_fetch_keeps_the_mirror(repo, tmp_path, monkeypatch):
+    save_history(repo, rows(('2025-01-01', '1', 8.0)), None, 'main')
+    mirror = HistoryMirror(str(tmp_path / "mirror"))
+    assert mirror.pull(repo, 'main', ttl=0)
+    save_history(repo, rows(('2025-01-01', '1', 8.0), ('2025-01-02', '1', 9.0)), HISTORY_CACHE.sha(repo, 'main'), 'main')
+    mirror.upsert(rows(('2025-01-03', '1', 5.0)))   # a local save not pushed yet
+    monkeypatch.setattr(history_store, 'fetch_text', lambda repo, sha: (_ for _ in ()).throw(IOError('down')))
+    assert not mirror.pull(repo, 'main', ttl=0)
+    assert mirror.read()['Gen'].tolist() == [8.0, 5.0]
+
+
+def test_upsert_replaces_key_and_keeps_rows_pending(tmp_path):
+    mirror = HistoryMirror(str(tmp_path / "mirror"))
+    assert mirror.upsert(rows(('2025-01-01', '1', 8.0), ('2025-01-01', '2', 8.0))) == 2
+    mirror.upsert(rows(('2025-01-01', '1', 9.0)))
+    assert sorted(mirror.read()['Gen'].tolist()) == [8.0, 9.0]
+    assert len(mirror.pending_parts()) == 2 and len(mirror.pending()) == 2
+
+
+def test_sync_worker_ticket_lifecycle_with_a_failing_flush(repo, tmp_path):
+    import time
+    from history_mirror import SyncWorker
+    class Flaky:
+        down = True
+        def __getattr__(self, name): return getattr(repo, name)
+        def create_file(self, *args, **kwargs):
+            if self.down: raise IOError('down')
+            return repo.create_file(*args, **kwargs)
+    flaky = Flaky()
+    mirror = HistoryMirror(str(tmp_path / "mirror"))
+    worker = SyncWorker(mirror, flaky, 'main', interval=3600, flush_interval=0.05)
+    first = worker.submit(rows(('2025-01-01', '1', 8.0)))
+    deadline = time.monotonic() + 5
+    while worker.status(first)['error'] is None and time.monotonic() < deadline: time.sleep(0.01)
+    assert worker.status(first) == {'state': 'queued', 'rows': 1, 'delta': None, 'error': 'down'}
+    assert worker.last_error == 'down' and mirror.pending_parts()
+    # Submitted after the failure: not tried yet, so no error of its own
+    second = worker.submit(rows(('2025-01-02', '1', 9.0)))
+    assert worker.status(second)['error'] is None
+    flaky.down = False
+    worker.request()
+    done = worker.wait(second, 10)
+    assert done['state'] == 'committed' and done['error'] is None and done['delta']
+    assert worker.status(first)['state'] == 'committed'
+    assert not mirror.pending_parts() and len(list_deltas(repo, 'main')) == 1
@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+
+import history_store
+from history_store import HISTORY_CACHE, LocalRepo, compact, list_deltas, load_history, resolve, save_history, write_delta
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    monkeypatch.setattr(HISTORY_CACHE, 'ttl', 0)
+    HISTORY_CACHE.invalidate()
+    history_store._DELTA_FRAMES.clear()
+    yield LocalRepo(str(tmp_path / "repo"))
+    HISTORY_CACHE.invalidate()
+
+
+def rows(*items):
+    return pd.DataFrame([{'Date': pd.Timestamp(d), 'Unit': u, 'Gen': g, 'HR': 2300.0} for d, u, g in items])
+
+
+def gen(df, date='2025-01-01', unit='1'):
+    return df.loc[(df['Date'] == pd.Timestamp(date)) & (df['Unit'] == unit), 'Gen'].tolist()
+
+
+def test_resolve_last_writer_wins():
+    base = rows(('2025-01-01', '1', 8.0), ('2025-01-01', '2', 8.0))
+    out = resolve(base, [rows(('2025-01-01', '1', 9.0)), rows(('2025-01-01', '1', 10.0))])
+    assert gen(out) == [10.0] and gen(out, unit='2') == [8.0] and len(out) == 2
+
+
+def test_compact_folds_deltas_in_write_order(repo):
+    save_history(repo, rows(('2025-01-01', '1', 8.0)), None, 'main')
+    write_delta(repo, rows(('2025-01-01', '1', 9.0)), 'main')
+    write_delta(repo, rows(('2025-01-01', '1', 10.0), ('2025-01-02', '1', 7.0)), 'main')
+    assert compact(repo, 'main', min_deltas=2)
+    assert list_deltas(repo, 'main') == []
+    df, _ = load_history(repo, 'main')
+    assert gen(df) == [10.0] and gen(df, '2025-01-02') == [7.0]
+
+
+def test_undeleted_delta_is_not_reapplied_after_compaction(repo, monkeypatch):
+    # A sets the row to 9, the later B to 10; A's delete fails during compaction
+    save_history(repo, rows(('2025-01-01', '1', 8.0)), None, 'main')
+    a = write_delta(repo, rows(('2025-01-01', '1', 9.0)), 'main')
+    write_delta(repo, rows(('2025-01-01', '1', 10.0)), 'main')
+    real = repo.delete_file
+    def delete(path, *args, **kwargs):
+        if path == a: raise IOError('delete failed')
+        return real(path, *args, **kwargs)
+    monkeypatch.setattr(repo, 'delete_file', delete)
+    with pytest.raises(IOError):
+        compact(repo, 'main', min_deltas=2)
+    assert [e.path for e in list_deltas(repo, 'main')] == [a]
+    assert gen(load_history(repo, 'main')[0]) == [10.0]
+    # The next compaction (with a newer delta) deletes the leftover without re-applying it
+    monkeypatch.setattr(repo, 'delete_file', real)
+    write_delta(repo, rows(('2025-01-02', '1', 7.0)), 'main')
+    assert compact(repo, 'main', min_deltas=2)
+    df, _ = load_history(repo, 'main')
+    assert list_deltas(repo, 'main') == [] and gen(df) == [10.0] and gen(df, '2025-01-02') == [7.0]
@@ -0,0 +1,36 @@
+import io
+
+import pytest
+
+from history_mirror import HistoryMirror
+from ingest import check_columns, ingest
+
+CSV = """Date,Unit,Gen,HR,Remarks
+2025-01-01,1,8.0,2300,
+2025-01-01,2,8.1,2310,
+2025-01-01,1,8.2,2320,
+2025-01-02,1,35,2300,
+2025-01-02,2,8.3,2330,
+2025-01-01,2,8.4,2340,
+not a date,1,8.0,2300,
+2025-01-03,1.0,8.5,2350,
+2025-01-03,1,8.6,2360,
+"""
+
+
+def test_ingest_validates_and_dedupes_across_chunks(tmp_path):
+    mirror = HistoryMirror(str(tmp_path / "mirror"))
+    # Three rows per chunk: (01-01, 2) repeats from chunk 1 into chunk 2, (01-03, 1) inside chunk 3
+    report = ingest(io.BytesIO(CSV.encode()), mirror, chunksize=3)
+    assert report['rows'] == 9 and report['rejected'] == 2
+    assert report['reasons'] == {'Gen out of range [0, 30]': 1, 'unparseable Date': 1}
+    assert sorted(report['rejects']['line']) == [5, 8]
+    assert report['duplicates'] == 3 and report['accepted'] == 4
+    assert report['ignored_cols'] == ['Remarks']
+    df = mirror.read().sort_values(['Date', 'Unit'])
+    assert [(u, round(float(g), 1)) for u, g in zip(df['Unit'].astype(str), df['Gen'])] == [('1', 8.2), ('2', 8.4), ('2', 8.3), ('1', 8.6)]
+
+
+def test_ingest_needs_the_key_columns():
+    with pytest.raises(ValueError):
+        check_columns(['Date', 'Gen'])
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from quality import QualityMonitor
+
+
+def rows(values, metric='Vacuum', start='2025-01-01'):
+    days = pd.date_range(start, periods=len(values))
+    df = pd.DataFrame({'Date': days, 'Unit': '1', 'Gen': 8.0, 'HR': 2300.0, 'Vacuum': -0.9, 'MS Temp': 537.0, 'FG Temp': 133.0, 'SOx': 540.0, 'NOx': 390.0})
+    df[metric] = values
+    return df
+
+
+def test_constant_window_streams_without_error():
+    # Identical readings: the window's std is 0 while each day is scored
+    q = QualityMonitor(stuck_run=3, min_periods=2)
+    q.on_rows(rows([-0.9] * 3))
+    flags = q.flags(metric='Vacuum')
+    assert list(flags['Flag']) == ['stuck']
+    assert flags['z'].iloc[0] == 0.0
+
+
+def test_jump_from_constant_window_is_an_outlier():
+    q = QualityMonitor(min_periods=3)
+    q.on_rows(rows([-0.9] * 4 + [-0.5]))
+    flags = q.flags(metric='Vacuum')
+    assert (flags['Flag'] == 'outlier').any()
+    assert np.isinf(flags.loc[flags['Flag'] == 'outlier', 'z']).all()
+
+
+def test_streaming_matches_reset_on_constant_window():
+    df = rows([-0.9] * 12 + [-0.5, -0.9])
+    a, b = QualityMonitor(min_periods=3), QualityMonitor(min_periods=3)
+    a.on_rows(df)
+    b.on_reset(df)
+    pd.testing.assert_frame_equal(a.flags(), b.flags())
+
+
+def test_resave_as_shutdown_takes_the_reading_back():
+    q, before = QualityMonitor(min_periods=2), QualityMonitor(min_periods=2)
+    df = rows([-0.9, -0.8, -0.7])
+    q.on_rows(df)
+    before.on_rows(df.iloc[:2])
+    q.on_rows(df.iloc[[2]].assign(Gen=0.0))
+    for metric in ('Vacuum', 'HR'):
+        assert q.window_stats('1', metric) == before.window_stats('1', metric)
@@ -0,0 +1,27 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from fleet import DEFAULT_FLEET, INPUT_DEFAULTS, Fleet
+from history_mirror import HistoryMirror
+from replay import Replay
+from rollups import AshPondIndex, RollupStore
+
+
+def test_missing_days_and_units_are_not_replayed_at_defaults(tmp_path):
+    fleet = Fleet(DEFAULT_FLEET)
+    mirror = HistoryMirror(str(tmp_path / "mirror"))
+    saved = pd.DataFrame([INPUT_DEFAULTS | {'Date': '2025-01-01', 'Unit': '1', 'Gen': 7.0, 'Coal Ash %': 35.0},
+                          INPUT_DEFAULTS | {'Date': '2025-01-03', 'Unit': '2', 'Gen': 0.0, 'Coal Ash %': 35.0}])
+    mirror.upsert(saved)
+    replay = Replay(mirror, AshPondIndex(), RollupStore(), '2025-01-01', '2025-01-03', fleet.unit_ids, fleet.configs(), 35.0, fleet.pond_cap)
+    deadline = time.monotonic() + 30
+    while not replay.ready and time.monotonic() < deadline: time.sleep(0.05)
+    assert replay.error is None
+    day1, day2, day3 = (replay.snapshots[pd.Timestamp(d)] for d in ('2025-01-01', '2025-01-02', '2025-01-03'))
+    assert [u['id'] for u in day1['units']] == ['1'] and day1['missing'] == ['2', '3']
+    assert day1['units'][0]['gen'] == 7.0
+    assert day2['units'] == [] and day2['missing'] == ['1', '2', '3'] and np.isnan(day2['fleet_profit']) and day2['pond_days_left'] is None
+    assert day3['saved'] == ['2']
+    assert replay.frame()['Profit'].isna().tolist() == [False, True, False]
@@ -0,0 +1,60 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import rollups
+from rollups import AshPondIndex
+
+
+def frame(days, unit='1', start='2025-01-01', gen=8.0):
+    return pd.DataFrame({'Date': pd.date_range(start, periods=days), 'Unit': unit, 'Gen': gen, 'HR': 2300.0, 'Coal Ash %': 40.0, 'Ash Util': 1000.0})
+
+
+def test_single_day_save_writes_only_touched_rows(tmp_path):
+    path = str(tmp_path / "pond.parquet")
+    pond = AshPondIndex(path)
+    pond.on_reset(frame(400))
+    size = os.path.getsize(path)
+    pond.on_rows(frame(1, start='2025-06-01', gen=9.0))
+    assert os.path.getsize(path) == size
+    assert len(pd.read_parquet(pond._parts()[0])) == 1
+    reloaded = AshPondIndex(path)
+    assert np.allclose(reloaded.prefix, pond.prefix)
+
+
+def test_parts_fold_back_into_full_index(tmp_path, monkeypatch):
+    monkeypatch.setattr(rollups, 'POND_PARTS', 3)
+    path = str(tmp_path / "pond.parquet")
+    pond = AshPondIndex(path)
+    pond.on_reset(frame(10))
+    for i in range(4):
+        pond.on_rows(frame(1, unit='2', start=f'2025-02-0{i + 1}'))
+    assert pond._parts() == []
+    assert np.allclose(AshPondIndex(path).prefix, pond.prefix)
+
+
+def test_avg_hr_skips_shutdown_and_blank_days():
+    from rollups import RollupStore
+    df = pd.DataFrame({'Date': pd.date_range('2025-04-01', periods=4), 'Unit': '1', 'Profit': 1.0, 'Gen': [8.0, 0.0, 8.0, 8.0], 'HR': [2300.0, 0.0, np.nan, 2400.0]})
+    reset, streamed = RollupStore(), RollupStore()
+    reset.on_reset(df)
+    for i in range(len(df)): streamed.on_rows(df.iloc[[i]])
+    for store in (reset, streamed):
+        fytd = store.fytd('2025-04-04')
+        assert fytd.loc['HR', 'mean'] == 2350.0
+        assert fytd.loc['HR', 'count'] == 2 and fytd.loc['HR', 'min'] == 2300.0
+        assert fytd.loc['Profit', 'sum'] == 4.0 and fytd.loc['Profit', 'count'] == 4
+    assert np.isnan(reset.get('day', '2025-04-02').loc['HR', 'mean'])
+
+
+def test_saved_index_is_stale_after_another_process_writes(tmp_path):
+    from history_mirror import HistoryMirror
+    root, path = str(tmp_path / "mirror"), str(tmp_path / "mirror" / "pond.parquet")
+    mirror = HistoryMirror(root)
+    pond = mirror.attach(AshPondIndex(path, revision=lambda: mirror.revision))
+    mirror.upsert(frame(3))
+    assert AshPondIndex(path).saved_revision == HistoryMirror(root).revision
+    # e.g. a historian load: same mirror files, no pond listener
+    HistoryMirror(root).upsert(frame(1, start='2025-01-10'))
+    assert AshPondIndex(path).saved_revision != HistoryMirror(root).revision